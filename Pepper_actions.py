@@ -1,54 +1,50 @@
 import argparse
-import qi
+import glob
+import json
+import os
+import shutil
+import subprocess
+import threading
 import time
-from moviepy import VideoFileClip, AudioFileClip
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from gestures import GesturePlayer, WAVE
 
 # # Replace with your Pepper's IP address
 PEPPER_IP = "169.254.246.50"
 PORT = 9559
+PEPPER_USER = "nao"
+PEPPER_PASS = "nao"
+VIDEO_DIR = "/home/nao/recordings/cameras"
+AUDIO_DIR = "/home/nao/recordings/microphones"
+FRONT_MIC = [0, 0, 1, 0]  # Use front mic; [FL, FR, Center, Rear]
 
-def pepper_wave(session, ip=PEPPER_IP, port=PORT):
-    print("I'm here to wave at you!")
-    motion_service = session.service("ALMotion")
-    posture_service = session.service("ALRobotPosture")
-
-    # Stand up straight (optional)
-    posture_service.goToPosture("StandInit", 0.5)
-
-    names = ["RShoulderPitch", "RShoulderRoll", "RElbowYaw", "RElbowRoll", "RWristYaw"]
-    # Start pose (hand up, ready to wave)
-    wave_down = [-0.195, -0.655, 1.2, 1.0, 0.0]
-
-    wave_up = [-0.195, -0.657, 1.2, 0.5, 0.0]
-    fractionMaxSpeed = 0.2 #Lower speed for smoother motion
-
-    # Move to wave-up position smoothly
-    motion_service.angleInterpolationWithSpeed(names, wave_up, fractionMaxSpeed)
- 
-
-    # Move to starting wave position
+def pepper_wave(session, ip=PEPPER_IP, port=PORT, wait=True, stand=True):
+    """
+    Waves Pepper's right hand: one precompiled angleInterpolation call (see gestures.py).
 
-    motion_service.setAngles(names, wave_down, fractionMaxSpeed)
-    time.sleep(1)
+    Args:
+        session (qi.Session): Connected NAOqi session.
+        wait (bool): Return only when the wave is over; False lets Pepper talk while waving.
+        stand (bool): Go to StandInit first. This blocks until the posture is reached, even
+            with wait=False; pass False when Pepper is already standing.
 
-    # Wave hand back and forth
-    for _ in range(3):
-        # motion_service.setAngles(names, wave_up, fractionMaxSpeed)
-        motion_service.angleInterpolationWithSpeed(names, wave_down, fractionMaxSpeed)
-        time.sleep(0.5)
-        motion_service.angleInterpolationWithSpeed(names, wave_up, fractionMaxSpeed)
-        # motion_service.setAngles(names, wave_down, fractionMaxSpeed)
-        time.sleep(0.5)
+    Returns:
+        qi.Future: Finishes when the wave is over.
+    """
+    print("I'm here to wave at you!")
+    if stand:
+        # Stand up straight (optional)
+        session.service("ALRobotPosture").goToPosture("StandInit", 0.5)
+    return GesturePlayer(session).play(WAVE, wait=wait)
 
 
 def record_audio(session, duration_sec=5, filename="pepper_audio"):
     tts = session.service("ALTextToSpeech")
     audio_recorder = session.service("ALAudioRecorder")
-    output_path = f"/home/nao/recordings/microphones/{filename}.wav"
+    output_path = f"{AUDIO_DIR}/{filename}.wav"
     tts.say("Recording audio now. Say hi.")
-    channels = [0, 0, 1, 0]  # Use front mic; [FL, FR, Center, Rear]
-    audio_recorder.startMicrophonesRecording(output_path, "wav", 16000, channels)
+    audio_recorder.startMicrophonesRecording(output_path, "wav", 16000, FRONT_MIC)
     print("Recording audio...")
     time.sleep(duration_sec)
     audio_recorder.stopMicrophonesRecording()
@@ -58,82 +54,413 @@ def record_audio(session, duration_sec=5, filename="pepper_audio"):
 
 
 def record_video(session, duration_sec=5, filename="myvideo"):
-    import paramiko
-    # Get the ALVideoRecorder service
-    video_recorder = session.service("ALVideoRecorder")
-
-    # Set video parameters
-    video_recorder.setResolution(2)        # 1=320x240, 2=640x480, .. resolution
-    video_recorder.setFrameRate(15)        # 15 fps
-    video_recorder.setVideoFormat("MJPG")  # MJPG format
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"pepper_video_{timestamp}"
-    # Start recording
-    video_recorder.startRecording("/home/nao/recordings/cameras", filename)
-    print(f"Recording video for {duration_sec} seconds...")
-    time.sleep(duration_sec)
+    """Records a video on the robot and downloads it. Returns the local path."""
+    capture = CaptureSession(session).start(duration_sec, basename=filename, video=True, audio=False)
+    return capture.video.result()
+
+
+class RobotFiles:
+    """
+    One SSH connection to the robot, shared by every download.
+
+    Opening an SSH connection costs a key exchange and a login, so connections are
+    pooled per robot (see get_robot_files). Files are fetched with pipelined reads:
+    paramiko keeps many read requests in flight instead of waiting for each 32 KB
+    block. Large files are split into ranges read in parallel over several SFTP
+    channels of the same connection.
+    """
+
+    def __init__(self, ip=PEPPER_IP, username=PEPPER_USER, password=PEPPER_PASS):
+        import paramiko
+        self.ip = ip
+        self.ssh = paramiko.SSHClient()
+        self.ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        self.ssh.connect(ip, username=username, password=password)
+        self._sftp = self.ssh.open_sftp()
+        self._lock = threading.Lock()
+
+    def _open_sftp(self):
+        import paramiko
+        return paramiko.SFTPClient.from_transport(self.ssh.get_transport())
+
+    def download(self, remote_path, local_path, parallel=4, min_parallel_size=32 * 1024 * 1024,
+                 max_requests=None):
+        """
+        Copies a file from the robot.
+
+        Args:
+            remote_path (str): Path on the robot.
+            local_path (str): Destination on this computer.
+            parallel (int): SFTP channels reading ranges at once for large files.
+            min_parallel_size (int): Files smaller than this (bytes) use one channel.
+            max_requests (int): Read requests in flight per channel; None lets paramiko
+                pipeline the whole file, which is fastest on the robot's network.
+
+        Returns:
+            str: local_path
+        """
+        start = time.time()
+        with self._lock:
+            size = self._sftp.stat(remote_path).st_size
+        if parallel <= 1 or size < min_parallel_size:
+            sftp = self._open_sftp()
+            try:
+                sftp.get(remote_path, local_path, max_concurrent_prefetch_requests=max_requests)
+            finally:
+                sftp.close()
+        else:
+            with open(local_path, "wb") as f:
+                f.truncate(size)
+            range_size = -(-size // parallel)
+            ranges = [(offset, min(range_size, size - offset)) for offset in range(0, size, range_size)]
+            with ThreadPoolExecutor(max_workers=len(ranges)) as pool:
+                for future in [pool.submit(self._download_range, remote_path, local_path, offset, length,
+                                           max_requests) for offset, length in ranges]:
+                    future.result()
+        elapsed = time.time() - start
+        print(f"Downloaded {remote_path} ({size / 1e6:.1f} MB) in {elapsed:.1f}s "
+              f"({size / 1e6 / max(elapsed, 1e-6):.1f} MB/s)")
+        return local_path
+
+    def _download_range(self, remote_path, local_path, offset, length, max_requests, block=32768):
+        sftp = self._open_sftp()
+        try:
+            with sftp.open(remote_path, "rb") as remote, open(local_path, "r+b") as local:
+                local.seek(offset)
+                blocks = [(o, min(block, offset + length - o)) for o in range(offset, offset + length, block)]
+                # readv pipelines the requests and yields the blocks in order
+                for data in remote.readv(blocks, max_concurrent_prefetch_requests=max_requests):
+                    local.write(data)
+        finally:
+            sftp.close()
+
+    def close(self):
+        with self._lock:
+            self._sftp.close()
+            self.ssh.close()
+
+
+_robot_files = {}
+_robot_files_lock = threading.Lock()
+
+
+def get_robot_files(ip=PEPPER_IP, username=PEPPER_USER, password=PEPPER_PASS):
+    """Returns the pooled RobotFiles connection for a robot, connecting on first use."""
+    with _robot_files_lock:
+        files = _robot_files.get((ip, username))
+        transport = files.ssh.get_transport() if files else None
+        if transport is None or not transport.is_active():
+            files = _robot_files[(ip, username)] = RobotFiles(ip, username, password)
+        return files
+
+
+class Capture:
+    """
+    A recording in progress. Every attribute is a Future:
+        video, audio   local paths of the downloaded files (remote paths with download=False),
+                       None if that stream was not recorded
+        metadata       path of the sidecar JSON with the start/stop timestamps of both recorders
+    """
+
+    def __init__(self, video, audio, metadata):
+        self.video = video
+        self.audio = audio
+        self.metadata = metadata
+
+    def result(self, timeout=None):
+        """Waits for everything; returns (video path, audio path, metadata path)."""
+        return (self.video.result(timeout) if self.video else None,
+                self.audio.result(timeout) if self.audio else None,
+                self.metadata.result(timeout))
+
+
+class CaptureSession:
+    """
+    Records video and audio on the robot at the same time and downloads both in the background.
 
-    # Stop recording
-    video_info = video_recorder.stopRecording()
-    print("Video was saved on the robot:", video_info) #video_info is a tuple with (filename, resolution, framerate)
-    PEPPER_USER = "nao"
-    PEPPER_PASS = "nao"
-    REMOTE_PATH = video_info[1]  # This is the filename returned by stopRecording
-    LOCAL_PATH = f"./{filename}.avi"
-    ssh = paramiko.SSHClient()
-    ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-    ssh.connect(PEPPER_IP, username=PEPPER_USER, password=PEPPER_PASS)
-
-    sftp = ssh.open_sftp()
-    sftp.get(REMOTE_PATH, LOCAL_PATH)
-    sftp.close()
-    ssh.close()
-    print(f"Video {filename} downloaded to your computer!")
-    return LOCAL_PATH
-
-def merge_audio_video(video_path, audio_path, output_path):
+    The recorders are started back to back, so both files cover the same interval;
+    the local time before and after each start/stop call is saved in a sidecar JSON,
+    from which merge_audio_video aligns the two streams.
+    """
+
+    def __init__(self, session, ip=PEPPER_IP, local_dir=".", resolution=2, fps=15):
+        """
+        Args:
+            session (qi.Session): Connected NAOqi session.
+            ip (str): Robot address for the SSH downloads.
+            local_dir (str): Where downloaded recordings and sidecars go.
+            resolution (int): ALVideoRecorder resolution (1=320x240, 2=640x480).
+            fps (int): Video frame rate.
+        """
+        self.session = session
+        self.ip = ip
+        self.local_dir = local_dir
+        self.resolution = resolution
+        self.fps = fps
+
+    def start(self, duration_sec, basename=None, video=True, audio=True, download=True):
+        """
+        Starts the recorders and returns immediately.
+
+        Args:
+            duration_sec (float): Recording length.
+            basename (str): File name stem; pepper_<timestamp> by default.
+            video, audio (bool): Which streams to record.
+            download (bool): Copy the files to local_dir when the recording ends.
+
+        Returns:
+            Capture: Futures for the files and the sidecar.
+        """
+        basename = basename or f"pepper_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        meta = {'basename': basename, 'duration_sec': duration_sec}
+        video_recorder = self.session.service("ALVideoRecorder") if video else None
+        audio_recorder = self.session.service("ALAudioRecorder") if audio else None
+
+        if video_recorder:
+            video_recorder.setResolution(self.resolution)
+            video_recorder.setFrameRate(self.fps)
+            video_recorder.setVideoFormat("MJPG")
+        audio_remote = f"{AUDIO_DIR}/{basename}_audio.wav"
+
+        # Back to back, so both recordings start within a round trip of each other
+        try:
+            if video_recorder:
+                before = time.time()
+                video_recorder.startRecording(VIDEO_DIR, f"{basename}_video")
+                meta['video'] = {'start_called': before, 'start_returned': time.time(), 'fps': self.fps}
+            if audio_recorder:
+                before = time.time()
+                audio_recorder.startMicrophonesRecording(audio_remote, "wav", 16000, FRONT_MIC)
+                meta['audio'] = {'start_called': before, 'start_returned': time.time(),
+                                 'remote_path': audio_remote, 'sample_rate': 16000}
+        except Exception:
+            # Do not leave the recorder that did start running on the robot
+            self._stop_started(meta, video_recorder, audio_recorder)
+            raise
+        print(f"Recording {' and '.join(k for k in ('video', 'audio') if k in meta)} for {duration_sec} seconds...")
+
+        # One small pool per capture: its tasks wait on each other, so they must not share workers
+        executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix=f"capture-{basename}")
+        stopped = executor.submit(self._stop_after, duration_sec, video_recorder, audio_recorder, meta)
+        video_future = executor.submit(self._fetch, stopped, meta, 'video', download) if video else None
+        audio_future = executor.submit(self._fetch, stopped, meta, 'audio', download) if audio else None
+        downloads = {'video': video_future, 'audio': audio_future} if download else {}
+        metadata = executor.submit(self._write_metadata, meta, stopped, downloads)
+        executor.shutdown(wait=False)  # Threads exit once these tasks are done
+        return Capture(video_future, audio_future, metadata)
+
+    def _stop_started(self, meta, video_recorder, audio_recorder):
+        if 'video' in meta:
+            try:
+                video_recorder.stopRecording()
+            except Exception as e:
+                print(f"Could not stop the video recorder: {e}")
+        if 'audio' in meta:
+            try:
+                audio_recorder.stopMicrophonesRecording()
+            except Exception as e:
+                print(f"Could not stop the audio recorder: {e}")
+
+    def _stop_after(self, duration_sec, video_recorder, audio_recorder, meta):
+        time.sleep(duration_sec)
+        if video_recorder:
+            before = time.time()
+            video_info = video_recorder.stopRecording()  # (frames, remote path)
+            meta['video'].update(stop_called=before, stop_returned=time.time(), remote_path=video_info[1])
+            print("Video was saved on the robot:", video_info)
+        if audio_recorder:
+            before = time.time()
+            audio_recorder.stopMicrophonesRecording()
+            meta['audio'].update(stop_called=before, stop_returned=time.time())
+            print(f"Audio was saved on the robot: {meta['audio']['remote_path']}")
+
+    def _fetch(self, stopped, meta, kind, download):
+        stopped.result()
+        info = meta[kind]
+        if not download:
+            return info['remote_path']
+        local_path = os.path.join(self.local_dir, os.path.basename(info['remote_path']))
+        get_robot_files(self.ip).download(info['remote_path'], local_path)
+        return local_path
+
+    def _write_metadata(self, meta, stopped, downloads):
+        path = os.path.join(self.local_dir, f"{meta['basename']}.json")
+        # Written as soon as the recorders stop, so the start/stop times survive a failed download
+        try:
+            stopped.result()
+        finally:
+            self._dump_metadata(meta, path)
+        error = None
+        for kind, future in downloads.items():
+            if future:
+                try:
+                    meta[kind]['local_path'] = future.result()
+                except Exception as e:
+                    error = error or e
+        self._dump_metadata(meta, path)
+        if error:
+            raise error
+        return path
+
+    def _dump_metadata(self, meta, path):
+        with open(path, "w") as f:
+            json.dump(meta, f, indent=2)
+
+
+# Audio codec per output container: the MJPG video is always copied, and the
+# robot's PCM WAV is copied too unless the container cannot hold PCM
+AUDIO_CODECS = {".mkv": "copy", ".avi": "copy", ".mov": "copy", ".mp4": "aac", ".m4v": "aac"}
+
+
+def find_ffmpeg():
+    """Returns the ffmpeg executable bundled with imageio-ffmpeg, else the one on PATH, else None."""
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except Exception:
+        return shutil.which("ffmpeg")
+
+
+def stream_offset(metadata_path):
+    """
+    Seconds by which the audio recording started after the video, from a CaptureSession sidecar.
+
+    Each start time is taken as the midpoint of its startRecording call, the
+    best estimate of when the robot actually started recording.
+    """
+    with open(metadata_path) as f:
+        meta = json.load(f)
+    video, audio = meta['video'], meta['audio']
+    video_start = (video['start_called'] + video['start_returned']) / 2
+    audio_start = (audio['start_called'] + audio['start_returned']) / 2
+    return audio_start - video_start
+
+
+def merge_audio_video(video_path, audio_path, output_path, offset=None, metadata_path=None):
     """
     Merges the specified audio file with the video file and writes the combined file to output_path.
 
+    With ffmpeg the streams are remuxed without re-encoding the video (the audio
+    is encoded to AAC only for .mp4); without it, moviepy re-encodes everything.
+
     Args:
         video_path (str): Path to the input video file (e.g., .avi).
         audio_path (str): Path to the input audio file (e.g., .wav).
-        output_path (str): Path for the output merged video file (e.g., .mp4).
+        output_path (str): Path for the output merged video file (.mkv and .avi copy both streams).
+        offset (float): Seconds the audio starts after the video (negative: before).
+        metadata_path (str): CaptureSession sidecar to take the offset from when offset is None.
     """
-    # from moviepy.editor import VideoFileClip, AudioFileClip
+    if offset is None:
+        offset = stream_offset(metadata_path) if metadata_path else 0.0
+    start = time.time()
+    ffmpeg = find_ffmpeg()
+    if ffmpeg:
+        audio_codec = AUDIO_CODECS.get(os.path.splitext(output_path)[1].lower(), "aac")
+        # A late audio start is shifted later; an early one is trimmed
+        audio_input = ["-itsoffset", f"{offset:.3f}"] if offset >= 0 else ["-ss", f"{-offset:.3f}"]
+        command = [ffmpeg, "-y", "-loglevel", "error",
+                   "-i", video_path, *audio_input, "-i", audio_path,
+                   "-map", "0:v:0", "-map", "1:a:0", "-c:v", "copy", "-c:a", audio_codec,
+                   output_path]
+        result = subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        if result.returncode != 0:
+            raise RuntimeError(f"ffmpeg failed merging {video_path}: {result.stderr.strip()}")
+    else:
+        print("ffmpeg not found, re-encoding with moviepy (slow)")
+        from moviepy import VideoFileClip, AudioFileClip, CompositeAudioClip
+
+        # Load the video and audio clips
+        video_clip = VideoFileClip(video_path)
+        audio_clip = AudioFileClip(audio_path)
+        if offset >= 0:
+            # with_audio ignores the start of a bare clip; a composite keeps the leading silence
+            audio_clip = CompositeAudioClip([audio_clip.with_start(offset)])
+        else:
+            audio_clip = audio_clip.subclipped(-offset)
+
+        # Set the audio for the video clip and write the result to a new file
+        video_clip.with_audio(audio_clip).write_videofile(output_path)
+
+    print(f"Merged video saved as {output_path} (audio offset {offset * 1000:+.0f} ms) "
+          f"in {time.time() - start:.1f}s")
+    return output_path
 
-    # Load the video and audio clips
-    video_clip = VideoFileClip(video_path)
-    audio_clip = AudioFileClip(audio_path)
 
-    # Set the audio for the video clip
-    final_clip = video_clip.with_audio(audio_clip)
+def merge_folder(folder, extension=".mkv", workers=4, overwrite=False):
+    """
+    Merges every recorded session in a folder, several at a time.
 
-    # Write the result to a new file
-    final_clip.write_videofile(output_path)
+    A session is a CaptureSession sidecar (<basename>.json) next to its downloaded
+    video and audio files; the merged file is written as <basename><extension>.
 
-    print(f"Merged video saved as {output_path}")
-    return output_path
+    Args:
+        folder (str): Directory with the sidecars and recordings.
+        extension (str): Output container, see AUDIO_CODECS.
+        workers (int): Sessions merged at once (each is an ffmpeg process).
+        overwrite (bool): Merge again even if the output already exists.
+
+    Returns:
+        list: Paths of the merged files.
+    """
+    jobs = []
+    for metadata_path in sorted(glob.glob(os.path.join(folder, "*.json"))):
+        try:
+            with open(metadata_path) as f:
+                meta = json.load(f)
+            video_path = os.path.join(folder, os.path.basename(meta['video']['remote_path']))
+            audio_path = os.path.join(folder, os.path.basename(meta['audio']['remote_path']))
+        except (ValueError, KeyError, TypeError):
+            continue  # Not a sidecar of a video + audio capture
+        output_path = os.path.join(folder, meta['basename'] + extension)
+        if not overwrite and os.path.exists(output_path):
+            continue
+        if not (os.path.exists(video_path) and os.path.exists(audio_path)):
+            print(f"Skipping {meta['basename']}: recordings not downloaded")
+            continue
+        jobs.append((video_path, audio_path, output_path, metadata_path))
+
+    start = time.time()
+    merged = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(merge_audio_video, video_path, audio_path, output_path, metadata_path=metadata_path)
+                   for video_path, audio_path, output_path, metadata_path in jobs]
+        for future, job in zip(futures, jobs):
+            try:
+                merged.append(future.result())
+            except Exception as e:
+                print(f"Error merging {job[0]}: {e}")
+    print(f"Merged {len(merged)} of {len(jobs)} session(s) in {time.time() - start:.1f}s")
+    return merged
 
 
 def main():
     # Connect to the robot session
+    import qi  # Only here, so the helpers above can be imported without the NAOqi SDK
     session = qi.Session()
     filename = "pepper_video_20250708_155419.avi"
     try:
         session.connect(f"tcp://{PEPPER_IP}:{PORT}")
-        pepper_wave(session)
+    except RuntimeError:
+        print(f"Could not connect to Pepper at {PEPPER_IP}:{PORT}. Please check the IP address and port.")
+        return
+    try:
         tts = session.service("ALTextToSpeech")  # Pause speech recognition if needed
+        wave = pepper_wave(session, wait=False)
         tts.say("Hello! Let's wave together!")
-        time.sleep(2)  # Wait for the speech to finish
-        vidpath = record_video(session, duration_sec=5, filename="pepper_wave_video")
-        audpath = record_audio(session, duration_sec=5, filename="pepper_wave_audio")
+        wave.wait()
+        # Video and audio are recorded together and downloaded in the background
+        capture = CaptureSession(session).start(5, basename="pepper_wave")
+        tts.say("Recording now. Say hi!")
+        vidpath, audpath, metapath = capture.result()  # Waits for the recording and the downloads
         tts.say("Recording complete. Thank you for waving with me!")
-        print(audpath, vidpath)
-        # merge_audio_video(f"/home/nao/recordings/microphones/{filename}", )
-    except RuntimeError:
-        print(f"Could not connect to Pepper at {PEPPER_IP}:{PORT}. Please check the IP address and port.")
-        return 
+        print(audpath, vidpath, metapath)
+    except RuntimeError as e:
+        print(f"Recording with Pepper failed: {e}")
+        return
+    try:
+        merge_audio_video(vidpath, audpath, "pepper_wave.mkv", metadata_path=metapath)
+    except (RuntimeError, OSError) as e:
+        print(f"Could not merge {vidpath} and {audpath}: {e}")
     
 
 # def main(session):
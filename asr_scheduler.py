@@ -0,0 +1,199 @@
+"""One Whisper model shared by several Transcribers through a batching inference queue.
+
+Every Transcriber used to load its own Whisper model, so running sessions for
+several robots from one process meant one copy of the weights per robot and
+several threads fighting over the GPU at once. SharedWhisperModel loads the
+model once; Transcribers submit their audio to a queue and a single worker
+thread runs the model and hands each result back to the caller that is waiting
+for it.
+
+The worker batches: after taking a request it keeps collecting for up to
+max_wait seconds (or until max_batch requests), pads every clip to Whisper's
+30 s window, stacks the log-mel spectrograms and runs them through one
+whisper.decode call, i.e. one encoder pass and a batched greedy decoder, instead
+of one transcribe() per clip. Clips longer than 30 s, and models that are not
+openai-whisper models, go through transcribe() one at a time as before.
+
+It has the same transcribe(audio, **kwargs) -> dict call as a whisper model, so
+it is passed to Transcriber(audio_model=...) in place of one.
+"""
+
+import threading
+import time
+from concurrent.futures import Future
+from queue import Queue, Empty
+
+import torch
+import whisper
+
+# transcribe() drops a window as silence when both of these hold; decode() alone does not.
+NO_SPEECH_THRESHOLD = 0.6
+LOGPROB_THRESHOLD = -1.0
+
+
+class _Request:
+    __slots__ = ("audio", "kwargs", "future", "mel", "key")
+
+    def __init__(self, audio, kwargs, future, mel):
+        self.audio = audio
+        self.kwargs = kwargs
+        self.future = future
+        self.mel = mel  # None when the clip must go through transcribe()
+        self.key = tuple(sorted(kwargs.items()))  # Only requests with the same options share a batch
+
+
+class SharedWhisperModel:
+    """Runs transcribe() calls from many threads on one loaded Whisper model, batching them."""
+
+    def __init__(self, model="turbo", device=None, max_batch=8, max_wait=0.03):
+        """
+        Args:
+            model (str | whisper.Whisper): Model name for whisper.load_model, or an
+                already loaded model.
+            device (str): Device for whisper.load_model, None for its default.
+            max_batch (int): Most clips decoded in one batch; 1 disables batching.
+            max_wait (float): Seconds the worker waits for more clips after the first
+                one of a batch (20-50 ms keeps the added latency small).
+        """
+        if isinstance(model, str):
+            if model in ["tiny", "base", "small", "medium", "large"]:
+                model = model + ".en"
+            self.name = model
+            self.model = whisper.load_model(model, device=device)
+            print(f"Shared Whisper model loaded: {model}")
+        else:
+            self.name = type(model).__name__
+            self.model = model
+        # Batching needs the openai-whisper internals (mel size, decode); anything else runs unbatched.
+        self.batched = max_batch > 1 and hasattr(self.model, "dims")
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.requests = 0
+        self.batches = 0
+        self.batched_requests = 0
+        self.largest_batch = 0
+        self.busy_s = 0.0
+        self.max_queue_depth = 0
+        self._queue = Queue()
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="SharedWhisperModel", daemon=True)
+        self._thread.start()
+
+    def transcribe(self, audio, **kwargs):
+        """
+        Queues `audio` and blocks until the worker has transcribed it.
+
+        Args:
+            audio (np.ndarray): float32 mono audio at 16 kHz.
+            **kwargs: Whisper transcribe options (fp16, language, ...).
+
+        Returns:
+            dict: result['text'] is the transcription. Batched results carry only
+                'text' and 'language'; long clips get whisper's full transcribe() result.
+        """
+        return self.submit(audio, **kwargs).result()
+
+    def submit(self, audio, **kwargs):
+        """Queues `audio` and returns a Future for the result, without blocking."""
+        if not self._running:
+            raise RuntimeError("SharedWhisperModel is closed")
+        mel = None
+        if self.batched and len(audio) <= whisper.audio.N_SAMPLES:
+            # Computed in the caller's thread so the worker only stacks and decodes.
+            mel = whisper.log_mel_spectrogram(whisper.pad_or_trim(torch.from_numpy(audio)),
+                                              self.model.dims.n_mels, device=self.model.device)
+        future = Future()
+        self._queue.put(_Request(audio, kwargs, future, mel))
+        depth = self._queue.qsize()
+        if depth > self.max_queue_depth:
+            self.max_queue_depth = depth
+        return future
+
+    def _collect(self):
+        """Waits for one request, then gathers more for up to max_wait seconds."""
+        try:
+            batch = [self._queue.get(timeout=0.5)]
+        except Empty:
+            return []
+        if self.batched:
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except Empty:
+                    break
+        return [r for r in batch if r.future.set_running_or_notify_cancel()]
+
+    def _run(self):
+        while self._running:
+            pending = self._collect()
+            if not pending:
+                continue
+            start = time.perf_counter()
+            groups = {}
+            for request in pending:
+                if request.mel is None:
+                    self._transcribe_one(request)
+                else:
+                    groups.setdefault(request.key, []).append(request)
+            for group in groups.values():
+                if len(group) == 1:
+                    self._transcribe_one(group[0])
+                else:
+                    self._decode_batch(group)
+            self.busy_s += time.perf_counter() - start
+            self.requests += len(pending)
+
+    def _transcribe_one(self, request):
+        try:
+            request.future.set_result(self.model.transcribe(request.audio, **request.kwargs))
+        except Exception as e:
+            request.future.set_exception(e)
+
+    def _decode_batch(self, group):
+        kwargs = group[0].kwargs
+        options = whisper.DecodingOptions(
+            task=kwargs.get("task", "transcribe"),
+            language=kwargs.get("language") or ("en" if not self.model.is_multilingual else None),
+            fp16=kwargs.get("fp16", True) and self.model.device.type != "cpu",
+            without_timestamps=True,
+        )
+        try:
+            mel = torch.stack([r.mel for r in group])
+            results = whisper.decode(self.model, mel, options)
+        except Exception as e:
+            print(f"Batched decode failed ({e}); transcribing one by one.")
+            for request in group:
+                self._transcribe_one(request)
+            return
+        self.batches += 1
+        self.batched_requests += len(group)
+        self.largest_batch = max(self.largest_batch, len(group))
+        for request, result in zip(group, results):
+            silent = result.no_speech_prob > NO_SPEECH_THRESHOLD and result.avg_logprob < LOGPROB_THRESHOLD
+            request.future.set_result({"text": "" if silent else result.text, "language": result.language})
+
+    def close(self):
+        """Stops the worker; requests still queued fail with RuntimeError."""
+        self._running = False
+        self._thread.join(timeout=5.0)
+        while True:
+            try:
+                request = self._queue.get_nowait()
+            except Empty:
+                break
+            request.future.set_exception(RuntimeError("SharedWhisperModel closed"))
+
+    def stats(self):
+        return {
+            'requests': self.requests,
+            'batches': self.batches,
+            'mean_batch': round(self.batched_requests / self.batches, 2) if self.batches else 0.0,
+            'largest_batch': self.largest_batch,
+            'busy_s': round(self.busy_s, 2),
+            'queued': self._queue.qsize(),
+            'max_queue_depth': self.max_queue_depth,
+        }
@@ -0,0 +1,239 @@
+"""Scoreboard: word error rate, speed and memory of every ASR backend/model/quantization on labelled clips.
+
+The Whisper models in use ("turbo" in chatWithPepper, "small" in orchestratorMain,
+"base.en" in classTranscriberCPP, "turbo" in batch_transcriber) were picked by
+feel. This tool runs a labelled set of child-speech clips (WAV + .txt transcript,
+see audio_fixtures.py) through each BACKEND:MODEL[:QUANT] and reports:
+
+    wer        corpus word error rate against the transcripts (after normalization)
+    p50/p90    latency of one transcribe() call per clip, in ms
+    rtf        total transcribe time / total audio duration
+    load_s     model load time
+    peak_mb    peak resident memory of the process that ran the model
+
+Every combination runs in its own process so memory numbers are not mixed. The
+table is sorted by WER and marks the Pareto front (no other run is both at least
+as accurate and at least as fast); with --max-wer it names the fastest run that
+meets the bar.
+
+Backends and their quantization options:
+    whisper         openai-whisper; no quantization (fp16 on CUDA, fp32 on CPU)
+    faster-whisper  CTranslate2 compute types: int8, int8_float16, float16, float32
+    whispercpp      pywhispercpp; ggml quantizations like q5_1, q8_0 (appended to the model name)
+
+Backends that are not installed are skipped.
+
+Usage:
+    python asr_scoreboard.py fixtures/ [--run faster-whisper:small.en:int8 ...] [--max-wer 0.15]
+        [--output asr_scoreboard.json]
+"""
+
+import argparse
+import importlib.util
+import json
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from multiprocessing import get_context
+
+import numpy as np
+
+from audio_fixtures import load_fixtures
+from latencytracker import LogHistogram, default_build_label
+from voice_loop_bench import peak_rss_mb
+
+# Backend -> (module that must be importable, default model[:quant] list)
+BACKENDS = {
+    "whisper": ("whisper", ["tiny.en", "base.en", "small.en", "turbo"]),
+    "faster-whisper": ("faster_whisper", ["base.en:int8", "small.en:int8", "small.en:float32",
+                                          "large-v3-turbo:int8"]),
+    "whispercpp": ("pywhispercpp", ["base.en", "base.en:q5_1", "small.en:q5_1"]),
+}
+
+_PUNCTUATION = re.compile(r"[^\w\s']")
+
+
+def normalize_text(text):
+    """Lower-cases and drops punctuation, so only word choice counts."""
+    return _PUNCTUATION.sub(" ", text.casefold()).split()
+
+
+def word_errors(reference, hypothesis):
+    """
+    Word-level Levenshtein distance.
+
+    Returns:
+        tuple: (substitutions + deletions + insertions, number of reference words)
+    """
+    ref = normalize_text(reference)
+    hyp = normalize_text(hypothesis)
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        current = [i] + [0] * len(hyp)
+        for j, hyp_word in enumerate(hyp, 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ref_word != hyp_word))
+        previous = current
+    return previous[-1], len(ref)
+
+
+def load_backend(backend, model, quant):
+    """Loads a model and returns a transcribe(float32 audio) -> str function."""
+    if backend == "whisper":
+        import torch
+        import whisper
+        asr = whisper.load_model(model)
+        fp16 = torch.cuda.is_available()
+        return lambda audio: asr.transcribe(audio, fp16=fp16, language="en")["text"]
+    if backend == "faster-whisper":
+        from faster_whisper import WhisperModel
+        asr = WhisperModel(model, device="auto", compute_type=quant or "default")
+
+        def transcribe(audio):
+            segments, _ = asr.transcribe(audio, language="en")
+            return "".join(segment.text for segment in segments)
+        return transcribe
+    if backend == "whispercpp":
+        from pywhispercpp.model import Model
+        asr = Model(f"{model}-{quant}" if quant else model)
+        return lambda audio: "".join(segment.text for segment in asr.transcribe(audio))
+    raise ValueError(f"Unknown backend '{backend}'")
+
+
+def score_run(backend, model, quant, fixtures_path):
+    """Transcribes every labelled fixture with one model. Called in a fresh process."""
+    fixtures = [fixture for fixture in load_fixtures(fixtures_path) if fixture.transcript]
+    load_start = time.perf_counter()
+    transcribe = load_backend(backend, model, quant)
+    load_s = time.perf_counter() - load_start
+
+    clips = [fixture.samples.astype(np.float32) / 32768.0 for fixture in fixtures]
+    if clips:
+        transcribe(clips[0])  # Warm-up: first-call setup is not part of the per-clip latency
+
+    latency = LogHistogram()
+    errors = words = 0
+    busy_s = 0.0
+    per_clip = []
+    for fixture, audio in zip(fixtures, clips):
+        start = time.perf_counter()
+        text = transcribe(audio).strip()
+        elapsed = time.perf_counter() - start
+        busy_s += elapsed
+        latency.record(elapsed * 1000)
+        clip_errors, clip_words = word_errors(fixture.transcript, text)
+        errors += clip_errors
+        words += clip_words
+        per_clip.append({'name': fixture.name, 'text': text, 'errors': clip_errors, 'words': clip_words,
+                         'latency_ms': round(elapsed * 1000, 1)})
+
+    audio_s = sum(fixture.duration for fixture in fixtures)
+    summary = latency.summary()
+    return {
+        'backend': backend, 'model': model, 'quant': quant,
+        'clips': len(fixtures),
+        'wer': round(errors / words, 4) if words else None,
+        'p50_ms': summary['p50_ms'], 'p90_ms': summary['p90_ms'],
+        'rtf': round(busy_s / audio_s, 4) if audio_s else None,
+        'load_s': round(load_s, 2),
+        'peak_mb': round(peak_rss_mb(), 1),
+        'per_clip': per_clip,
+    }
+
+
+def run_isolated(backend, model, quant, fixtures_path):
+    """Runs score_run in a fresh process; returns its result or an {'error': ...} record."""
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+        try:
+            return pool.submit(score_run, backend, model, quant, fixtures_path).result()
+        except Exception as e:
+            return {'backend': backend, 'model': model, 'quant': quant, 'error': f"{type(e).__name__}: {e}"}
+
+
+def parse_run(spec):
+    backend, _, rest = spec.partition(":")
+    model, _, quant = rest.partition(":")
+    if backend not in BACKENDS or not model:
+        raise argparse.ArgumentTypeError(f"'{spec}' is not BACKEND:MODEL[:QUANT] with BACKEND in {list(BACKENDS)}")
+    return backend, model, quant or None
+
+
+def default_runs():
+    """Every default model of every installed backend."""
+    runs = []
+    for backend, (module, models) in BACKENDS.items():
+        if importlib.util.find_spec(module) is None:
+            print(f"Skipping {backend}: {module} is not installed")
+            continue
+        runs.extend(parse_run(f"{backend}:{model}") for model in models)
+    return runs
+
+
+def pareto_front(results):
+    """Runs that no other run beats on both WER and p50 latency."""
+    front = []
+    for r in results:
+        dominated = any(o is not r and o['wer'] <= r['wer'] and o['p50_ms'] <= r['p50_ms']
+                        and (o['wer'] < r['wer'] or o['p50_ms'] < r['p50_ms']) for o in results)
+        if not dominated:
+            front.append(r)
+    return front
+
+
+def label(r):
+    return ":".join(part for part in (r['backend'], r['model'], r['quant']) if part)
+
+
+def print_table(results, max_wer=None):
+    scored = [r for r in results if 'error' not in r and r['wer'] is not None]
+    front = pareto_front(scored)
+    print(f"\n   {'backend:model:quant':<34}{'wer':>7}{'p50 ms':>9}{'p90 ms':>9}{'rtf':>8}{'load s':>8}{'peak MB':>9}")
+    for r in sorted(scored, key=lambda r: (r['wer'], r['p50_ms'])):
+        mark = "*" if r in front else " "
+        print(f" {mark} {label(r):<34}{r['wer']:>7.3f}{r['p50_ms']:>9.0f}{r['p90_ms']:>9.0f}"
+              f"{r['rtf']:>8.3f}{r['load_s']:>8.1f}{r['peak_mb']:>9.0f}")
+    for r in results:
+        if 'error' in r:
+            print(f"   {label(r):<34}  failed: {r['error']}")
+    print("\n * Pareto front: no other run is both as accurate and as fast.")
+
+    if max_wer is not None:
+        eligible = [r for r in scored if r['wer'] <= max_wer]
+        if eligible:
+            best = min(eligible, key=lambda r: r['p50_ms'])
+            print(f"Fastest run with WER <= {max_wer:.3f}: {label(best)} "
+                  f"(WER {best['wer']:.3f}, p50 {best['p50_ms']:.0f} ms)")
+        else:
+            print(f"No run reaches WER <= {max_wer:.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("fixtures", help="WAV file or directory of WAV fixtures with .txt transcripts")
+    parser.add_argument("--run", action="append", type=parse_run, metavar="BACKEND:MODEL[:QUANT]",
+                        help="Combination to score; repeatable (default: every installed backend's defaults)")
+    parser.add_argument("--max-wer", type=float, default=None, help="Accuracy bar for the recommendation")
+    parser.add_argument("--output", default=None, help="Results file (default asr_scoreboard_<timestamp>.json)")
+    args = parser.parse_args()
+
+    labelled = [fixture for fixture in load_fixtures(args.fixtures) if fixture.transcript]
+    if not labelled:
+        parser.error(f"No WAV file with a .txt transcript in {args.fixtures}")
+    runs = args.run or default_runs()
+    print(f"{len(labelled)} labelled clip(s), {sum(f.duration for f in labelled):.0f}s of audio, {len(runs)} run(s)")
+
+    results = []
+    for backend, model, quant in runs:
+        print(f"=== {':'.join(part for part in (backend, model, quant) if part)} ===")
+        results.append(run_isolated(backend, model, quant, args.fixtures))
+    print_table(results, args.max_wer)
+
+    output = args.output or f"asr_scoreboard_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.json"
+    with open(output, "w") as f:
+        json.dump({'build': default_build_label(), 'timestamp': datetime.now().isoformat(timespec="seconds"),
+                   'max_wer': args.max_wer, 'runs': results}, f, indent=2)
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""Microphone capture off the asyncio event loop for the LiveKit clients.
+
+capture_microphone used to call the blocking stream.read(480) inside the
+coroutine, which parks the whole event loop for every 10 ms frame and delays the
+LiveKit network tasks and play_audio_track. MicrophoneCapture opens PyAudio in
+callback mode instead: PortAudio's own thread hands each buffer to the loop with
+call_soon_threadsafe, and the coroutine simply awaits the next frame.
+
+The frame queue is bounded. If the consumer falls behind, the oldest frame is
+dropped (live audio is useless once stale) and counted in dropped_frames.
+
+LoopLagMonitor measures how late the event loop wakes up from a short sleep,
+which is the delay every other task on the loop sees.
+"""
+
+import asyncio
+import time
+import pyaudio
+from latencytracker import LogHistogram
+
+
+class MicrophoneCapture:
+    """Async iterator over raw int16 microphone frames captured in PyAudio callback mode."""
+
+    def __init__(self, rate=48000, channels=1, frames_per_buffer=480,
+                 input_device_index=None, max_queued_frames=50):
+        """
+        Args:
+            rate (int): Sample rate in Hz.
+            channels (int): Number of input channels.
+            frames_per_buffer (int): Samples per channel in each frame (480 = 10 ms @ 48 kHz).
+            input_device_index (int): PyAudio device index, None for the default input.
+            max_queued_frames (int): Frames buffered before the oldest is dropped (50 = 0.5 s).
+        """
+        self.rate = rate
+        self.channels = channels
+        self.frames_per_buffer = frames_per_buffer
+        self.input_device_index = input_device_index
+        self.captured_frames = 0
+        self.dropped_frames = 0
+        self.max_queue_depth = 0
+        self._queue = asyncio.Queue(maxsize=max_queued_frames)
+        self._loop = None
+        self._pa = None
+        self._stream = None
+
+    def start(self):
+        """Opens the input stream. Must be called from the event loop thread."""
+        self._loop = asyncio.get_running_loop()
+        self._pa = pyaudio.PyAudio()
+        self._stream = self._pa.open(
+            format=pyaudio.paInt16,
+            channels=self.channels,
+            rate=self.rate,
+            input=True,
+            input_device_index=self.input_device_index,
+            frames_per_buffer=self.frames_per_buffer,
+            stream_callback=self._callback)
+        self._stream.start_stream()
+        return self
+
+    def _callback(self, in_data, frame_count, time_info, status):
+        # Runs on the PortAudio thread: never block here, just hand the bytes over.
+        try:
+            self._loop.call_soon_threadsafe(self._enqueue, in_data)
+        except RuntimeError:
+            return (None, pyaudio.paComplete)  # Event loop already closed
+        return (None, pyaudio.paContinue)
+
+    def _enqueue(self, data):
+        if self._queue.full():
+            self._queue.get_nowait()
+            self.dropped_frames += 1
+        self._queue.put_nowait(data)
+        self.captured_frames += 1
+        depth = self._queue.qsize()
+        if depth > self.max_queue_depth:
+            self.max_queue_depth = depth
+
+    async def read(self):
+        """Returns the next captured frame as bytes."""
+        return await self._queue.get()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        return await self._queue.get()
+
+    def close(self):
+        if self._stream is not None:
+            self._stream.stop_stream()
+            self._stream.close()
+            self._stream = None
+        if self._pa is not None:
+            self._pa.terminate()
+            self._pa = None
+
+    def stats(self):
+        return {
+            'captured_frames': self.captured_frames,
+            'dropped_frames': self.dropped_frames,
+            'max_queue_depth': self.max_queue_depth,
+        }
+
+
+class LoopLagMonitor:
+    """Measures asyncio event-loop scheduling lag by timing a periodic short sleep."""
+
+    def __init__(self, interval=0.01, report_interval=30.0):
+        """
+        Args:
+            interval (float): Seconds slept per probe; 10 ms matches one audio frame.
+            report_interval (float): Seconds between console reports, 0 to disable.
+        """
+        self.interval = interval
+        self.report_interval = report_interval
+        self.histogram = LogHistogram(min_value=0.01, max_value=10000.0)  # ms
+        self._task = None
+
+    def start(self):
+        """Starts probing on the running loop and returns the task."""
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        return self._task
+
+    async def _run(self):
+        last_report = time.monotonic()
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag_ms = (time.perf_counter() - start - self.interval) * 1000
+            self.histogram.record(max(lag_ms, 0.0))
+            now = time.monotonic()
+            if self.report_interval and now - last_report >= self.report_interval:
+                print(f"\n{self.format_summary()}")
+                last_report = now
+
+    def format_summary(self):
+        s = self.histogram.summary()
+        if not s['count']:
+            return "[LOOP LAG] no samples yet"
+        return (f"[LOOP LAG] {s['count']} probes | p50 {s['p50_ms']:.2f}ms  p90 {s['p90_ms']:.2f}ms  "
+                f"p99 {s['p99_ms']:.2f}ms  max {s['max_ms']:.2f}ms")
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
@@ -0,0 +1,197 @@
+"""Recorded audio fixtures and a fake microphone that plays them into a Transcriber.
+
+Every Transcriber listens to a live sr.Microphone, so the only way to try a
+transcriber change used to be talking to it. FakeMicrophone is a
+speech_recognition AudioSource that Transcriber(source=...) listens to like a
+real microphone, except that its stream plays queued fixture audio (and a quiet
+noise floor in between) at real time or a multiple of it.
+
+A fixture is one WAV file holding one utterance, optionally with its reference
+transcript in a .txt file of the same name:
+    fixtures/child01_fisherman.wav
+    fixtures/child01_fisherman.txt   "I see a fisherman in a boat"
+
+WAVs can be any 8/16/32-bit PCM rate and channel count; they are converted to
+16 kHz mono int16.
+"""
+
+import os
+import threading
+import time
+import wave
+
+import numpy as np
+import speech_recognition as sr
+from scipy.signal import resample_poly
+
+SAMPLE_RATE = 16000
+
+
+def load_wav(path, sample_rate=SAMPLE_RATE):
+    """
+    Reads a PCM WAV file as mono int16 at `sample_rate`.
+
+    Args:
+        path (str): WAV file.
+        sample_rate (int): Rate to convert to.
+
+    Returns:
+        np.ndarray: int16 samples.
+    """
+    with wave.open(path, "rb") as wav:
+        width = wav.getsampwidth()
+        channels = wav.getnchannels()
+        rate = wav.getframerate()
+        raw = wav.readframes(wav.getnframes())
+
+    if width == 1:
+        audio = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128.0) * 256.0
+    elif width == 2:
+        audio = np.frombuffer(raw, dtype=np.int16).astype(np.float32)
+    elif width == 4:
+        audio = np.frombuffer(raw, dtype=np.int32).astype(np.float32) / 65536.0
+    else:
+        raise ValueError(f"{path}: unsupported sample width of {width} bytes")
+    if channels > 1:
+        audio = audio.reshape(-1, channels).mean(axis=1)
+    if rate != sample_rate:
+        g = np.gcd(rate, sample_rate)
+        audio = resample_poly(audio, sample_rate // g, rate // g)
+    return np.clip(np.round(audio), -32768, 32767).astype(np.int16)
+
+
+def speech_end(samples, sample_rate=SAMPLE_RATE, threshold=300, frame_ms=30):
+    """Returns the sample index where the last frame louder than `threshold` RMS ends (0 if none)."""
+    frame = sample_rate * frame_ms // 1000
+    n = len(samples) // frame
+    if n == 0:
+        return 0
+    frames = samples[:n * frame].astype(np.float32).reshape(n, frame)
+    loud = np.flatnonzero(np.sqrt(np.mean(frames * frames, axis=1)) > threshold)
+    return int((loud[-1] + 1) * frame) if len(loud) else 0
+
+
+class Fixture:
+    """One recorded utterance and its reference transcript."""
+
+    def __init__(self, name, samples, transcript=None, sample_rate=SAMPLE_RATE):
+        self.name = name
+        self.samples = samples
+        self.transcript = transcript
+        self.sample_rate = sample_rate
+        self.speech_end = speech_end(samples, sample_rate) or len(samples)
+
+    @property
+    def duration(self):
+        return len(self.samples) / self.sample_rate
+
+
+def load_fixtures(path, sample_rate=SAMPLE_RATE):
+    """
+    Loads a WAV file, or every WAV file in a directory (sorted by name).
+
+    Returns:
+        list[Fixture]: Fixtures with their transcripts, where a .txt file exists.
+    """
+    if os.path.isdir(path):
+        paths = [os.path.join(path, name) for name in sorted(os.listdir(path)) if name.lower().endswith(".wav")]
+    else:
+        paths = [path]
+    fixtures = []
+    for wav_path in paths:
+        transcript = None
+        txt_path = os.path.splitext(wav_path)[0] + ".txt"
+        if os.path.exists(txt_path):
+            with open(txt_path, encoding="utf-8") as f:
+                transcript = f.read().strip()
+        name = os.path.splitext(os.path.basename(wav_path))[0]
+        fixtures.append(Fixture(name, load_wav(wav_path, sample_rate), transcript, sample_rate))
+    return fixtures
+
+
+class _FixtureStream:
+    """The `stream` of a FakeMicrophone: read() returns queued audio, paced like a sound card."""
+
+    def __init__(self, microphone):
+        self.microphone = microphone
+
+    def read(self, size):
+        return self.microphone._read(size)
+
+    def close(self):
+        pass
+
+
+class FakeMicrophone(sr.AudioSource):
+    """AudioSource that plays fixtures instead of recording, for Transcriber(source=...)."""
+
+    def __init__(self, sample_rate=SAMPLE_RATE, chunk_size=1024, speed=1.0, noise_level=20, seed=0):
+        """
+        Args:
+            sample_rate (int): Rate of the audio handed to speech_recognition.
+            chunk_size (int): Samples per read, as for sr.Microphone.
+            speed (float): Playback speed; 1.0 is real time, 4.0 four times faster.
+            noise_level (float): RMS of the noise floor played between fixtures, so
+                adjust_for_ambient_noise and the energy threshold see a quiet room.
+            seed (int): Seed of the noise floor.
+        """
+        if speed <= 0:
+            raise ValueError("speed must be positive")
+        self.SAMPLE_RATE = sample_rate
+        self.SAMPLE_WIDTH = 2
+        self.CHUNK = chunk_size
+        self.speed = speed
+        self.noise_level = noise_level
+        self.stream = None
+        self.samples_read = 0
+        self.speech_end_time = None   # perf_counter() when the current fixture's speech was fully read
+        self.played = threading.Event()
+        self._rng = np.random.default_rng(seed)
+        self._lock = threading.Lock()
+        self._pending = np.zeros(0, dtype=np.int16)
+        self._speech_end_at = None    # samples_read value at which the speech of the fixture ends
+        self._start = None
+
+    def __enter__(self):
+        self.stream = _FixtureStream(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stream = None
+
+    def play(self, fixture):
+        """Queues a fixture; `played` is set once all of it has been read."""
+        with self._lock:
+            self._speech_end_at = self.samples_read + len(self._pending) + fixture.speech_end
+            self._pending = np.concatenate([self._pending, fixture.samples])
+            self.speech_end_time = None
+            self.played.clear()
+
+    def _noise(self, n):
+        if self.noise_level <= 0:
+            return np.zeros(n, dtype=np.int16)
+        return (self._rng.standard_normal(n) * self.noise_level).astype(np.int16)
+
+    def _read(self, size):
+        if self._start is None:
+            self._start = time.perf_counter()
+        # Block like a sound card: the chunk is "recorded" once its last sample is due.
+        due = self._start + (self.samples_read + size) / (self.SAMPLE_RATE * self.speed)
+        delay = due - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        with self._lock:
+            chunk = self._pending[:size]
+            self._pending = self._pending[size:]
+            if len(chunk) < size:
+                chunk = np.concatenate([chunk, self._noise(size - len(chunk))])
+            self.samples_read += size
+            now = time.perf_counter()
+            if self._speech_end_at is not None and self.samples_read >= self._speech_end_at:
+                # Back-date to when the last speech sample was due, not when the chunk ended.
+                overshoot = self.samples_read - self._speech_end_at
+                self.speech_end_time = now - overshoot / (self.SAMPLE_RATE * self.speed)
+                self._speech_end_at = None
+            if not len(self._pending):
+                self.played.set()
+        return chunk.tobytes()
@@ -0,0 +1,112 @@
+"""Per-frame audio level and speaking detection for the LiveKit capture/playback loops.
+
+The old loops computed np.sqrt(np.mean(np.abs(frame.astype(np.float64))**2)) on
+every 10 ms frame, which allocates three temporary arrays per frame in each
+direction. FrameMeter copies the int16 samples into a preallocated float32 scratch
+buffer and takes the energy with a single BLAS dot product, so no sample buffers
+are allocated per frame.
+
+SpeechGate replaces the single-threshold "rms > threshold" checks with hysteresis:
+speech starts above on_threshold, and only ends after hangover_frames in a row
+below the lower off_threshold, so levels hovering around one threshold no longer
+flap between speaking and silent.
+
+See bench_audio_metrics.py for the per-frame cost at 100 frames/s.
+"""
+
+import math
+import numpy as np
+
+
+class FrameMeter:
+    """Computes the RMS level of int16 PCM frames without per-frame allocations."""
+
+    def __init__(self, max_samples=960):
+        """
+        Args:
+            max_samples (int): Size of the scratch buffer; grown automatically if a
+                larger frame arrives (960 = 10 ms of 48 kHz stereo).
+        """
+        self._scratch = np.empty(max_samples, dtype=np.float32)
+        self._views = {}
+
+    def _view(self, n):
+        # Cache one scratch view per frame size so steady-state frames create no objects.
+        view = self._views.get(n)
+        if view is None:
+            if n > self._scratch.shape[0]:
+                self._scratch = np.empty(n, dtype=np.float32)
+                self._views.clear()
+            view = self._views[n] = self._scratch[:n]
+        return view
+
+    def energy(self, frame):
+        """Returns the mean square of an int16 frame (ndarray, bytes or memoryview)."""
+        if not isinstance(frame, np.ndarray):
+            frame = np.frombuffer(frame, dtype=np.int16)  # a view, not a copy
+        n = frame.shape[0]
+        if n == 0:
+            return 0.0
+        scratch = self._view(n)
+        np.copyto(scratch, frame, casting='unsafe')
+        return float(np.dot(scratch, scratch)) / n
+
+    def rms(self, frame):
+        """Returns the RMS level of an int16 frame as an int, like the old loops printed."""
+        return int(math.sqrt(self.energy(frame)))
+
+
+class SpeechGate:
+    """Hysteresis speaking detector fed with one RMS value per frame."""
+
+    def __init__(self, on_threshold, off_threshold=None, hangover_frames=100, attack_frames=1):
+        """
+        Args:
+            on_threshold (float): RMS above which speech starts.
+            off_threshold (float): RMS below which a frame counts as silence once
+                speaking. Defaults to 70% of on_threshold.
+            hangover_frames (int): Consecutive silent frames needed to end speech
+                (100 frames = 1 s of 10 ms frames).
+            attack_frames (int): Consecutive loud frames needed to start speech.
+        """
+        self.on_threshold = on_threshold
+        self.off_threshold = off_threshold if off_threshold is not None else 0.7 * on_threshold
+        self.hangover_frames = hangover_frames
+        self.attack_frames = attack_frames
+        self.speaking = False
+        self._loud_frames = 0
+        self._silent_frames = 0
+
+    def update(self, rms):
+        """
+        Feeds the level of the next frame.
+
+        Returns:
+            str: "start" when speech begins, "stop" when it ends, otherwise None.
+        """
+        if not self.speaking:
+            if rms > self.on_threshold:
+                self._loud_frames += 1
+                if self._loud_frames >= self.attack_frames:
+                    self.speaking = True
+                    self._loud_frames = 0
+                    self._silent_frames = 0
+                    return "start"
+            else:
+                self._loud_frames = 0
+            return None
+
+        if rms < self.off_threshold:
+            self._silent_frames += 1
+            if self._silent_frames >= self.hangover_frames:
+                self.speaking = False
+                self._silent_frames = 0
+                return "stop"
+        else:
+            self._silent_frames = 0
+        return None
+
+    def reset(self):
+        self.speaking = False
+        self._loud_frames = 0
+        self._silent_frames = 0
@@ -0,0 +1,160 @@
+"""Streaming resampling and channel conversion for the Pepper audio output path.
+
+Pepper's ALAudioDevice.sendRemoteBufferToOutput plays 48 kHz interleaved stereo
+int16. LiveKit agents may publish at another rate (24 kHz and 16 kHz are common)
+and usually in mono; play_audio_track used to send such audio as-is and upmix
+with np.repeat, allocating a new array for every frame.
+
+StreamingResampler is a rational polyphase FIR resampler (the same filter design
+as scipy.signal.resample_poly) whose filter history is carried from one frame to
+the next, so a stream cut into 10 ms frames resamples exactly like one long signal
+without clicks at the frame boundaries. It writes interleaved stereo into an output
+buffer that is reused across calls.
+"""
+
+from math import gcd
+import numpy as np
+from scipy.signal import firwin
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+class StreamingResampler:
+    """Resamples int16 PCM frames to out_rate and converts them to interleaved stereo."""
+
+    def __init__(self, in_rate, out_rate=48000, in_channels=1, out_channels=2,
+                 max_frame_samples=4800, kaiser_beta=5.0, half_len_factor=10):
+        """
+        Args:
+            in_rate (int): Sample rate of the incoming frames.
+            out_rate (int): Sample rate to produce (48000 for Pepper).
+            in_channels (int): 1 (mono) or 2 (interleaved stereo) input.
+            out_channels (int): 1 or 2 output channels; mono input is duplicated to stereo.
+            max_frame_samples (int): Largest expected input frame per channel; buffers
+                grow if a larger frame arrives.
+            kaiser_beta (float), half_len_factor (int): Anti-aliasing filter design,
+                as in scipy.signal.resample_poly.
+        """
+        if in_channels not in (1, 2) or out_channels not in (1, 2):
+            raise ValueError("Only mono and stereo are supported")
+        self.in_rate = in_rate
+        self.out_rate = out_rate
+        self.in_channels = in_channels
+        self.out_channels = out_channels
+        g = gcd(in_rate, out_rate)
+        self.up = out_rate // g
+        self.down = in_rate // g
+        self.passthrough = self.up == self.down
+
+        if not self.passthrough:
+            max_rate = max(self.up, self.down)
+            half_len = half_len_factor * max_rate
+            h = firwin(2 * half_len + 1, 1.0 / max_rate, window=('kaiser', kaiser_beta)) * self.up
+            h = np.concatenate([h, np.zeros(-len(h) % self.up)])
+            self.taps_per_phase = len(h) // self.up
+            # bank[p] holds the taps of phase p, reversed so a plain dot with the input window works.
+            self._bank = np.ascontiguousarray(h.reshape(-1, self.up).T[:, ::-1], dtype=np.float32)
+            # Output delay introduced by the filter, in output samples
+            self.delay = half_len / self.down
+            self._history = self.taps_per_phase - 1
+            self._pos = 0  # Position of the next output, in upsampled samples from the start of the new input
+            self._coeff_cache = {}
+        else:
+            self.delay = 0
+            self._history = 0
+        self._alloc(max_frame_samples)
+
+    def _alloc(self, max_frame_samples):
+        self._max_in = max_frame_samples
+        self._max_out = max_frame_samples * self.up // self.down + 2
+        # Per-channel input with the filter history in front
+        self._input = np.zeros((self.in_channels, self._history + max_frame_samples), dtype=np.float32)
+        self._out = np.empty((self._max_out, self.out_channels), dtype=np.int16)
+        if not self.passthrough:
+            self._gather = np.empty((self._max_out, self.taps_per_phase), dtype=np.float32)
+            self._y = np.empty((self.in_channels, self._max_out), dtype=np.float32)
+            self._coeff_cache = {}
+
+    def _coefficients(self, length):
+        """Input window index and filter taps of every output computable from `length` new samples."""
+        key = (self._pos, length)
+        cached = self._coeff_cache.get(key)
+        if cached is None:
+            count = max(0, -(-(length * self.up - self._pos) // self.down))
+            m = self._pos + np.arange(count) * self.down
+            window_index = m // self.up
+            coeffs = self._bank[m % self.up]
+            if len(self._coeff_cache) > 16:  # Frame sizes are normally constant; keep this tiny
+                self._coeff_cache.clear()
+            cached = self._coeff_cache[key] = (count, window_index, coeffs)
+        return cached
+
+    def process(self, pcm):
+        """
+        Resamples one frame.
+
+        Args:
+            pcm: int16 samples (bytes, memoryview or ndarray), interleaved if stereo.
+
+        Returns:
+            np.ndarray: int16 array of shape (n, out_channels). It is a view of the
+                reused output buffer, valid until the next call; pass its .data to
+                PepperAudioSender.push or call .tobytes() to keep it.
+        """
+        x = pcm if isinstance(pcm, np.ndarray) else np.frombuffer(pcm, dtype=np.int16)
+        length = x.shape[0] // self.in_channels
+        if length > self._max_in:
+            self._grow(length)
+        frames = x.reshape(length, self.in_channels)
+
+        if self.passthrough:
+            out = self._out[:length]
+            if self.in_channels == self.out_channels:
+                return frames
+            if self.in_channels == 1:
+                out[:, 0] = frames[:, 0]
+                out[:, 1] = frames[:, 0]
+            else:
+                # Stereo to mono: average in float32 scratch, no new arrays
+                y = self._input[0, :length]
+                np.add(frames[:, 0], frames[:, 1], out=y, dtype=np.float32)
+                y *= 0.5
+                out[:, 0] = y
+            return out
+
+        hist = self._history
+        buf = self._input[:, :hist + length]
+        buf[:, hist:] = frames.T
+        count, window_index, coeffs = self._coefficients(length)
+        gather = self._gather[:count]
+        for c in range(self.in_channels):
+            windows = sliding_window_view(buf[c], self.taps_per_phase)
+            np.take(windows, window_index, axis=0, out=gather)
+            np.einsum('jk,jk->j', gather, coeffs, out=self._y[c, :count])
+
+        y = self._y[:, :count]
+        np.clip(y, -32768, 32767, out=y)
+        np.rint(y, out=y)
+        out = self._out[:count]
+        if self.in_channels == self.out_channels:
+            out[:] = y.T
+        elif self.in_channels == 1:
+            out[:, 0] = y[0]
+            out[:, 1] = y[0]
+        else:
+            out[:, 0] = (y[0] + y[1]) * 0.5
+
+        # Keep the last taps_per_phase - 1 input samples for the next frame.
+        buf[:, :hist] = buf[:, length:length + hist]
+        self._pos += count * self.down - length * self.up
+        return out
+
+    def _grow(self, length):
+        history = self._input[:, :self._history].copy()
+        self._alloc(length)
+        self._input[:, :self._history] = history
+
+    def reset(self):
+        """Forgets the filter history, e.g. between two unrelated streams."""
+        self._input[:] = 0
+        if not self.passthrough:
+            self._pos = 0
@@ -0,0 +1,135 @@
+"""Benchmark: parsing an EmoEx SSE stream with SSEClient vs chat_master/src/sse_parser.py.
+
+Replays raw SSE transcripts (the bytes of a /chat/assist response body) through
+    old  sseclient-py SSEClient + json.loads and a dict walk per delta, fed the
+         128-byte pieces that iterating a requests response produces
+    new  SSEParser + extract_delta_text, fed the same 128-byte pieces
+    new  SSEParser + extract_delta_text, fed 16 KiB socket reads
+and checks that every parser returns the same text.
+
+Without transcript files a synthetic one shaped like an EmoEx reply is used
+(thread.message.created / in_progress, one delta per word, completed). To record
+a real transcript, save response.content of a /chat/assist request to a file.
+The old parser is skipped if sseclient-py is not installed.
+
+Usage:
+    python bench_sse_parser.py [transcript.sse ...] [--repeat 200] [--words 400]
+"""
+
+import argparse
+import json
+import time
+from chat_master.src.sse_parser import iter_events, extract_delta_text
+
+try:
+    from sseclient import SSEClient
+except ImportError:
+    SSEClient = None
+
+
+def synthetic_transcript(words=400, seed_text="The fisherman saw a little cat sitting by the boat"):
+    """Builds an SSE body like the ones the EmoEx API relays from the assistant thread."""
+    vocabulary = seed_text.split()
+    message_id = "msg_abc123DEF456ghi789"
+    parts = []
+
+    def event(name, payload):
+        parts.append(f"event: {name}\ndata: {json.dumps(payload, separators=(',', ':'))}\n\n")
+
+    base = {"id": message_id, "object": "thread.message", "created_at": 1735000000,
+            "thread_id": "thread_xyz987", "role": "assistant", "content": [], "status": "in_progress"}
+    event("thread.message.created", base)
+    event("thread.message.in_progress", base)
+    text = []
+    for i in range(words):
+        word = vocabulary[i % len(vocabulary)] + ("." if i % 12 == 11 else "")
+        piece = word if i == 0 else " " + word
+        text.append(piece)
+        event("thread.message.delta", {
+            "id": message_id, "object": "thread.message.delta",
+            "delta": {"content": [{"index": 0, "type": "text", "text": {"value": piece, "annotations": []}}]}})
+        if i % 50 == 49:
+            parts.append(": keep-alive\n\n")
+    event("thread.message.completed", dict(base, status="completed", content=[
+        {"type": "text", "text": {"value": "".join(text), "annotations": []}}]))
+    return "".join(parts).encode("utf-8")
+
+
+def split_chunks(body, size):
+    return [body[i:i + size] for i in range(0, len(body), size)]
+
+
+def parse_old(chunks):
+    text = []
+    for event in SSEClient(iter(chunks)).events():
+        if event.event == 'thread.message.delta':
+            event_json_data = json.loads(event.data)
+            if 'delta' in event_json_data and 'content' in event_json_data['delta']:
+                for content_item in event_json_data['delta']['content']:
+                    if content_item.get('type') == 'text' and 'text' in content_item:
+                        value = content_item['text'].get('value')
+                        if value:
+                            text.append(value)
+        elif event.event == 'thread.message.completed':
+            break
+    return "".join(text)
+
+
+def parse_new(chunks):
+    text = []
+    for event in iter_events(chunks):
+        if event.event == 'thread.message.delta':
+            value = extract_delta_text(event.data)
+            if value:
+                text.append(value)
+        elif event.event == 'thread.message.completed':
+            break
+    return "".join(text)
+
+
+def measure(fn, chunks, repeat):
+    fn(chunks)  # warm-up
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn(chunks)
+    return (time.perf_counter() - start) / repeat, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("transcripts", nargs="*", help="Raw SSE response bodies to replay")
+    parser.add_argument("--repeat", type=int, default=200, help="Replays timed per case")
+    parser.add_argument("--words", type=int, default=400, help="Words in the synthetic transcript")
+    args = parser.parse_args()
+
+    bodies = []
+    for path in args.transcripts:
+        with open(path, "rb") as f:
+            bodies.append((path, f.read()))
+    if not bodies:
+        bodies.append((f"synthetic ({args.words} deltas)", synthetic_transcript(args.words)))
+    if SSEClient is None:
+        print("sseclient-py is not installed: skipping the old parser.")
+
+    print(f"{'transcript':<28}{'parser':<30}{'ms/stream':>11}{'us/delta':>10}{'speedup':>9}")
+    for name, body in bodies:
+        deltas = body.count(b"event: thread.message.delta")
+        cases = [("new, 16 KiB reads", parse_new, split_chunks(body, 16384)),
+                 ("new, 128 B pieces", parse_new, split_chunks(body, 128))]
+        if SSEClient is not None:
+            cases.insert(0, ("old SSEClient, 128 B pieces", parse_old, split_chunks(body, 128)))
+        baseline = None
+        reference = None
+        for label, fn, chunks in cases:
+            seconds, text = measure(fn, chunks, args.repeat)
+            if reference is None:
+                reference = text
+            elif text != reference:
+                print(f"  MISMATCH: {label} returned different text")
+            baseline = baseline or seconds
+            print(f"{name[:27]:<28}{label:<30}{seconds * 1e3:>11.3f}{seconds * 1e6 / max(deltas, 1):>10.2f}"
+                  f"{baseline / seconds:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,8 @@ import concurrent.futures
 import time
 from collections import deque
 from latencytracker import LatencyTracker
+from audio_metrics import FrameMeter, SpeechGate
+from audio_capture import MicrophoneCapture, LoopLagMonitor
 
 dotenv.load_dotenv(".env.livekit")
 USER_TOKEN = dotenv.get_key(".env.livekit", "USER_TOKEN")
@@ -14,6 +16,7 @@ ROOM_NAME = dotenv.get_key(".env.livekit", "ROOM_NAME")
 WS_URL = dotenv.get_key(".env.livekit", "LIVEKIT_URL")
 
 latency_tracker = LatencyTracker()
+loop_lag_monitor = LoopLagMonitor()
 
 async def play_audio_track(track: rtc.RemoteAudioTrack):
     pa = pyaudio.PyAudio()
@@ -22,11 +25,11 @@ async def play_audio_track(track: rtc.RemoteAudioTrack):
     
     stream = None
     # frame_count = 0
-    agent_was_speaking = False
     # silence_start = None
     first_frame = True
-    silence_frames = 0
-    silence_threshold_frames = int(latency_tracker.silence_duration * 100)  # ~100 frames/sec
+    meter = FrameMeter()
+    agent_gate = SpeechGate(latency_tracker.agent_silence_threshold,
+                            hangover_frames=int(latency_tracker.silence_duration * 100))  # ~100 frames/sec
     
     
     with concurrent.futures.ThreadPoolExecutor(max_workers=1) as pool:
@@ -50,38 +53,20 @@ async def play_audio_track(track: rtc.RemoteAudioTrack):
                 audio_bytes = frame.data.tobytes()
                 # run the blocking write in a thread
                 if len(audio_bytes) > 0:
-                    audio_array = np.frombuffer(audio_bytes, np.int16)
-                    mean_square = np.mean(audio_array.astype(np.float64)**2)
-                    
-                    
-                    # rms = int(np.sqrt(mean_square)) if mean_square 0 else 0
-                    if not np.isnan(mean_square) and mean_square >= 0:
-                        rms = int(np.sqrt(mean_square))
-                        # Only print when agent is speaking loudly
-                        if rms > 100:
-                            print(f"[Agent speaking: RMS {rms}]", end=' ', flush=True)
-                    else:
-                        rms = 0
+                    rms = meter.rms(frame.data)
+                    # Only print when agent is speaking loudly
+                    if rms > 100:
+                        print(f"[Agent speaking: RMS {rms}]", end=' ', flush=True)
                 
-                # Detect when agent starts/stops speaking
-                    is_speaking = rms > latency_tracker.agent_silence_threshold
-                    
-                    if is_speaking:
-                        silence_frames = 0
-                        if not agent_was_speaking:
-                            # Agent started speaking
-                            latency_tracker.agent_started_responding()
-                            agent_was_speaking = True
-                    else:
-                        if agent_was_speaking:
-                            silence_frames += 1
-                            if silence_frames >= silence_threshold_frames:
-                                # Agent confirmed stopped speaking
-                                latency_tracker.agent_stopped_responding()
-                                agent_was_speaking = False
-                                silence_frames = 0
+                    # Detect when agent starts/stops speaking
+                    transition = agent_gate.update(rms)
+                    if transition == "start":
+                        latency_tracker.agent_started_responding()
+                    elif transition == "stop":
+                        # Agent confirmed stopped speaking
+                        latency_tracker.agent_stopped_responding()
                 
-                await loop.run_in_executor(pool, stream.write, frame.data.tobytes())
+                await loop.run_in_executor(pool, stream.write, audio_bytes)
         finally:
             if stream:
                 stream.stop_stream()
@@ -103,57 +88,38 @@ async def publish_microphone(local: rtc.LocalParticipant):
 
 async def capture_microphone(source: rtc.AudioSource):
     """Read microphone frames and push them into the source."""
-    pa = pyaudio.PyAudio()
-    stream = pa.open(
-        format=pyaudio.paInt16,
-        channels=1,
-        rate=48000,
-        input=True,
-        frames_per_buffer=480)          # 10 ms @ 48 kHz
+    # PyAudio runs in callback mode on its own thread; frames arrive through a bounded queue.
+    capture = MicrophoneCapture(rate=48000, channels=1, frames_per_buffer=480).start()  # 10 ms @ 48 kHz
     
-    user_was_speaking = False
-    silence_frames = 0
-    silence_threshold_frames = int(latency_tracker.silence_duration * 100)
+    meter = FrameMeter()
+    user_gate = SpeechGate(latency_tracker.user_silence_threshold,
+                           hangover_frames=int(latency_tracker.silence_duration * 100))
     
     try:
-        while True:
-            data = stream.read(480, exception_on_overflow=False)
-            frame = np.frombuffer(data, dtype=np.int16)
-            
+        async for data in capture:
             # Calculate RMS for visual feedback
-            rms = int(np.sqrt(np.mean(np.abs(frame.astype(np.float64))**2)))
+            rms = meter.rms(data)
             if rms > 50:
                 bar_length = min(30, rms // 100)
                 bar = "█" * bar_length
                 print(f"\r{bar:<30} {rms:4d}", end='', flush=True)
                         
-            is_speaking = rms > latency_tracker.user_silence_threshold
-            
-            if is_speaking:
-                silence_frames = 0
-                if not user_was_speaking:
-                    # User started speaking
-                    latency_tracker.user_started_speaking()
-                    user_was_speaking = True
-                
-            else:
-                if user_was_speaking:
-                    silence_frames += 1
-                if silence_frames >= silence_threshold_frames:
-                    # Confirmed end of speech
-                    latency_tracker.user_stopped_speaking()
-                    user_was_speaking = False
-                    silence_frames = 0
+            transition = user_gate.update(rms)
+            if transition == "start":
+                # User started speaking
+                latency_tracker.user_started_speaking()
+            elif transition == "stop":
+                # Confirmed end of speech
+                latency_tracker.user_stopped_speaking()
 
             await source.capture_frame(rtc.AudioFrame(
-                data=frame.tobytes(),
+                data=data,
                 sample_rate=48000,
                 samples_per_channel=480,
                 num_channels=1))
     finally:
-        stream.stop_stream()
-        stream.close()
-        pa.terminate()
+        capture.close()
+        print(f"\n[CAPTURE] {capture.stats()}")
 
 
 async def main() -> None:
@@ -185,6 +151,7 @@ async def main() -> None:
     print("="*60)
     print("Speak into your mic. Latency will be calculated.")
     print("Press Ctrl+C to exit and see final statistics.\n")
+    loop_lag_monitor.start()
     
     await publish_microphone(room.local_participant)
 
@@ -197,21 +164,17 @@ async def main() -> None:
         await asyncio.Event().wait()  # Keep running until interrupted
     except KeyboardInterrupt:
         print("\nInterrupted. Leaving...")
-        print("\n\nFinal Latency Statistics:")
-        print("="*60)
-        stats = latency_tracker.get_stats()
-        if isinstance(stats, dict):
-            # print(f"  Total Conversations: {stats['total_turns']}")
-            print(f"  Average latency: {stats['average_ms']:.0f}ms")
-            print(f"  Min latency: {stats['min_ms']:.0f}ms")
-            print(f"  Max latency: {stats['max_ms']:.0f}ms")
-            print(f"  Measurements: {stats['count']}")
-        else:
-            print("  No meaningful latency measurements recorded.")
-            print(f"  {stats}")
-        print("="*60 + "\n")
+        latency_tracker.print_final_stats()
     finally:
+        latency_tracker.maybe_report(force=True)  # Latencies since the last periodic report
+        loop_lag_monitor.stop()
+        print(loop_lag_monitor.format_summary())
         await room.disconnect()
+        stats_file = latency_tracker.save_stats()
+        if stats_file:
+            print(f"Latency histograms saved to: {stats_file}")
+        if latency_tracker.tracer.enabled:
+            print(f"Latency trace saved to: {latency_tracker.tracer.export_chrome_trace('livekit_trace.json')}")
 
 if __name__ == "__main__":
     asyncio.run(main())
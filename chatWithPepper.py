@@ -1,15 +1,41 @@
 import time
-import qi
 import argparse
 import requests
-import re
 from datetime import datetime
 from classTranscriber import Transcriber
 from chat_master.src.classChatbot import Chatbot
 from Pepper_actions import pepper_wave, record_video
+from session_logger import SessionLogger, jsonl_to_text
+from turn_tracer import get_tracer
+from phrase_cache import PhraseCache
+from response_cache import CachedChatbot, DAY
+from pepper_mic_source import PepperMicrophone
+from fake_naoqi import new_session, fake_requested
+from intent_classifier import IntentClassifier, ends_phrase, YES, NO, QUIT, BACK, GOTO, READINESS, NAVIGATION
 # from classChatGemini import GeminiChatbot as Chatbot
 
 
+tracer = get_tracer()
+
+# Fixed sentences of the main session flow, pre-synthesized once and played through ALAudioPlayer.
+# The text must match the tts.say calls exactly (including the curly apostrophes).
+CANNED_PHRASES = [
+    "Awesome! Let's begin.",
+    "That's okay. We can try again later. Bye!",
+    "I'll take that as a yes. Let's get's started!",
+    "Take your time. I'm listening...",
+    "I didn’t hear anything. Maybe next time!",
+    "You will now be shown a short story in pictures.",
+    "Okay, we’ll stop here. Goodbye!",
+    "I didn’t hear anything clear. Can you try again?",
+    "I had trouble understanding that. I think I have a headache. Ouch!",
+    "That's okay. We can move to the next picture.",
+    "Fantastic! Can you invent your own continuation of the story.",
+    "Great! Now you can invent your own continuation of the story. What happens next?",
+    "Thanks for your story! That’s the end of this activity.",
+    "Okay, story time is over. That was fun!",
+    "It seems you're done. Thank you for your story!",
+]
 
 def timestamped_entry(s):
     return f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {s}"
@@ -27,20 +53,6 @@ def show_on_tablet(session, tts):
         print("Could not connect to ALTabletService. Tablet features may not be available.")
         print(f"Error: {e}")
 
-def navigation_command(phrase, total_pics):
-    """Returns new index if navigation, otherwise None."""
-    phrase = phrase.lower()
-    # Back/previous
-    if "back" in phrase or "previous" in phrase:
-        return "BACK"
-    # Find a number in the phrase (e.g., "picture 2", "go to 3")
-    match = re.search(r"(\d+)", phrase)
-    if match:
-        num = int(match.group(1))
-        if 1 <= num <= total_pics:
-            return num - 1  # zero-indexed
-    return None
-
 def run_stage_a_robotic(session, tts, transcriber, chatbot, picture_urls):
     """
     Stage A: For each picture, this stage prompts the child, waits up to 30 s for a response,
@@ -142,6 +154,7 @@ def main0():
     This helps the application decide when to finish accumulating input and send the captured transcription to the chatbot for processing. Without it, the transcriber could wait indefinitely during gaps in speech, delaying the conversation or causing unwanted behavior.'''
     max_wait_time = 10 #seconds to wait for user input before ending conversation
     #Connection to Pepper's Qi session
+    import qi  # Only here: the session scripts also run on a fake session, without the NAOqi SDK
     try:
         print(f"Connecting to Pepper at {args.ip}:{args.port}...")
         session = qi.Session()
@@ -249,135 +262,126 @@ def main0():
     for entry in conversation_history:
         print(entry)
 
-def log_interaction(exp_event, ai_context, ai_instruction, child_transcript, ai_response):
-    """
-    This formats a complete log entry and appends it to the global conversation_history.
-    """
-    log_entry = (
-        f"--- INTERACTION TURN ---\n"
-        f"EXP-EVENT: {exp_event}\n"
-        f"AI-CONTEXT: {ai_context}\n"
-        f"AI-INSTRUCTION: {ai_instruction}\n"
-        f"CHILD-TRANSCRIPT: {child_transcript}\n"
-        f"AI_RESPONSE: {ai_response}\n"
-        f"------------------------\n\n"
-    )
-    # This structured log entry is appended to the conversation history list.
-    conversation_history.append(timestamped_entry(log_entry))
-
-def main():
-    #This is the main function for the experiment with Pepper, where it shows a story in pictures and interacts with the child.
-    #This is still a work in progress, but it should be functional.
-    parser = argparse.ArgumentParser()
-    parser.add_argument("--ip", type=str, default="127.0.0.1",
-                        help="Robot IP address. On robot or Local Naoqi: use '127.0.0.1'.")
-    parser.add_argument("--port", type=int, default=9559,
-                        help="Naoqi port number")
-
-    args = parser.parse_args()
-    # --- NEW: Generate a unique session ID and filename at the start ---
-    session_timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-    log_filename = f"chat_history_{session_timestamp}.txt"
-
-    global conversation_history 
-    conversation_history = []
-    app_id = "my_fisherman_story_app"
-    image_file1 = "The_fisherman_and_the_cat_1n2.jpg" 
-    # List your picture URLs (hosted in your html/ folder):
-    app_id = "my_fisherman_story_app"
-    image_file1 = "The_fisherman_and_the_cat_1n2.jpg"  # Change to your image file
-
-    pics = [
+# Story pictures, hosted in the app's html/ folder on the robot
+app_id = "my_fisherman_story_app"
+image_file1 = "The_fisherman_and_the_cat_1n2.jpg"  # Change to your image file
+STORY_PICTURES = [
     f"http://198.18.0.1/apps/{app_id}/{image_file1}",
     f"http://198.18.0.1/apps/{app_id}/The_fisherman_and_the_cat_3n4.jpg",
     f"http://198.18.0.1/apps/{app_id}/The_fisherman_and_the_cat_5n6.jpg",
-    ]
+]
 
-    try:
-        print(f"Connecting to Pepper at {args.ip}:{args.port}...")
-        session = qi.Session()
-        session.connect(args.ip + ":" + str(args.port))
-        print("Connected to Pepper's NAOqi session.")
-    except Exception as e:
-        print(f"Could not connect to Pepper at {args.ip}:{args.port}. Please check the IP and port.")
-        return
-    print("Connected to Pepper successfully.")
-    
-    # Initialize Pepper's TextToSpeech service
-    tts = session.service("ALTextToSpeech")
-    tts.setLanguage("English")  # Setting language to English
-    tts.setVolume(0.8)  # Setting volume, max is 1.0
+TRANSCRIBER_SETTINGS = dict(
+    model="turbo",
+    energy_threshold=600,
+    max_record_duration=2,
+    max_phrase_duration=3,
+    default_microphone="HDA Intel PCH: ALC897 Analog (hw:0,0)", #HDA Intel PCH: ALC3266 Analog (hw:0,0)"
+)
 
-    transcriber = Transcriber(
-        model="turbo",
-        energy_threshold=600,
-        max_record_duration=2,
-        max_phrase_duration=3,
-        default_microphone="HDA Intel PCH: ALC897 Analog (hw:0,0)" #HDA Intel PCH: ALC3266 Analog (hw:0,0)"
-    )
 
-    chatbotAlive = Chatbot()
+class ChildSession:
+    """
+    One child's session with one robot: greeting, Stage A (pictures) and Stage B (storytelling).
 
-    if not chatbotAlive.authenticate():
-        print("Authentication failed. Pepper isn't going to talk.")
-        return
-    # tts.say("If you don't like to talk now, \nJust say 'quit' or 'stop' to end our conversation)")
-    print("Authentication successful. Starting transcription. \n(Say 'quit', 'exit', or 'stop' to end conversation)")
-    
-    # This is when the conversation starts
-    conversation_start_time = datetime.now()
+    Everything a session touches (NAOqi session, speech, transcriber, chatbot, log
+    and tracer) lives on the instance, so several sessions can run side by side
+    in one process (see session_supervisor.py).
+    """
 
-    greeting = chatbotAlive.get_response("greet")
-    #pepper_wave(session, args.ip, args.port) #Optional: Pepper waves the child
-    print(f"Pepper: {greeting}")
-    conversation_history.append(timestamped_entry(f"Pepper: {greeting}\n"))
-    conversation_history.append(f"Pepper: {greeting}\n")
-    tts.say(greeting)
-    time.sleep(1.5)  # A brief pause to let the prompt complete`
-    conversation_history.append(timestamped_entry(f"Pepper: {greeting}\n"))
-    transcriber.reset()
-    # Listen for readiness confirmation from child
-    wait_start = time.time()
-    max_wait = 20  # seconds
-    confirmed = False
-
-    while time.time() - wait_start < max_wait:
-        phrase = transcriber.get_transcription().strip().lower()
-
-        if phrase in ["yes", "yeah", "i'm ready", "ready", "sure", "okay"]:
-            confirmed = True
-            tts.say("Awesome! Let's begin.")
-            conversation_history.append(timestamped_entry("Child: " + phrase + "\n"))
-            break
-        elif phrase in ["no", "not now", "i'm not ready", "maybe later"]:
-            tts.say("That's okay. We can try again later. Bye!")
-            return
-        elif phrase:
-            # Unexpected input
-            conversation_history.append(timestamped_entry("Child: " + phrase + "\n"))
-            tts.say("I'll take that as a yes. Let's get's started!")
-            confirmed = True
-            break
-        else:
-            tts.say("Take your time. I'm listening...")
-            time.sleep(2)
+    def __init__(self, session, tts, transcriber, chatbot, picture_urls, log, tracer, robot=""):
+        """
+        Args:
+            session: Connected qi.Session of the robot.
+            tts: ALTextToSpeech, or a PhraseCache wrapping it.
+            transcriber (Transcriber): Listens to this child.
+            chatbot: Chatbot, GeminiChatbot or CachedChatbot.
+            picture_urls (list): Story pictures shown on the tablet in Stage A.
+            log (SessionLogger): This session's log.
+            tracer (TurnTracer): This session's tracer.
+            robot (str): Label of the robot, written to the log.
+        """
+        self.session = session
+        self.tts = tts
+        self.transcriber = transcriber
+        self.chatbot = chatbot
+        self.picture_urls = picture_urls
+        self.log = log
+        self.tracer = tracer
+        self.robot = robot
+        self.intents = IntentClassifier()
+
+    def log_interaction(self, exp_event, ai_context, ai_instruction, child_transcript, ai_response,
+                        prompt=None, timings=None):
+        """
+        This records a complete interaction turn in this session's log.
+        timings holds the per-stage durations of the turn in seconds (asr_s, llm_s, tts_s).
+        """
+        self.log.turn(
+            exp_event=exp_event,
+            ai_context=ai_context,
+            ai_instruction=ai_instruction,
+            transcript=child_transcript,
+            response=ai_response,
+            prompt=prompt,
+            timings=timings,
+        )
 
-    if not confirmed:
-        tts.say("I didn’t hear anything. Maybe next time!")
-        return
+    def is_quit(self, phrase):
+        """True if the child asked to stop ("stop", "I want to stop", "I'm done", ...)."""
+        return bool(phrase) and self.intents.classify(phrase, allowed=(QUIT,)).name == QUIT
+
+    def run(self):
+        """Greets the child, waits for readiness, then runs Stage A and Stage B."""
+        greeting = self.chatbot.get_response("greet", category="greeting")
+        #pepper_wave(self.session, args.ip, args.port) #Optional: Pepper waves the child
+        print(f"Pepper: {greeting}")
+        self.log.utterance("Pepper", greeting)
+        self.tts.say(greeting)
+        time.sleep(1.5)  # A brief pause to let the prompt complete`
+        self.transcriber.reset()
+        # Listen for readiness confirmation from child
+        wait_start = time.time()
+        max_wait = 20  # seconds
+        confirmed = False
+
+        while time.time() - wait_start < max_wait:
+            phrase = self.transcriber.get_transcription().strip().lower()
+            intent = self.intents.classify(phrase, allowed=READINESS) if phrase else None
+
+            if intent and intent.name == YES:
+                confirmed = True
+                self.tts.say("Awesome! Let's begin.")
+                self.log.utterance("Child", phrase)
+                break
+            elif intent and intent.name in (NO, QUIT):
+                self.tts.say("That's okay. We can try again later. Bye!")
+                return
+            elif phrase:
+                # Unexpected input
+                self.log.utterance("Child", phrase)
+                self.tts.say("I'll take that as a yes. Let's get's started!")
+                confirmed = True
+                break
+            else:
+                self.tts.say("Take your time. I'm listening...")
+                time.sleep(2)
+
+        if not confirmed:
+            self.tts.say("I didn’t hear anything. Maybe next time!")
+            return
 
 
-    # Run Stage A
-    try:
-        if run_stage_a(session, tts, transcriber, chatbotAlive, pics):
+        # Run Stage A
+        if self.run_stage_a():
         # All pictures assumed shown (or child finished early) → Stage B…
         # Transitioning to “creating a story” here
             stage_b_prompt = "Fantastic! Can you invent your own continuation of the story."
-            tts.say(stage_b_prompt)
+            self.tts.say(stage_b_prompt)
             time.sleep(1.5)  # A brief pause to let the prompt complete before starting Stage B``
-            transcriber.reset()
-            conversation_history.append(timestamped_entry(f"Pepper: {stage_b_prompt}\n"))
-            log_interaction(
+            self.transcriber.reset()
+            self.log.utterance("Pepper", stage_b_prompt)
+            self.log_interaction(
                 exp_event="starting stage B",
                 ai_context="child has finished describing pictures",
                 ai_instruction=stage_b_prompt,
@@ -386,18 +390,509 @@ def main():
             )   
 
             # Start Stage B conversation loop
-            run_stage_b(session, tts, transcriber, chatbotAlive)
-        else:
-        # Child asked to stop            print(f"Loading Whisper model: {model}")
-            return
+            self.run_stage_b()
+        # else: Child asked to stop
+
+    def run_stage_a(self):
+        print("Running Stage A: Showing pictures and collecting responses sequentially...")
+        tablet = self.session.service("ALTabletService")
+        max_picture_time = 180 #Average of 5 minutes per picture
+
+        intro_instruction = "You will now be shown a short story in pictures."
+        self.tts.say(intro_instruction)
+        self.log.utterance("Pepper", intro_instruction)
+
+        for picture_number, picture_url in enumerate(self.picture_urls, start=1):
+            exp_event = f"showing picture {picture_number}"
+            print(f"Picture url: {picture_url}")
+            ai_context = exp_event
+
+            ai_instruction = f"This is picture {picture_number}. Can you tell me about it?"
+            self.tts.say(ai_instruction)
+            self.log.utterance("Pepper", ai_instruction)
+
+            time.sleep(1.5)  # A brief pause to let the prompt complete`
+            self.transcriber.reset()
+            print(f"picture {picture_number} of {len(self.picture_urls)}: {picture_url}")
+            tablet.showImage(picture_url)
+
+            # Time picture starts to be shown
+            picture_start_time = time.time()
+
+            # Show an HTML page instead of an image
+            # This is optional, but it can be used to provide a more interactive experience.
+            # render_interactive_page(self.session)
+
+            attempts = 0
+            while attempts < 3:
+                # Waits for up to 30 seconds, loops (retrying) up to 3 times
+                if time.time() - picture_start_time >= max_picture_time:
+                    print("Time limit reached for this picture. Moving on...")
+                    break
+
+                user_transcriptions = []
+                wait_start_time = time.time()
+                prompted = False
+                max_wait_time = 3  # seconds of total silence allowed per speech attempt. If time of silence exceeds this, the statement is considered complete.
+
+                print("Listening for the child's response...")
+                self.tracer.begin_turn(exp_event)
+                listen_start = time.monotonic()
+                while True:
+                    phrase = self.transcriber.get_transcription().strip()
+                    if self.is_quit(phrase):
+                        wave = pepper_wave(self.session, wait=False, stand=False)  # Waves while saying goodbye
+                        self.tts.say("Okay, we’ll stop here. Goodbye!")
+                        wave.wait()
+                        self.transcriber.reset()
+                        return False
+
+                    if phrase:
+                        user_transcriptions.append(phrase)
+                        wait_start_time = time.time()  # reset timer after hearing something
+                        prompted = False
+                        print(f"Captured: {phrase}")
+
+                    else:
+                        if not prompted:
+                            print("Waiting... (child may still be speaking)")
+                            prompted = True
+
+                        if time.time() - wait_start_time > max_wait_time:
+                            break  # silence for too long → finish transcription for this attempt
+
+                # Processes the accumulated transcription:
+                timings = {"asr_s": round(time.monotonic() - listen_start, 3)}
+                full_transcription = " ".join(user_transcriptions)
+                if not full_transcription:
+                    self.tts.say("I didn’t hear anything clear. Can you try again?")
+                    time.sleep(1.5)  # A brief pause to let the prompt complete before starting Stage B``
+                    self.transcriber.reset()
+                    attempts += 1
+                    continue
+
+                if full_transcription.strip():
+                    self.log.utterance("You said", full_transcription)
+
+                print(f"You said: {full_transcription}") # This provides feedback to the console.
+
+                prompt = (
+                    f"EXP-EVENT: {exp_event}\n"
+                    f"AI-CONTEXT: {ai_context}\n"
+                    f"AI-INSTRUCTION: {ai_instruction}\n"
+                    f"CHILD-TRANSCRIPT: {full_transcription}"
+                )
+
+                try:
+                    llm_start = time.monotonic()
+                    response = self.chatbot.get_response(prompt)
+                    timings["llm_s"] = round(time.monotonic() - llm_start, 3)
+                    print(f"Pepper said: {response}") # Prints the Pepper's response to the console.
+                    self.log.utterance("Pepper", response)
+                    tts_start = time.monotonic()
+                    with self.tracer.span("tts"):
+                        self.tts.say(response.replace("##SATISFACTORY##", "").replace("##UNCLEAR##", "").replace("##NOT INTERESTED##", ""))
+                    timings["tts_s"] = round(time.monotonic() - tts_start, 3)
+                    if self.tracer.enabled:
+                        print(self.tracer.format_turn_summary())
+                    self.log_interaction(
+                            exp_event=exp_event,
+                            ai_context=ai_context,
+                            ai_instruction=ai_instruction,
+                            child_transcript=full_transcription,
+                            ai_response=response,
+                            prompt=prompt,
+                            timings=timings
+                        )
+                    time.sleep(1.5)  # A brief pause to let the prompt complete before starting Stage B``
+                    self.transcriber.reset()
+                    user_transcriptions.clear()  # Clear transcriptions after sending to chatbot
+                except Exception as e:
+                    print(f"Error during chatbot response: {e}")
+                    self.tts.say("I had trouble understanding that. I think I have a headache. Ouch!")
+                    time.sleep(1.5)  # A brief pause to let the prompt complete before starting Stage B``
+                    self.transcriber.reset()
+                    attempts += 1
+                    continue
+
+
+                if "##SATISFACTORY##" in response or "##NOT INTERESTED##" in response:
+                    break  # move on to next picture
+
+                if "##SATISFACTORY##" in response and not phrase and time.time() - wait_start_time > 10:
+                    self.tts.say("That's okay. We can move to the next picture.")
+                    time.sleep(1)  # A brief pause to let the prompt complete before starting Stage B``
+
+                    break
+
+                attempts += 1
+
+            tablet.hideImage()
+        return True
+
+    def run_stage_b(self, max_stage_duration=300):
+        """
+        Stage B: Free storytelling with a 5-minute max session time.
+        """
+        self.tts.say("Great! Now you can invent your own continuation of the story. What happens next?")
+        time.sleep(1.5)  # A brief pause to let the prompt complete before starting Stage B``
+        print("Story creation phase started.")
+        stage_start_time = time.time()
+
+        wait_start_time = stage_start_time
+        while True:
+            if time.time() - stage_start_time > max_stage_duration:
+                self.tts.say("Thanks for your story! That’s the end of this activity.")
+                break
+
+            self.tracer.begin_turn("stage B")
+            listen_start = time.monotonic()
+            phrase = self.transcriber.get_transcription().strip()
+            timings = {"asr_s": round(time.monotonic() - listen_start, 3)}
+            self.log.utterance("Child", phrase)
+
+
+            if self.is_quit(phrase):
+                self.tts.say("Okay, story time is over. That was fun!")
+                break
+
+            if not phrase:
+                if time.time() - wait_start_time > 45:
+                    self.tts.say("It seems you're done. Thank you for your story!")
+                    break
+                continue
+
+            wait_start_time = time.time()
+            prompt = (
+                f"AI-CONTEXT: The child is continuing the story.\n"
+                f"AI-INSTRUCTION: Respond naturally to help continue their story.\n"
+                f"CHILD-TRANSCRIPT: {phrase}"
+            )
+
+            set_leds_thinking(self.session) # Set LEDs to indicate thinking
+            llm_start = time.monotonic()
+            response = self.chatbot.get_response(prompt)
+            timings["llm_s"] = round(time.monotonic() - llm_start, 3)
+            set_leds_speaking(self.session)  # Set LEDs to indicate speaking
+            tts_start = time.monotonic()
+            with self.tracer.span("tts"):
+                self.tts.say(response)
+            timings["tts_s"] = round(time.monotonic() - tts_start, 3)
+            set_leds_idle(self.session)
+            if self.tracer.enabled:
+                print(self.tracer.format_turn_summary())
+            self.log.utterance("Pepper", response)
+
+            self.log_interaction(
+                exp_event="stage B - storytelling",
+                ai_context="child is inventing a continuation of the story",
+                ai_instruction="Continue the story based on what the child says.",
+                child_transcript=phrase,
+                ai_response=response,
+                prompt=prompt,
+                timings=timings
+            )
+
+    def run_stage_a_interactive_screen(self):
+        #This is run_stage_a version 2. In development, it is more interactive and allows for possible navigation between pictures.
+        print("Running Stage A: Showing pictures and collecting responses...")
+
+        tablet = self.session.service("ALTabletService")
+        max_picture_time = 300
+        total_pics = len(self.picture_urls)
+        current_index = 0
+
+        while 0 <= current_index < total_pics:
+            picture_number = current_index + 1
+            picture_url = self.picture_urls[current_index]
+            exp_event = f"showing picture {picture_number}"
+            print(f"Picture url: {picture_url}")
+
+            ai_context = exp_event
+            ai_instruction = (
+                f"You will now be shown a short story in pictures. "
+                f"So, let's take a look at picture {picture_number}. Can you tell me about it? "
+                "If you want to see another picture, say 'back' to go to the previous one, or 'go to picture 2'."
+            )
+
+            self.tts.say(ai_instruction)
+            time.sleep(1.5)  # A brief pause to let the prompt complete before starting Stage B``
+            self.transcriber.reset()
+            print(f"picture {picture_number} of {total_pics}: {picture_url}")
+
+            tablet.showImage(picture_url)
+            picture_start_time = time.time()
+            attempts = 0
+
+            while attempts < 3:
+                if time.time() - picture_start_time >= max_picture_time:
+                    print("Time limit reached for this picture. Moving on...")
+                    break
+
+                user_transcriptions = []
+                wait_start_time = time.time()
+                prompted = False
+                max_wait_time = 0
+
+                print("Listening for the child's response...")
+                self.tracer.begin_turn(exp_event)
+                listen_start = time.monotonic()
+                while True:
+                    # A picture request ends the phrase as soon as a partial transcript has it
+                    phrase = self.transcriber.get_transcription(
+                        on_partial=lambda text: ends_phrase(self.intents.classify(text, total_pics, NAVIGATION))
+                    ).strip()
+
+                    # Navigation logic
+                    intent = self.intents.classify(phrase, total_pics, NAVIGATION) if phrase else None
+                    nav_cmd = None
+                    if intent and intent.name == BACK:
+                        nav_cmd = "BACK"
+                    elif intent and intent.name == GOTO:
+                        nav_cmd = intent.picture - 1  # zero-indexed
+
+                    if intent and intent.name == QUIT:
+                        wave = pepper_wave(self.session, wait=False, stand=False)  # Waves while saying goodbye
+                        self.tts.say("Okay, we’ll stop here. Goodbye!")
+                        wave.wait()
+                        self.transcriber.reset()
+                        return False
+                    elif nav_cmd == "BACK":
+                        if current_index == 0:
+                            self.tts.say("You're already at the first picture.")
+                            time.sleep(1.5)  # A brief pause to let the prompt complete before starting Stage B``
+                        else:
+                            self.tts.say(f"Going back to picture {current_index}.")
+                            time.sleep(1.5)  # A brief pause to let the prompt complete`
+                            current_index -= 1
+                        tablet.hideImage()
+                        break  # Restart main while loop
+                    elif isinstance(nav_cmd, int):
+                        if nav_cmd == current_index:
+                            self.tts.say(f"You're already viewing picture {nav_cmd + 1}.")
+                            time.sleep(1.5)  # A brief pause to let the prompt complete`
+                        else:
+                            self.tts.say(f"Jumping to picture {nav_cmd + 1}.")
+                            time.sleep(1.5)  # A brief pause to let the prompt complete`
+                            current_index = nav_cmd
+                        tablet.hideImage()
+                        break  # Restart main while loop
+
+                    if phrase:
+                        user_transcriptions.append(phrase)
+                        wait_start_time = time.time()
+                        prompted = False
+                        print(f"Captured: {phrase}")
+                    else:
+                        if not prompted:
+                            print("Waiting... (child may still be speaking)")
+                            prompted = True
+                        if time.time() - wait_start_time > max_wait_time:
+                            break  # Finish attempt
+
+                # After navigation, return to display new or same image as needed:
+                if nav_cmd is not None:
+                    # Already handled navigation, so skip attempt logic
+                    break
+
+                # ... (rest of processing logic remains unchanged)
+                timings = {"asr_s": round(time.monotonic() - listen_start, 3)}
+                full_transcription = " ".join(user_transcriptions)
+
+                if not full_transcription:
+                    self.tts.say("I didn’t hear anything clear. Can you try again?")
+                    self.transcriber.reset()
+                    attempts += 1
+                    continue
+
+                if full_transcription.strip():
+                    self.log.utterance("You said", full_transcription)
+                    print(f"You said: {full_transcription}")
+
+                    prompt = (
+                        f"EXP-EVENT: {exp_event}\n"
+                        f"AI-CONTEXT: {ai_context}\n"
+                        f"AI-INSTRUCTION: {ai_instruction}\n"
+                        f"CHILD-TRANSCRIPT: {full_transcription}"
+                    )
+
+                    try:
+                        time_before_response = time.monotonic()
+                        set_leds_thinking(self.session)  # Set LEDs to indicate thinking
+                        response = self.chatbot.get_response(prompt)
+                        time_after_response = time.monotonic()
+                        timings["llm_s"] = round(time_after_response - time_before_response, 3)
+                        print(f"Pepper said: {response}")
+                        print(f"[Response Time: {time_after_response - time_before_response:.2f} seconds]")
+                        set_leds_speaking(self.session)  # Set LEDs to indicate speaking
+                        self.log.utterance("Pepper", response)
+                        tts_start = time.monotonic()
+                        with self.tracer.span("tts"):
+                            self.tts.say(response)
+                        timings["tts_s"] = round(time.monotonic() - tts_start, 3)
+                        if self.tracer.enabled:
+                            print(self.tracer.format_turn_summary())
+                        self.log_interaction(
+                            exp_event=exp_event,
+                            ai_context=ai_context,
+                            ai_instruction=ai_instruction,
+                            child_transcript=full_transcription,
+                            ai_response=response,
+                            prompt=prompt,
+                            timings=timings
+                        )
+                        time.sleep(1.5)  # A brief pause to let the prompt complete`
+                        set_leds_idle(self.session)
+                        self.transcriber.reset()
+                        user_transcriptions.clear()
+                    except Exception as e:
+                        print(f"Error during chatbot response: {e}")
+                        self.tts.say("I had trouble understanding that. I think I have a headache. Ouch!")
+                        time.sleep(1.5)  # A brief pause to let the prompt complete`
+                        self.transcriber.reset()
+                        attempts += 1
+                        continue
+
+                    if "##SATISFACTORY RESPONSE##" in response or "##NOT INTERESTED##" in response:
+                        print(f"Response 'satisfactory' or 'not interested'. Moving to next picture.")
+                        break
+
+                attempts += 1
+
+            tablet.hideImage()
+            current_index += 1  # Normal forward progression
+
+        return True
+
+    def finish(self, print_history=True, trace_filename=None):
+        """
+        Ends the session: flushes the caches, closes the log, writes the text history
+        next to it and, if the tracer is enabled and trace_filename given, the trace.
+        """
+        # Stats first: close() releases what they count (e.g. the phrase cache's uploaded clips)
+        if isinstance(self.tts, PhraseCache):
+            print(f"[{self.robot}] Phrase cache: {self.tts.stats()}")
+            self.tts.close()
+        if isinstance(self.chatbot, CachedChatbot):
+            print(f"[{self.robot}] Response cache: {self.chatbot.cache.stats()}")
+            self.chatbot.close()
+        if isinstance(self.transcriber.source, PepperMicrophone):
+            print(f"[{self.robot}] Pepper microphone: {self.transcriber.source.stats()}")
+            self.transcriber.source.close()
+        self.log.session_end()
+        self.log.close()
+        # --- Writes the human-readable history next to the JSONL log ---
+        text_filename = jsonl_to_text(self.log.filename)
+        if print_history:
+            print("\n" + 4*"=======")
+            print("Full Conversation History (Console):")
+            with open(text_filename) as f:
+                print(f.read(), end='')
+        print(f"Conversation history successfully saved to: {self.log.filename} and {text_filename}")
+        if trace_filename and self.tracer.enabled:
+            self.tracer.end_turn()
+            trace_filename = self.tracer.export_chrome_trace(trace_filename)
+            print(f"Latency trace saved to: {trace_filename} (open in chrome://tracing or ui.perfetto.dev)")
+
+
+def open_child_session(ip, port, log_filename, picture_urls, tracer, transcriber_settings=None,
+                       audio_model=None, response_cache=None, pepper_mic=False, session=None, chatbot=None,
+                       fake=False):
+    """
+    Connects to a robot and builds a ChildSession for it.
+
+    Args:
+        ip (str), port (int): NAOqi address of the robot.
+        log_filename (str): JSONL log of this session.
+        picture_urls (list): Story pictures for Stage A.
+        tracer (TurnTracer): Tracer for this session.
+        transcriber_settings (dict): Transcriber arguments, TRANSCRIBER_SETTINGS by default.
+        audio_model: Shared ASR model (asr_scheduler.SharedWhisperModel); None loads one.
+        response_cache (ResponseCache): Cache shared between sessions; None for a private one.
+        pepper_mic (bool): Listen to Pepper's front microphone instead of a local one.
+        session: An already connected session (e.g. a fake_naoqi.FakeSession); None connects to ip:port.
+        chatbot: Chatbot to use as is (e.g. a scripted one); None builds a cached Chatbot.
+        fake (bool): Use a fake_naoqi.FakeSession instead of connecting (also set by PEPPER_FAKE).
+
+    Returns:
+        ChildSession: Ready to run, or None if the robot or the chatbot could not be reached.
+    """
+    robot = f"{ip}:{port}"
+    # Every turn is appended to the log as it happens, so a crash no longer loses the session.
+    log = SessionLogger(log_filename)
+    if session is None:
+        try:
+            print(f"Connecting to Pepper at {robot}...")
+            session = new_session(fake)
+            session.connect(ip + ":" + str(port))
+            print("Connected to Pepper's NAOqi session.")
+        except Exception as e:
+            print(f"Could not connect to Pepper at {robot}. Please check the IP and port.")
+            log.close()
+            return None
+        print("Connected to Pepper successfully.")
+
+    # Initialize Pepper's TextToSpeech service
+    tts = session.service("ALTextToSpeech")
+    tts.setLanguage("English")  # Setting language to English
+    tts.setVolume(0.8)  # Setting volume, max is 1.0
+    # Canned phrases play from preloaded clips; everything else still goes through tts.say
+    speech = PhraseCache(session, tts)
+    speech.preload_async(CANNED_PHRASES + [
+        f"This is picture {n}. Can you tell me about it?" for n in range(1, len(picture_urls) + 1)])
+
+    source = PepperMicrophone(session) if pepper_mic else None
+    transcriber = Transcriber(**(transcriber_settings or TRANSCRIBER_SETTINGS),
+                              tracer=tracer, audio_model=audio_model, source=source)
+
+    # Only the session-start greeting is the same for every child, so only it is cached.
+    if chatbot is None:
+        chatbot = CachedChatbot(Chatbot(tracer=tracer), cache=response_cache, categories={"greeting": DAY})
+
+    if not chatbot.authenticate():
+        print("Authentication failed. Pepper isn't going to talk.")
+        speech.close()
+        log.close()
+        chatbot.close()
+        return None
+    return ChildSession(session, speech, transcriber, chatbot, picture_urls, log, tracer, robot=robot)
+
+
+def main():
+    #This is the main function for the experiment with Pepper, where it shows a story in pictures and interacts with the child.
+    #This is still a work in progress, but it should be functional.
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--ip", type=str, default="127.0.0.1",
+                        help="Robot IP address. On robot or Local Naoqi: use '127.0.0.1'.")
+    parser.add_argument("--port", type=int, default=9559,
+                        help="Naoqi port number")
+    parser.add_argument("--trace", action="store_true",
+                        help="Record per-turn latency spans and export them as a Chrome trace.")
+    parser.add_argument("--pepper-mic", action="store_true",
+                        help="Listen to Pepper's front microphone (streamed over NAOqi) instead of a local one.")
+    parser.add_argument("--fake", action="store_true",
+                        help="Run without a robot on a fake NAOqi session (also PEPPER_FAKE=1).")
+
+    args = parser.parse_args()
+    if args.trace:
+        tracer.enabled = True
+    # --- NEW: Generate a unique session ID and filename at the start ---
+    session_timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    log_filename = f"chat_history_{session_timestamp}.jsonl"
+
+    child_session = open_child_session(args.ip, args.port, log_filename, STORY_PICTURES, tracer,
+                                       pepper_mic=args.pepper_mic, fake=fake_requested(args.fake))
+    if child_session is None:
+        return
+    # tts.say("If you don't like to talk now, \nJust say 'quit' or 'stop' to end our conversation)")
+    print("Authentication successful. Starting transcription. \n(Say 'quit', 'exit', or 'stop' to end conversation)")
+    
+    # This is when the conversation starts
+    child_session.log.session_start(robot=child_session.robot)
+    try:
+        child_session.run()
     finally:
-        conversation_end_time = datetime.now()
-        print("\n" + 4*"=======")
-        print("Full Conversation History (Console):")
-        for entry in conversation_history:
-            print(entry, end='')
-        # --- Saves the history to the unique file ---
-        save_history_to_file(conversation_history, log_filename, start_time=conversation_start_time, end_time=conversation_end_time)
+        child_session.finish(trace_filename=f"trace_{session_timestamp}.json")
 
 def enable_autonomous_mode(session, tts=None):
     """
@@ -462,336 +957,6 @@ def set_leds_idle(session):
         print(f"[LED Error] Failed to reset LEDs: {e}")
 
 
-def run_stage_a(session, tts, transcriber, chatbot, picture_urls):
-    print("Running Stage A: Showing pictures and collecting responses sequentially...")
-    tablet = session.service("ALTabletService")
-    max_picture_time = 180 #Average of 5 minutes per picture
-
-    intro_instruction = "You will now be shown a short story in pictures."
-    tts.say(intro_instruction)
-    conversation_history.append(timestamped_entry(f"Pepper: {intro_instruction}\n"))
-
-    for picture_number, picture_url in enumerate(picture_urls, start=1):
-        exp_event = f"showing picture {picture_number}"
-        print(f"Picture url: {picture_url}")
-        ai_context = exp_event
-        
-        ai_instruction = f"This is picture {picture_number}. Can you tell me about it?"
-        tts.say(ai_instruction)
-        conversation_history.append(timestamped_entry(f"Pepper: {ai_instruction}\n"))
-
-        time.sleep(1.5)  # A brief pause to let the prompt complete`
-        transcriber.reset()
-        print(f"picture {picture_number} of {len(picture_urls)}: {picture_url}")
-        tablet.showImage(picture_url)
-
-        # Time picture starts to be shown
-        picture_start_time = time.time()
-
-        # Show an HTML page instead of an image
-        # This is optional, but it can be used to provide a more interactive experience.
-        # render_interactive_page(session)
-
-        attempts = 0
-        while attempts < 3:
-            # Waits for up to 30 seconds, loops (retrying) up to 3 times
-            if time.time() - picture_start_time >= max_picture_time:
-                print("Time limit reached for this picture. Moving on...")
-                break
-
-            user_transcriptions = []
-            wait_start_time = time.time()
-            prompted = False
-            max_wait_time = 3  # seconds of total silence allowed per speech attempt. If time of silence exceeds this, the statement is considered complete.
-
-            print("Listening for the child's response...")
-            while True:
-                phrase = transcriber.get_transcription().strip()
-                if phrase.lower() in ["quit", "exit", "stop"]:
-                    tts.say("Okay, we’ll stop here. Goodbye!")
-                    pepper_wave(session) #Optional: Pepper waves the child
-                    transcriber.reset()
-                    return False
-
-                if phrase:
-                    user_transcriptions.append(phrase)
-                    wait_start_time = time.time()  # reset timer after hearing something
-                    prompted = False
-                    print(f"Captured: {phrase}")
-
-                else:
-                    if not prompted:
-                        print("Waiting... (child may still be speaking)")
-                        prompted = True
-
-                    if time.time() - wait_start_time > max_wait_time:
-                        break  # silence for too long → finish transcription for this attempt
-
-            # Processes the accumulated transcription:
-            full_transcription = " ".join(user_transcriptions)
-            if not full_transcription:
-                tts.say("I didn’t hear anything clear. Can you try again?")
-                time.sleep(1.5)  # A brief pause to let the prompt complete before starting Stage B``
-                transcriber.reset()
-                attempts += 1
-                continue
-
-            if full_transcription.strip():
-                # conversation_history.append(f"You said: {full_transcription}\n")
-                conversation_history.append(timestamped_entry(f"You said: {full_transcription}\n"))
-
-            print(f"You said: {full_transcription}") # This provides feedback to the console.
-
-            prompt = (
-                f"EXP-EVENT: {exp_event}\n"
-                f"AI-CONTEXT: {ai_context}\n"
-                f"AI-INSTRUCTION: {ai_instruction}\n"
-                f"CHILD-TRANSCRIPT: {full_transcription}"
-            )
-
-            try:
-                response = chatbot.get_response(prompt)
-                print(f"Pepper said: {response}") # Prints the Pepper's response to the console.
-                log_interaction(
-                        exp_event=exp_event,
-                        ai_context=ai_context,
-                        ai_instruction=ai_instruction,
-                        child_transcript=full_transcription,
-                        ai_response=response
-                    )
-                conversation_history.append(timestamped_entry(f"Pepper: {response}\n"))
-                # conversation_history.append(f"Pepper: {response}\n")
-                tts.say(response.replace("##SATISFACTORY##", "").replace("##UNCLEAR##", "").replace("##NOT INTERESTED##", ""))
-                time.sleep(1.5)  # A brief pause to let the prompt complete before starting Stage B``
-                transcriber.reset()
-                user_transcriptions.clear()  # Clear transcriptions after sending to chatbot
-            except Exception as e:
-                print(f"Error during chatbot response: {e}")
-                tts.say("I had trouble understanding that. I think I have a headache. Ouch!")
-                time.sleep(1.5)  # A brief pause to let the prompt complete before starting Stage B``
-                transcriber.reset()
-                attempts += 1
-                continue
-            
-
-            if "##SATISFACTORY##" in response or "##NOT INTERESTED##" in response:
-                break  # move on to next picture
-
-            if "##SATISFACTORY##" in response and not phrase and time.time() - wait_start_time > 10:
-                tts.say("That's okay. We can move to the next picture.")
-                time.sleep(1)  # A brief pause to let the prompt complete before starting Stage B``
-
-                break
-
-            attempts += 1
-
-        tablet.hideImage()
-    return True
-
-def run_stage_b(session, tts, transcriber, chatbot, max_stage_duration=300):
-    """
-    Stage B: Free storytelling with a 5-minute max session time.
-    """
-    tts.say("Great! Now you can invent your own continuation of the story. What happens next?")
-    time.sleep(1.5)  # A brief pause to let the prompt complete before starting Stage B``
-    print("Story creation phase started.")
-    stage_start_time = time.time()
-
-    wait_start_time = stage_start_time
-    while True:
-        if time.time() - stage_start_time > max_stage_duration:
-            tts.say("Thanks for your story! That’s the end of this activity.")
-            break
-
-        phrase = transcriber.get_transcription().strip()
-        conversation_history.append(timestamped_entry(f"Child: {phrase}\n"))
-
-
-        if phrase.lower() in ["quit", "exit", "stop"]:
-            tts.say("Okay, story time is over. That was fun!")
-            break
-
-        if not phrase:
-            if time.time() - wait_start_time > 45:
-                tts.say("It seems you're done. Thank you for your story!")
-                break
-            continue
-
-        wait_start_time = time.time()
-        prompt = (
-            f"AI-CONTEXT: The child is continuing the story.\n"
-            f"AI-INSTRUCTION: Respond naturally to help continue their story.\n"
-            f"CHILD-TRANSCRIPT: {phrase}"
-        )
-
-        set_leds_thinking(session) # Set LEDs to indicate thinking
-        response = chatbot.get_response(prompt)
-        set_leds_speaking(session)  # Set LEDs to indicate speaking
-        tts.say(response)
-        set_leds_idle(session)
-        conversation_history.append(timestamped_entry(f"Pepper: {response}\n"))
-
-        log_interaction(
-            exp_event="stage B - storytelling",
-            ai_context="child is inventing a continuation of the story",
-            ai_instruction="Continue the story based on what the child says.",
-            child_transcript=phrase,
-            ai_response=response
-        )
-
-
-def run_stage_a_interactive_screen(session, tts, transcriber, chatbot, picture_urls):
-    #This is run_stage_a version 2. In development, it is more interactive and allows for possible navigation between pictures.
-    print("Running Stage A: Showing pictures and collecting responses...")
-
-    tablet = session.service("ALTabletService")
-    max_picture_time = 300
-    total_pics = len(picture_urls)
-    current_index = 0
-
-    while 0 <= current_index < total_pics:
-        picture_number = current_index + 1
-        picture_url = picture_urls[current_index]
-        exp_event = f"showing picture {picture_number}"
-        print(f"Picture url: {picture_url}")
-
-        ai_context = exp_event
-        ai_instruction = (
-            f"You will now be shown a short story in pictures. "
-            f"So, let's take a look at picture {picture_number}. Can you tell me about it? "
-            "If you want to see another picture, say 'back' to go to the previous one, or 'go to picture 2'."
-        )
-
-        tts.say(ai_instruction)
-        time.sleep(1.5)  # A brief pause to let the prompt complete before starting Stage B``
-        transcriber.reset()
-        print(f"picture {picture_number} of {total_pics}: {picture_url}")
-
-        tablet.showImage(picture_url)
-        picture_start_time = time.time()
-        attempts = 0
-
-        while attempts < 3:
-            if time.time() - picture_start_time >= max_picture_time:
-                print("Time limit reached for this picture. Moving on...")
-                break
-
-            user_transcriptions = []
-            wait_start_time = time.time()
-            prompted = False
-            max_wait_time = 0
-
-            print("Listening for the child's response...")
-            while True:
-                phrase = transcriber.get_transcription().strip()
-
-                # Navigation logic
-                nav_cmd = navigation_command(phrase, total_pics) if phrase else None
-
-                if phrase.lower() in ["quit", "exit", "stop"]:
-                    tts.say("Okay, we’ll stop here. Goodbye!")
-                    pepper_wave(session)
-                    transcriber.reset()
-                    return False
-                elif nav_cmd == "BACK":
-                    if current_index == 0:
-                        tts.say("You're already at the first picture.")
-                        time.sleep(1.5)  # A brief pause to let the prompt complete before starting Stage B``
-                    else:
-                        tts.say(f"Going back to picture {current_index}.")
-                        time.sleep(1.5)  # A brief pause to let the prompt complete`
-                        current_index -= 1
-                    tablet.hideImage()
-                    break  # Restart main while loop
-                elif isinstance(nav_cmd, int):
-                    if nav_cmd == current_index:
-                        tts.say(f"You're already viewing picture {nav_cmd + 1}.")
-                        time.sleep(1.5)  # A brief pause to let the prompt complete`
-                    else:
-                        tts.say(f"Jumping to picture {nav_cmd + 1}.")
-                        time.sleep(1.5)  # A brief pause to let the prompt complete`
-                        current_index = nav_cmd
-                    tablet.hideImage()
-                    break  # Restart main while loop
-
-                if phrase:
-                    user_transcriptions.append(phrase)
-                    wait_start_time = time.time()
-                    prompted = False
-                    print(f"Captured: {phrase}")
-                else:
-                    if not prompted:
-                        print("Waiting... (child may still be speaking)")
-                        prompted = True
-                    if time.time() - wait_start_time > max_wait_time:
-                        break  # Finish attempt
-
-            # After navigation, return to display new or same image as needed:
-            if nav_cmd:
-                # Already handled navigation, so skip attempt logic
-                break
-
-            # ... (rest of processing logic remains unchanged)
-            full_transcription = " ".join(user_transcriptions)
-
-            if not full_transcription:
-                tts.say("I didn’t hear anything clear. Can you try again?")
-                transcriber.reset()
-                attempts += 1
-                continue
-
-            if full_transcription.strip():
-                conversation_history.append(timestamped_entry(f"You said: {full_transcription}\n"))
-                print(f"You said: {full_transcription}")
-
-                prompt = (
-                    f"EXP-EVENT: {exp_event}\n"
-                    f"AI-CONTEXT: {ai_context}\n"
-                    f"AI-INSTRUCTION: {ai_instruction}\n"
-                    f"CHILD-TRANSCRIPT: {full_transcription}"
-                )
-                
-                try:
-                    time_before_response = time.time()
-                    set_leds_thinking(session)  # Set LEDs to indicate thinking
-                    response = chatbot.get_response(prompt)
-                    time_after_response = time.time()
-                    print(f"Pepper said: {response}")
-                    print(f"[Response Time: {time_after_response - time_before_response:.2f} seconds]")
-                    log_interaction(
-                        exp_event=exp_event,
-                        ai_context=ai_context,
-                        ai_instruction=ai_instruction,
-                        child_transcript=full_transcription,
-                        ai_response=response
-                    )
-                    set_leds_speaking(session)  # Set LEDs to indicate speaking
-                    conversation_history.append(timestamped_entry(f"Pepper: {response}\n"))
-                    tts.say(response)
-                    time.sleep(1.5)  # A brief pause to let the prompt complete`
-                    set_leds_idle(session)
-                    transcriber.reset()
-                    user_transcriptions.clear()
-                except Exception as e:
-                    print(f"Error during chatbot response: {e}")
-                    tts.say("I had trouble understanding that. I think I have a headache. Ouch!")
-                    time.sleep(1.5)  # A brief pause to let the prompt complete`
-                    transcriber.reset()
-                    attempts += 1
-                    continue
-
-                if "##SATISFACTORY RESPONSE##" in response or "##NOT INTERESTED##" in response:
-                    print(f"Response 'satisfactory' or 'not interested'. Moving to next picture.")
-                    break
-
-            attempts += 1
-
-        tablet.hideImage()
-        current_index += 1  # Normal forward progression
-
-    return True
-
-
 def render_interactive_page(session):
     pass  # This function is in development, a placeholder for rendering an interactive HTML page on Pepper's tablet.
     tablet_service = session.service("ALTabletService")
@@ -803,27 +968,5 @@ def render_interactive_page(session):
     # subscriber.signal.connect(cat_clicked)
 
 
-def save_history_to_file(history, filename, start_time=None, end_time=None):
-    """
-    Saves the conversation history list to a text file.
-
-    Args:
-        history (list): A list of strings, where each string is a line of dialogue.
-        filename (str): The name of the file to save the history to.
-        start_time (datetime): Conversation start time.
-        end_time (datetime): Conversation end time.
-    """
-    try:
-        with open(filename, 'w') as f:
-            if start_time:
-                f.write(f"Conversation started at: {start_time.strftime('%Y-%m-%d %H:%M:%S')}\n")
-            for entry in history:
-                f.write(entry)
-            if end_time:
-                f.write(f"\nConversation ended at: {end_time.strftime('%Y-%m-%d %H:%M:%S')}\n")
-        print(f"Conversation history successfully saved to: {filename}")
-    except Exception as e:
-        print(f"An error occurred while saving the history file: {e}")
-
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,7 +1,10 @@
 # src/auth_handler.py
+import os
 import requests
 
-FIREBASE_AUTH_URL = "https://identitytoolkit.googleapis.com/v1/accounts:signInWithPassword"
+# Overridable so the client can be pointed at a local mock server (see mock_server.py)
+FIREBASE_AUTH_URL = os.environ.get(
+    "FIREBASE_AUTH_URL", "https://identitytoolkit.googleapis.com/v1/accounts:signInWithPassword")
 
 def login(email, password, firebase_api_key):
     """
@@ -1,20 +1,23 @@
 import getpass
 from .config_handler import load_config
 from .auth_handler import login
-from .emoex_client import stream_chat_response
+from .emoex_client import stream_chat_response, is_error_chunk
 
 class Chatbot:
     """A class to handle the chatbot functionality for EmoEx AI Terminal Chat."""
     def __init__(self, 
                  FIREBASE_API_KEY="FIREBASE_API_KEY", 
                  EMOEX_PRODUCT_ID="EMOEX_PRODUCT_ID", 
-                 EMOEX_EMAIL="EMOEX_EMAIL", EMOEX_PASSWORD="EMOEX_PASSWORD"):
+                 EMOEX_EMAIL="EMOEX_EMAIL", EMOEX_PASSWORD="EMOEX_PASSWORD",
+                 tracer=None):
         self.config = load_config()
         self.firebase_api_key = self.config.get(FIREBASE_API_KEY)
         self.product_id = self.config.get(EMOEX_PRODUCT_ID)
         self.default_email = self.config.get(EMOEX_EMAIL)
         self.default_password = self.config.get(EMOEX_PASSWORD)
         self.id_token = None
+        self.tracer = tracer  # Optional TurnTracer, see turn_tracer.py
+        self.last_response_ok = False  # False when the last response was empty, truncated or contained an error message
 
     def authenticate(self):
         if not self.firebase_api_key or not self.product_id:
@@ -49,15 +52,28 @@ class Chatbot:
         """Getting a response from the EmoEx AI based on user input."""
         if not self.id_token:
             raise RuntimeError("You need to authenticate first.")
+        self.last_response_ok = False
         response = ""
+        failed = False
+        status = {"completed": False}
+        if self.tracer is not None:
+            self.tracer.begin("llm_request")
         for chunk in stream_chat_response(
             self.id_token,
             self.product_id,
-            user_input):
+            user_input,
+            tracer=self.tracer,
+            status=status):
             # print(chunk, end='', flush=True)
+            failed = failed or is_error_chunk(chunk)
             response += chunk
+        if self.tracer is not None:
+            self.tracer.end("llm_request", chars=len(response))
         print() # For a new line after each chunk
-        return response.strip()
+        response = response.strip()
+        # A stream that ends without thread.message.completed was cut off
+        self.last_response_ok = bool(response) and not failed and status["completed"]
+        return response
     
     def chat_loop(self):
         """Main chat loop to interact with the user."""
@@ -1,11 +1,23 @@
 # src/emoex_client.py
+import os
 import requests
-from sseclient import SSEClient
 import json
+try:
+    from .sse_parser import iter_events, iter_response_chunks, extract_delta_text
+except ImportError:  # Run from inside src/ (python main.py)
+    from sse_parser import iter_events, iter_response_chunks, extract_delta_text
 
-EMOEX_CHAT_API_URL = "https://api.emoexai.com/chat/assist"
+# Overridable so the client can be pointed at a local mock server (see mock_server.py)
+EMOEX_CHAT_API_URL = os.environ.get("EMOEX_CHAT_API_URL", "https://api.emoexai.com/chat/assist")
 
-def stream_chat_response(id_token, product_id, user_message):
+# Prefixes of the chunks stream_chat_response yields when a request or stream fails
+ERROR_PREFIXES = ("[Error:", "[API Error:", "[HTTP Error", "[Request Error", "[Unexpected error")
+
+def is_error_chunk(chunk):
+    """True if a chunk from stream_chat_response is one of its error messages rather than response text."""
+    return chunk.startswith(ERROR_PREFIXES)
+
+def stream_chat_response(id_token, product_id, user_message, tracer=None, status=None):
     """
     Sends a message to the EmoEx chat API and streams the response.
 
@@ -13,6 +25,11 @@ def stream_chat_response(id_token, product_id, user_message):
         id_token (str): The Firebase idToken for authentication.
         product_id (str): The EmoEx product ID.
         user_message (str): The message to send to the AI.
+        tracer (TurnTracer): Optional tracer that receives the http_connect span
+            and the first_token / last_token marks.
+        status (dict): Optional; status["completed"] is set to True once the server
+            sends thread.message.completed, so callers can tell a full reply from a
+            truncated stream.
 
     Yields:
         str: Chunks of the AI's response message.
@@ -35,7 +52,9 @@ def stream_chat_response(id_token, product_id, user_message):
     }
 
     try:
-        # Make the POST request with stream=True
+        # Make the POST request with stream=True (returns once the headers have arrived)
+        if tracer is not None:
+            tracer.begin("http_connect")
         response = requests.post(
             EMOEX_CHAT_API_URL,
             headers=headers,
@@ -43,6 +62,8 @@ def stream_chat_response(id_token, product_id, user_message):
             stream=True,
             timeout=180 # Set a timeout for the request (e.g., 3 minutes)
         )
+        if tracer is not None:
+            tracer.end("http_connect", status=response.status_code)
         
         # print(f"\n[Debug] Response Status Code: {response.status_code}")
         # print(f"[Debug] Response Headers: {response.headers}")
@@ -56,49 +77,39 @@ def stream_chat_response(id_token, product_id, user_message):
             # print(f"[Debug] Incorrect Content-Type: {response.headers.get('Content-Type')}")
             return
 
-        # Use SSEClient to parse the event stream
-        client = SSEClient(response)
-        
-        # print(f"[Debug] SSEClient object type: {type(client)}")
-        # print(client)
-        # if not hasattr(client, '__iter__'):
-        #     # This is a critical check. If __iter__ is missing, the object cannot be used in a for loop.
-        #     yield "[Error: SSEClient object is not iterable immediately after creation. SSEClient initialization might have failed or the response stream was invalid.]"
-        #     print("[Debug] SSEClient object does NOT have __iter__ attribute. This is the cause of the 'not iterable' error.")
-        #     return
-        
-        # print("[Debug] SSEClient appears iterable. Starting event loop.")
-        
+        # Parse the event stream straight from the socket chunks (see sse_parser.py)
         full_response_printed = False
-        for event in client.events():
+        for event in iter_events(iter_response_chunks(response)):
             # According to EmoEx docs, relayed events from OpenAI-like API:
             # "thread.message.created", "thread.message.in_progress",
             # "thread.message.delta", "thread.message.completed",
             # "thread.message.incomplete", "error"
+            # Only the delta payload is decoded; the other events are matched by name.
 
             if event.event == 'thread.message.delta':
                 try:
-                    event_json_data = json.loads(event.data)
-                    if 'delta' in event_json_data and 'content' in event_json_data['delta']:
-                        content_list = event_json_data['delta']['content']
-                        for content_item in content_list:
-                            if content_item.get('type') == 'text' and 'text' in content_item:
-                                value = content_item['text'].get('value')
-                                if value:
-                                    yield value
-                                    full_response_printed = True
+                    value = extract_delta_text(event.data)
+                    if value:
+                        if tracer is not None and not full_response_printed:
+                            tracer.mark("first_token")
+                        yield value
+                        full_response_printed = True
                 except json.JSONDecodeError:
                     print(f"\n[Debug: Non-JSON delta data: {event.data}]")
-                except KeyError:
+                except (AttributeError, TypeError):
                     print(f"\n[Debug: Unexpected delta structure: {event.data}]")
 
             elif event.event == 'thread.message.completed':
+                if tracer is not None:
+                    tracer.mark("last_token")
+                if status is not None:
+                    status["completed"] = True
                 if not full_response_printed:
                      yield "" 
                 break 
 
             elif event.event == 'error':
-                error_message = f"[API Error: {event.data}]"
+                error_message = f"[API Error: {event.data.decode('utf-8', 'replace')}]"
                 yield error_message
                 print(f"\n{error_message}") 
                 break 
@@ -114,7 +125,7 @@ def stream_chat_response(id_token, product_id, user_message):
         yield error_msg
     except requests.exceptions.RequestException as req_err:
         yield f"[Request Error connecting to chat API: {req_err}]"
-    except Exception as e: # This is where the 'TypeError: 'SSEClient' object is not iterable' was caught
+    except Exception as e:
         yield f"[Unexpected error during chat: {e}]" # The original error message you saw
         # print(f"[Debug] Exception caught in stream_chat_response: {type(e).__name__} - {e}")
 
@@ -0,0 +1,168 @@
+# src/load_test.py
+"""
+Load test: many concurrent Chatbot sessions against the EmoEx API or the local mock.
+
+Each session is a Chatbot that authenticates and then sends --turns prompts back
+to back (with optional think time), in its own thread, exactly as
+chatWithPepper.py drives it. Per turn a TurnTracer records the HTTP connect
+time, the time to the first token and the full response time. At the end the
+harness reports throughput and p50/p90/p99 of each latency.
+
+By default a MockEmoExServer is started in-process, so the numbers measure the
+client (requests, SSE parsing, threading) against a known server timing. Use
+--url-from-env to hit whatever FIREBASE_AUTH_URL / EMOEX_CHAT_API_URL point at
+(real credentials then come from chat_master/.env).
+
+Usage (from the repository root):
+    python -m chat_master.src.load_test [--sessions 20] [--turns 5] [--first-token-ms 300]
+        [--tokens-per-second 40] [--error-rate 0.05] [--think-time 0.5]
+"""
+
+import argparse
+import contextlib
+import io
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from latencytracker import LogHistogram
+from turn_tracer import TurnTracer
+from . import auth_handler, emoex_client
+from .classChatbot import Chatbot
+from .mock_server import MockEmoExServer
+
+PROMPTS = [
+    "I see a fisherman in a boat.",
+    "The cat is sleeping next to the fish.",
+    "Maybe the cat wants to eat the fish!",
+    "Then the fisherman goes home and the cat follows him.",
+]
+
+
+class SessionResult:
+    """Latencies and counts of one simulated session."""
+
+    def __init__(self):
+        self.connect = LogHistogram()
+        self.first_token = LogHistogram()
+        self.response = LogHistogram()
+        self.turns = 0
+        self.errors = 0
+        self.auth_failed = False
+
+
+def run_session(index, turns, think_time, mock):
+    result = SessionResult()
+    tracer = TurnTracer(enabled=True, max_events=1000)
+    chatbot = Chatbot(tracer=tracer)
+    if mock:
+        chatbot.firebase_api_key = "mock-key"
+        chatbot.product_id = "mock-product"
+        chatbot.default_email = f"child{index}@example.com"
+        chatbot.default_password = "mock-password"
+    if not chatbot.authenticate():
+        result.auth_failed = True
+        return result
+
+    for turn in range(turns):
+        tracer.begin_turn(f"session {index} turn {turn}")
+        start = time.perf_counter()
+        chatbot.get_response(PROMPTS[(index + turn) % len(PROMPTS)])
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        summary = tracer.turn_summary()
+        result.turns += 1
+        if not chatbot.last_response_ok:  # Empty, or an error message from stream_chat_response
+            result.errors += 1
+        else:
+            result.response.record(elapsed_ms)
+            if "first_token" in summary:
+                result.first_token.record(summary["first_token"]["at_ms"])
+        if "http_connect" in summary:
+            result.connect.record(summary["http_connect"]["total_ms"])
+        if think_time:
+            time.sleep(think_time)
+    return result
+
+
+def format_row(label, histogram):
+    s = histogram.summary()
+    if not s['count']:
+        return f"{label:<16}{'-':>10}"
+    return (f"{label:<16}{s['count']:>10}{s['p50_ms']:>10.1f}{s['p90_ms']:>10.1f}"
+            f"{s['p99_ms']:>10.1f}{s['max_ms']:>10.1f}")
+
+
+def run_load_test(sessions, turns, think_time=0.0, mock=True, verbose=False):
+    """
+    Runs the sessions concurrently and prints the report.
+
+    Returns:
+        dict: Merged histograms and counters ('connect', 'first_token', 'response',
+              'turns', 'errors', 'auth_failures', 'wall_s', 'turns_per_s').
+    """
+    totals = SessionResult()
+    auth_failures = 0
+    output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+    start = time.perf_counter()
+    with output, ThreadPoolExecutor(max_workers=sessions) as pool:
+        futures = [pool.submit(run_session, i, turns, think_time, mock) for i in range(sessions)]
+        for future in futures:
+            result = future.result()
+            auth_failures += result.auth_failed
+            totals.turns += result.turns
+            totals.errors += result.errors
+            totals.connect.merge(result.connect)
+            totals.first_token.merge(result.first_token)
+            totals.response.merge(result.response)
+    wall = time.perf_counter() - start
+
+    print(f"\n{sessions} sessions x {turns} turns in {wall:.2f}s "
+          f"({threading.active_count()} threads alive after the run)")
+    print(f"Turns: {totals.turns}  errors: {totals.errors}  auth failures: {auth_failures}  "
+          f"throughput: {totals.turns / wall:.1f} turns/s")
+    print(f"{'latency (ms)':<16}{'count':>10}{'p50':>10}{'p90':>10}{'p99':>10}{'max':>10}")
+    print(format_row("http connect", totals.connect))
+    print(format_row("first token", totals.first_token))
+    print(format_row("full response", totals.response))
+    return {
+        'connect': totals.connect, 'first_token': totals.first_token, 'response': totals.response,
+        'turns': totals.turns, 'errors': totals.errors, 'auth_failures': auth_failures,
+        'wall_s': wall, 'turns_per_s': totals.turns / wall if wall else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=20, help="Concurrent Chatbot sessions")
+    parser.add_argument("--turns", type=int, default=5, help="Prompts per session")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Seconds between turns of a session")
+    parser.add_argument("--first-token-ms", type=float, default=300, help="Mock: delay before the first delta")
+    parser.add_argument("--tokens-per-second", type=float, default=40, help="Mock: delta rate")
+    parser.add_argument("--reply-tokens", type=int, default=60, help="Mock: deltas per reply")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Mock: mid-stream error probability")
+    parser.add_argument("--http-error-rate", type=float, default=0.0, help="Mock: HTTP 500 probability")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--url-from-env", action="store_true",
+                        help="Use FIREBASE_AUTH_URL / EMOEX_CHAT_API_URL instead of an in-process mock")
+    parser.add_argument("--verbose", action="store_true", help="Show the Chatbot console output")
+    args = parser.parse_args()
+
+    if args.url_from_env:
+        print(f"Target: {emoex_client.EMOEX_CHAT_API_URL}")
+        run_load_test(args.sessions, args.turns, args.think_time, mock=False, verbose=args.verbose)
+        return
+
+    with MockEmoExServer(first_token_delay=args.first_token_ms / 1000.0,
+                         tokens_per_second=args.tokens_per_second, reply_tokens=args.reply_tokens,
+                         error_rate=args.error_rate, http_error_rate=args.http_error_rate,
+                         seed=args.seed) as server:
+        auth_handler.FIREBASE_AUTH_URL = server.auth_url
+        emoex_client.EMOEX_CHAT_API_URL = server.chat_url
+        print(f"Mock server: {server.base_url} (first token {args.first_token_ms:.0f}ms, "
+              f"{args.tokens_per_second:g} tokens/s, {args.reply_tokens} tokens/reply)")
+        run_load_test(args.sessions, args.turns, args.think_time, mock=True, verbose=args.verbose)
+        print(f"Server counts: {server.counts}")
+
+
+if __name__ == "__main__":
+    main()
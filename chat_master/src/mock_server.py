@@ -0,0 +1,265 @@
+# src/mock_server.py
+"""
+Local stand-in for the Firebase sign-in and EmoEx endpoints.
+
+Serves the three endpoints the clients use, with the same request and response shapes:
+    POST /v1/accounts:signInWithPassword   Firebase: returns an idToken
+    POST /chat/assist                      EmoEx: streams the reply as SSE
+                                           (thread.message.created / in_progress /
+                                           delta / completed, or error)
+    POST /realtime/roomToken               EmoEx: returns a LiveKit userToken / roomName
+
+The reply timing is configurable (delay before the first token, token rate), as is
+error injection (HTTP 500s and mid-stream error events), so client-side latency
+can be measured offline and repeatably. Point the clients at it with
+
+    FIREBASE_AUTH_URL=http://127.0.0.1:8765/v1/accounts:signInWithPassword
+    EMOEX_CHAT_API_URL=http://127.0.0.1:8765/chat/assist
+    EMOEX_ROOM_TOKEN_URL=http://127.0.0.1:8765/realtime/roomToken
+
+Usage:
+    python -m chat_master.src.mock_server [--port 8765] [--first-token-ms 300]
+        [--tokens-per-second 40] [--reply-tokens 60] [--error-rate 0.0] [--http-error-rate 0.0]
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class _QuietThreadingHTTPServer(ThreadingHTTPServer):
+    request_queue_size = 128  # The default of 5 makes concurrent clients wait for SYN retransmits
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients closing keep-alive connections after the last event is normal here.
+        pass
+
+
+FILLER = ("Once upon a time a fisherman and his cat sat by the sea and waited "
+          "for the fish to come while the sun went slowly down").split()
+
+
+class MockEmoExServer:
+    """Threaded HTTP server imitating the Firebase and EmoEx APIs."""
+
+    def __init__(self, host="127.0.0.1", port=0, first_token_delay=0.3, tokens_per_second=40.0,
+                 reply_tokens=60, error_rate=0.0, http_error_rate=0.0, seed=None):
+        """
+        Args:
+            host (str): Interface to bind.
+            port (int): Port to bind, 0 for any free port.
+            first_token_delay (float): Seconds between the request and the first delta.
+            tokens_per_second (float): Delta rate after the first one, 0 for no pacing.
+            reply_tokens (int): Deltas (words) per reply.
+            error_rate (float): Probability that a stream ends with an `error` event halfway.
+            http_error_rate (float): Probability that /chat/assist answers with HTTP 500.
+            seed (int): Seed for the error injection, for repeatable runs.
+        """
+        self.first_token_delay = first_token_delay
+        self.tokens_per_second = tokens_per_second
+        self.reply_tokens = reply_tokens
+        self.error_rate = error_rate
+        self.http_error_rate = http_error_rate
+        self.random = random.Random(seed)
+        self.counts = {"auth": 0, "chat": 0, "room_token": 0, "http_errors": 0, "stream_errors": 0}
+        self._lock = threading.Lock()
+        self._httpd = _QuietThreadingHTTPServer((host, port), _make_handler(self))
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def auth_url(self):
+        return f"{self.base_url}/v1/accounts:signInWithPassword"
+
+    @property
+    def chat_url(self):
+        return f"{self.base_url}/chat/assist"
+
+    @property
+    def room_token_url(self):
+        return f"{self.base_url}/realtime/roomToken"
+
+    def start(self):
+        """Serves in a background thread and returns self."""
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="MockEmoExServer", daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self._httpd.serve_forever()
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+    def _count(self, key):
+        with self._lock:
+            self.counts[key] += 1
+
+    def _roll(self, probability):
+        if probability <= 0:
+            return False
+        with self._lock:
+            return self.random.random() < probability
+
+    def reply_words(self, message):
+        words = f"You said: {message.strip()[:80]}.".split()
+        while len(words) < self.reply_tokens:
+            words.extend(FILLER)
+        return words[:self.reply_tokens]
+
+
+def _make_handler(server):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # Keep-alive and chunked SSE, like the real API
+
+        def log_message(self, format, *args):
+            pass  # Keep load tests quiet
+
+        def _read_form(self):
+            length = int(self.headers.get("Content-Length", 0) or 0)
+            body = self.rfile.read(length).decode("utf-8") if length else ""
+            if self.headers.get("Content-Type", "").startswith("application/json"):
+                try:
+                    return json.loads(body or "{}")
+                except ValueError:
+                    return {}
+            return {k: v[0] for k, v in parse_qs(body).items()}
+
+        def _send_json(self, status, payload):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            path = urlparse(self.path).path
+            form = self._read_form()
+            if path.endswith("accounts:signInWithPassword"):
+                self._sign_in(form)
+            elif path == "/chat/assist":
+                self._chat(form)
+            elif path == "/realtime/roomToken":
+                self._room_token(form)
+            else:
+                self._send_json(404, {"error": {"message": f"Unknown endpoint {path}"}})
+
+        def _sign_in(self, form):
+            server._count("auth")
+            if not form.get("email") or not form.get("password"):
+                self._send_json(400, {"error": {"message": "INVALID_LOGIN_CREDENTIALS"}})
+                return
+            self._send_json(200, {"kind": "identitytoolkit#VerifyPasswordResponse",
+                                  "email": form["email"], "idToken": f"mock-{uuid.uuid4().hex}",
+                                  "refreshToken": uuid.uuid4().hex, "expiresIn": "3600"})
+
+        def _room_token(self, form):
+            server._count("room_token")
+            if not self.headers.get("Authorization", "").startswith("Bearer "):
+                self._send_json(401, {"error": {"message": "Missing bearer token"}})
+                return
+            self._send_json(200, {"data": {"userToken": f"mock-livekit-{uuid.uuid4().hex}",
+                                           "roomName": f"mock-room-{form.get('productId', 'default')}"}})
+
+        def _chat(self, form):
+            server._count("chat")
+            if not self.headers.get("EMOEX-TOKEN"):
+                self._send_json(401, {"error": {"message": "Missing EMOEX-TOKEN"}})
+                return
+            if server._roll(server.http_error_rate):
+                server._count("http_errors")
+                self._send_json(500, {"error": {"message": "Injected server error"}})
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+
+            message_id = f"msg_{uuid.uuid4().hex[:24]}"
+            base = {"id": message_id, "object": "thread.message", "role": "assistant",
+                    "created_at": int(time.time()), "content": [], "status": "in_progress"}
+            try:
+                self._event("thread.message.created", base)
+                self._event("thread.message.in_progress", base)
+                time.sleep(server.first_token_delay)
+                words = server.reply_words(form.get("message", ""))
+                fail_at = len(words) // 2 if server._roll(server.error_rate) else -1
+                interval = 1.0 / server.tokens_per_second if server.tokens_per_second > 0 else 0.0
+                next_send = time.monotonic()
+                for i, word in enumerate(words):
+                    if i == fail_at:
+                        server._count("stream_errors")
+                        self._event("error", {"message": "Injected stream error"})
+                        break
+                    piece = word if i == 0 else " " + word
+                    self._event("thread.message.delta", {
+                        "id": message_id, "object": "thread.message.delta",
+                        "delta": {"content": [{"index": 0, "type": "text",
+                                               "text": {"value": piece, "annotations": []}}]}})
+                    if interval:
+                        next_send += interval
+                        delay = next_send - time.monotonic()
+                        if delay > 0:
+                            time.sleep(delay)
+                else:
+                    self._event("thread.message.completed", dict(base, status="completed", content=[
+                        {"type": "text", "text": {"value": " ".join(words), "annotations": []}}]))
+                self.wfile.write(b"0\r\n\r\n")
+            except (BrokenPipeError, ConnectionResetError):
+                self.close_connection = True  # Client stopped reading
+
+        def _event(self, name, payload):
+            data = f"event: {name}\ndata: {json.dumps(payload, separators=(',', ':'))}\n\n".encode("utf-8")
+            self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local mock of the Firebase / EmoEx endpoints.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--first-token-ms", type=float, default=300, help="Delay before the first delta")
+    parser.add_argument("--tokens-per-second", type=float, default=40, help="Delta rate, 0 for unpaced")
+    parser.add_argument("--reply-tokens", type=int, default=60, help="Deltas per reply")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Probability of a mid-stream error event")
+    parser.add_argument("--http-error-rate", type=float, default=0.0, help="Probability of an HTTP 500")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    server = MockEmoExServer(args.host, args.port, args.first_token_ms / 1000.0, args.tokens_per_second,
+                             args.reply_tokens, args.error_rate, args.http_error_rate, args.seed)
+    print(f"Mock EmoEx server on {server.base_url}. Point the clients at it with:")
+    print(f"  export FIREBASE_AUTH_URL={server.auth_url}")
+    print(f"  export EMOEX_CHAT_API_URL={server.chat_url}")
+    print(f"  export EMOEX_ROOM_TOKEN_URL={server.room_token_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\nStopping. Requests served: {server.counts}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+# src/sse_parser.py
+"""
+Incremental Server-Sent Events parser for the EmoEx chat stream.
+
+SSEClient iterates the requests response in small pieces and builds every event
+character by character, and stream_chat_response then ran json.loads and a nested
+dict walk on every thread.message.delta. This parser instead takes whatever the
+socket delivered, appends it to one buffer and cuts complete events out with
+bytes.find. Event data stays as bytes until the caller decides it needs it, and
+extract_delta_text pulls the text of a delta without building the whole JSON tree.
+"""
+
+import json
+from json.decoder import scanstring
+
+_BLANK_LINE = b"\n\n"
+
+
+class SSEEvent:
+    """One dispatched event. `data` is the raw bytes of the joined data lines."""
+    __slots__ = ("event", "data", "id")
+
+    def __init__(self, event, data, id=None):
+        self.event = event
+        self.data = data
+        self.id = id
+
+    def json(self):
+        return json.loads(self.data)
+
+    def __repr__(self):
+        return f"SSEEvent(event={self.event!r}, data={self.data[:60]!r})"
+
+
+class SSEParser:
+    """Feeds raw byte chunks in, gets complete SSEEvents out."""
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._pending_cr = False  # Chunk ended in '\r'; it may be the first half of '\r\n'
+
+    def feed(self, chunk):
+        """
+        Adds bytes received from the socket.
+
+        Args:
+            chunk (bytes): Any amount of the stream; events may be split anywhere.
+
+        Returns:
+            list[SSEEvent]: The events completed by this chunk (often zero or one).
+        """
+        if self._pending_cr:
+            chunk = b"\r" + chunk
+            self._pending_cr = False
+        if b"\r" in chunk:
+            # The spec allows CRLF and CR line endings; fold them into LF once here.
+            if chunk.endswith(b"\r"):
+                chunk = chunk[:-1]
+                self._pending_cr = True
+            chunk = chunk.replace(b"\r\n", b"\n").replace(b"\r", b"\n")
+        buffer = self._buffer
+        # Only the tail that could hold a new blank line needs scanning.
+        search_from = max(0, len(buffer) - 1)
+        buffer += chunk
+
+        events = []
+        start = 0
+        while True:
+            end = buffer.find(_BLANK_LINE, max(start, search_from))
+            if end < 0:
+                break
+            event = _parse_block(bytes(buffer[start:end]))
+            if event is not None:
+                events.append(event)
+            start = end + 2
+        if start:
+            del buffer[:start]
+        return events
+
+    def flush(self):
+        """Returns the final event if the stream ended without a trailing blank line."""
+        block = bytes(self._buffer).rstrip(b"\n")
+        self._buffer.clear()
+        event = _parse_block(block) if block else None
+        return [event] if event is not None else []
+
+
+def _parse_block(block):
+    event_type = "message"
+    event_id = None
+    data_lines = []
+    for line in block.split(b"\n"):
+        if not line or line[0] == 58:  # b':' starts a comment (keep-alive)
+            continue
+        field, sep, value = line.partition(b":")
+        if sep and value[:1] == b" ":
+            value = value[1:]
+        if field == b"data":
+            data_lines.append(value)
+        elif field == b"event":
+            event_type = value.decode("utf-8")
+        elif field == b"id":
+            event_id = value.decode("utf-8")
+        # "retry" and unknown fields are ignored
+    if not data_lines:
+        return None
+    data = data_lines[0] if len(data_lines) == 1 else b"\n".join(data_lines)
+    return SSEEvent(event_type, data, event_id)
+
+
+def iter_events(chunks):
+    """Yields SSEEvents from an iterable of byte chunks."""
+    parser = SSEParser()
+    for chunk in chunks:
+        if chunk:
+            yield from parser.feed(chunk)
+    yield from parser.flush()
+
+
+def iter_response_chunks(response, chunk_size=65536):
+    """
+    Yields bytes from a streaming requests response as soon as they arrive.
+
+    Chunked responses (the usual case for SSE) are yielded one HTTP chunk at a time.
+    Otherwise urllib3's read1 returns whatever is buffered, up to chunk_size, instead
+    of waiting for chunk_size bytes.
+    """
+    raw = response.raw
+    if response.headers.get("Transfer-Encoding", "").lower() == "chunked" or not hasattr(raw, "read1"):
+        return response.iter_content(chunk_size=None)
+    return iter(lambda: raw.read1(chunk_size), b"")
+
+
+def _delta_text_slow(data):
+    parsed = json.loads(data)
+    values = []
+    for content_item in parsed.get("delta", {}).get("content", []):
+        if content_item.get("type") == "text" and "text" in content_item:
+            value = content_item["text"].get("value")
+            if value:
+                values.append(value)
+    return "".join(values)
+
+
+def extract_delta_text(data):
+    """
+    Returns the text carried by a thread.message.delta event.
+
+    The usual delta holds exactly one text item, so the fast path finds its
+    "value" key and decodes only that JSON string with scanstring. Anything
+    else (several values, no text item) falls back to json.loads.
+
+    Args:
+        data (bytes | str): The event data.
+
+    Returns:
+        str: The delta text, "" if there is none.
+
+    Raises:
+        json.JSONDecodeError: If the data is not valid JSON.
+        AttributeError, TypeError: If the JSON is not shaped like a delta.
+    """
+    text = data.decode("utf-8") if isinstance(data, (bytes, bytearray)) else data
+    key = text.find('"value"')
+    if key >= 0 and text.find('"value"', key + 7) < 0 and '"text"' in text:
+        pos = key + 7
+        length = len(text)
+        while pos < length and text[pos] in " \t\n:":
+            pos += 1
+        if pos < length and text[pos] == '"':
+            try:
+                return scanstring(text, pos + 1)[0]
+            except ValueError:
+                pass
+    return _delta_text_slow(text)
@@ -4,11 +4,13 @@ import google.generativeai as genai
 class GeminiChatbot:
     """A chatbot class that uses the Google Gemini API for conversational responses."""
     # --- Corrected __init__ method ---
-    def __init__(self, system_instruction_path="system_instruction_for_gemini.txt"):
+    def __init__(self, system_instruction_path="system_instruction_for_gemini.txt", tracer=None):
         self.api_key = os.environ.get("GOOGLE_API_KEY")
+        self.tracer = tracer  # Optional TurnTracer, see turn_tracer.py
         self.model = None
         self.history = []  # We will manage the conversation history manually.
         self.system_instruction = None
+        self.last_response_ok = False  # False when get_response returned one of the fallback messages
 
         try:
             with open(system_instruction_path, "r") as f:
@@ -39,6 +41,7 @@ class GeminiChatbot:
 
     # --- Corrected get_response method ---
     def get_response(self, user_prompt: str) -> str:
+        self.last_response_ok = False
         if not self.model:
             return "Chatbot is not initialized. Please check your API key or system instruction file."
 
@@ -47,11 +50,19 @@ class GeminiChatbot:
             self.history.append({"role": "user", "parts": [user_prompt]})
             
             # Send the entire, updated history to the model
-            response = self.model.generate_content(self.history)
+            if self.tracer is not None:
+                # Non-streaming call: the whole reply arrives at once, so first and last token coincide.
+                with self.tracer.span("llm_request"):
+                    response = self.model.generate_content(self.history)
+                self.tracer.mark("first_token")
+                self.tracer.mark("last_token")
+            else:
+                response = self.model.generate_content(self.history)
             
             # Add the model's response to the history to maintain context
             if response.candidates and response.candidates[0].content:
                 self.history.append(response.candidates[0].content)
+                self.last_response_ok = True
                 return response.text
             else:
                 self.history.pop() # Remove the user's prompt if no valid response
@@ -62,6 +73,14 @@ class GeminiChatbot:
             print(f"An error occurred while getting response from Gemini: {e}")
             return "I'm sorry, I encountered an error. Please try again."
             
+    def record_cached_exchange(self, user_prompt: str, response_text: str):
+        """
+        Adds a prompt/response pair served from a ResponseCache to the history,
+        so later turns see the same conversation as if the model had answered.
+        """
+        self.history.append({"role": "user", "parts": [user_prompt]})
+        self.history.append({"role": "model", "parts": [response_text]})
+
     def authenticate(self) -> bool:
         """
         Checks if the chatbot was successfully authenticated with an API key.
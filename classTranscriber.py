@@ -9,10 +9,15 @@ from datetime import datetime, timedelta
 from queue import Queue
 from time import sleep
 from sys import platform
+from turn_tracer import get_tracer
 
 class Transcriber:
     def __init__(self, model="small", non_english=False, energy_threshold=1000,
-                 max_record_duration=2, max_phrase_duration=5, default_microphone='Built-in Microphone'):#HDA Intel PCH: ALC3266 Analog (hw:0,0)'):
+                 max_record_duration=2, max_phrase_duration=5, default_microphone='Built-in Microphone', tracer=None,
+                 audio_model=None, source=None):#HDA Intel PCH: ALC3266 Analog (hw:0,0)'):
+        # audio_model: an already loaded model (e.g. asr_scheduler.SharedWhisperModel) to use instead of loading one
+        # source: an sr.AudioSource to listen to instead of a microphone (e.g. audio_fixtures.FakeMicrophone)
+        self.tracer = tracer if tracer is not None else get_tracer()
         self.non_english = non_english
         self.model= model
         self.energy_threshold = energy_threshold
@@ -24,7 +29,9 @@ class Transcriber:
         self.transcription_history = []
         self.silence_threshold = 8
 
-        if 'linux' in platform:
+        if source is not None:
+            self.source = source
+        elif 'linux' in platform:
             mic_name = default_microphone
             if not mic_name or mic_name == 'list':
                 print("Available microphone devices are: ")
@@ -40,11 +47,15 @@ class Transcriber:
             self.source = sr.Microphone(sample_rate=16000)#, device_index=index)
 
         # Load Whisper model
-        if model in ["tiny", "base", "small", "medium", "large"]:# and not non_english:
-            model = model + ".en"
-        
-        self.audio_model = whisper.load_model(model)
-        print(f"Using Whisper model: {model}")
+        if audio_model is not None:
+            self.audio_model = audio_model
+            print(f"Using shared Whisper model: {getattr(audio_model, 'name', model)}")
+        else:
+            if model in ["tiny", "base", "small", "medium", "large"]:# and not non_english:
+                model = model + ".en"
+
+            self.audio_model = whisper.load_model(model)
+            print(f"Using Whisper model: {model}")
 
         self.record_timeout = max_record_duration
         self.data_queue = Queue()
@@ -97,11 +108,18 @@ class Transcriber:
         print("--- Transcriber state has been reset. ---")
 
 
-    def get_transcription(self):
+    def get_transcription(self, on_partial=None):
         """
         Returns the current transcription as a string.
+
+        Args:
+            on_partial (callable): Called with the text of every partial decode; if it
+                returns True, the phrase ends there without waiting for the endpoint
+                (e.g. once a navigation command has been recognised).
         """
         self.transcription = []
+        self.tracer.begin("listen")
+        ended_early = False
         while True:
             try:
                 now = datetime.utcnow()
@@ -114,7 +132,8 @@ class Transcriber:
 
                     # Transcribe current phrase so far (optional, for live feedback)
                     audio_np = np.frombuffer(self.phrase_bytes, dtype=np.int16).astype(np.float32) / 32768.0
-                    result = self.audio_model.transcribe(audio_np, fp16=torch.cuda.is_available())
+                    with self.tracer.span("decode", samples=len(audio_np)):
+                        result = self.audio_model.transcribe(audio_np, fp16=torch.cuda.is_available())
                     self.text = result['text'].strip()
                     
                     if not self.speech_started:
@@ -137,11 +156,17 @@ class Transcriber:
                         
                         # print(f"Phrase incomplete, new text is - {text} and transcription is now: ({transcription})")
 
+                    if on_partial is not None and self.text and on_partial(self.text):
+                        self.tracer.mark("vad_endpoint", reason="partial")
+                        ended_early = True
+                        break
+
                 # Check for phrase completion based on time since last audio
                 #if self.speech_started and (
                     #(self.phrase_time and (datetime.utcnow() - self.phrase_time > timedelta(seconds=self.phrase_timeout))) or self.post_speech_empty_count >= self.silence_threshold):
                 if self.speech_started and self.post_speech_empty_count >= self.silence_threshold:
                     print(f"post speech empty count is {self.post_speech_empty_count}, stopping transcription.")
+                    self.tracer.mark("vad_endpoint", reason="empty_decodes")
                     break
                     # Complete the phrase
 
@@ -152,6 +177,7 @@ class Transcriber:
                         # print(f"phrase timeout is {self.phrase_timeout} seconds.")
                         # print("Phrase timeout reached, pausing transcription.")
                         #print("Full transcription: ")
+                        self.tracer.mark("vad_endpoint", reason="phrase_timeout")
                         break
 
                 if not self.speech_started and self.leading_empty_count > 10:
@@ -169,9 +195,12 @@ class Transcriber:
                 break
         
     
-        if self.phrase_bytes:
+        if ended_early:
+            self.phrase_bytes = bytes()  # The partial decode above already covered all of it
+        elif self.phrase_bytes:
             audio_np = np.frombuffer(self.phrase_bytes, dtype=np.int16).astype(np.float32) / 32768.0
-            result = self.audio_model.transcribe(audio_np, fp16=torch.cuda.is_available())
+            with self.tracer.span("decode", samples=len(audio_np), final=True):
+                result = self.audio_model.transcribe(audio_np, fp16=torch.cuda.is_available())
             self.text = result['text'].strip()
             #Only append if text is not a repeat of the last phrase
             if not self.transcription or self.text != self.transcription[-1] or self.text == '':
@@ -188,6 +217,7 @@ class Transcriber:
         # print("Full transcription: ")
         for line in self.transcription:
             print(line)
+        self.tracer.end("listen")
         return ' '.join(self.transcription).strip()  # Return the full transcription
         
             
\ No newline at end of file
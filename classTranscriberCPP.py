@@ -5,10 +5,14 @@ import time
 from datetime import datetime, timedelta
 from queue import Queue
 from sys import platform
+from turn_tracer import get_tracer
 
 class Transcriber:
     def __init__(self, model="base.en", energy_threshold=1000,
-                 record_timeout=2, phrase_timeout=5, default_microphone='Built-in Microphone'):
+                 record_timeout=2, phrase_timeout=5, default_microphone='Built-in Microphone', tracer=None,
+                 source=None):
+        # source: an sr.AudioSource to listen to instead of a microphone (e.g. audio_fixtures.FakeMicrophone)
+        self.tracer = tracer if tracer is not None else get_tracer()
         self.energy_threshold = energy_threshold
         self.record_timeout = record_timeout
         self.phrase_timeout = phrase_timeout
@@ -28,7 +32,9 @@ class Transcriber:
         self.recorder.dynamic_energy_threshold = False  # Disable dynamic energy thresholding
 
         # Set up microphone
-        if 'linux' in platform:
+        if source is not None:
+            self.source = source
+        elif 'linux' in platform:
             mic_name = default_microphone
             for index, name in enumerate(sr.Microphone.list_microphone_names()):
                 if mic_name in name:
@@ -54,6 +60,7 @@ class Transcriber:
     def get_transcription(self):
         """Returns the current transcription as a string."""
         self.transcription = []
+        self.tracer.begin("listen")
         while True:
             try:
                 now = datetime.utcnow()
@@ -63,7 +70,8 @@ class Transcriber:
                     audio_np = np.frombuffer(audio_data, dtype=np.int16).astype(np.float32) / 32768.0
 
                     # Transcribe using Whisper.cpp
-                    result = self.audio_model.transcribe(audio_np)
+                    with self.tracer.span("decode", samples=len(audio_np)):
+                        result = self.audio_model.transcribe(audio_np)
                     if isinstance(result, list):
                         result = ''.join([s.text if hasattr(s, 'text') else str(s) for s in result])
                     self.text = result.strip()
@@ -72,6 +80,7 @@ class Transcriber:
                         self.transcription.append(self.text)
 
                 if self.transcription and len(self.transcription) > self.silence_threshold:
+                    self.tracer.mark("vad_endpoint", reason="silence_threshold")
                     break
 
                 time.sleep(0.25)  # Avoid busy waiting
@@ -82,4 +91,5 @@ class Transcriber:
                     print(line)
                 break
 
+        self.tracer.end("listen")
         return ' '.join(self.transcription).strip()
\ No newline at end of file
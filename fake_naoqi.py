@@ -0,0 +1,550 @@
+"""In-process stand-in for a NAOqi session, for running the orchestrator without a robot.
+
+FakeSession has the qi.Session calls the scripts use (connect, service, listen,
+registerService, ...) and fake services with realistic, configurable latencies:
+
+    ALTextToSpeech   say() waits for synthesis, then for the speaking time of the text
+    ALAudioPlayer    plays clips made with sayToFile (PhraseCache)
+    ALTabletService  showImage / hideImage / showWebview
+    ALLeds           fadeRGB takes its fade duration
+    ALMemory         data, events and subscriber(key).signal
+    ALAudioDevice    streams front-microphone buffers (background noise plus any
+                     audio passed to inject()) to a registered module's
+                     processRemote, in real time, as PepperMicrophone expects
+    ALMotion, ALRobotPosture  take the time of the motion
+
+Any other service accepts every call and returns None. Every call is logged in
+session.calls, every method takes _async=True and then returns a future with the
+qi.Future methods, and everything Pepper says is logged in session.speech with
+its start and end time.
+
+Latencies are in DEFAULT_LATENCIES; time_scale multiplies all of them (0 for
+tests that should not wait). Microphone audio always streams in real time.
+
+    session = new_session(args.fake)  # FakeSession with --fake or PEPPER_FAKE=1, else qi.Session()
+"""
+
+import functools
+import itertools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+import numpy as np
+
+DEFAULT_LATENCIES = {
+    'rpc': 0.005,              # Round trip of any call over the robot's Wi-Fi
+    'tts_start': 0.4,          # ALTextToSpeech.say: synthesis before the first sample plays
+    'words_per_second': 2.6,   # Speaking rate of the default voice at speed 100
+    'say_to_file': 0.6,        # ALTextToSpeech.sayToFile per phrase
+    'player_start': 0.03,      # ALAudioPlayer.play of a loaded clip
+    'tablet_show': 0.25,       # Until a picture or page is on the tablet
+    'posture': 1.5,            # ALRobotPosture.goToPosture
+}
+
+MIC_SAMPLE_RATE = 16000
+MIC_BUFFER_SAMPLES = 1365  # ALAudioDevice's front-microphone buffer at 16 kHz (about 85 ms)
+
+
+def fake_requested(flag=False):
+    """True if --fake was given or the PEPPER_FAKE environment variable is set (and not 0)."""
+    return flag or os.environ.get("PEPPER_FAKE", "").lower() not in ("", "0", "false", "no")
+
+
+def new_session(fake=False):
+    """Returns qi.Session(), or a FakeSession if fake_requested(fake)."""
+    if fake_requested(fake):
+        print("🤖 Using a fake NAOqi session: no robot involved")
+        return FakeSession()
+    import qi
+    return qi.Session()
+
+
+class FakeFuture:
+    """The qi.Future calls the scripts use, over a concurrent.futures.Future. Timeouts are in ms."""
+
+    def __init__(self, future):
+        self._future = future
+
+    def value(self, timeout=-1):
+        return self._future.result(None if timeout < 0 else timeout / 1000)
+
+    def wait(self, timeout=-1):
+        try:
+            self._future.exception(None if timeout < 0 else timeout / 1000)
+        except FutureTimeoutError:
+            pass
+        return self.isFinished()
+
+    def isFinished(self):
+        return self._future.done()
+
+    def isRunning(self):
+        return not self._future.done()
+
+    def hasError(self):
+        return self._future.done() and self._future.exception() is not None
+
+    def error(self):
+        return str(self._future.exception() or "")
+
+    def cancel(self):
+        self._future.cancel()
+
+    def addCallback(self, callback):
+        self._future.add_done_callback(lambda _: callback(self))
+
+
+def _rpc(method):
+    """Makes a fake service method behave like a qi call: logged, one round trip, and _async=True."""
+    @functools.wraps(method)
+    def call(self, *args, _async=False):
+        if _async:
+            return FakeFuture(self.session.executor.submit(call, self, *args))
+        self.session.record(self.name, method.__name__, args)
+        self.session.sleep(self.session.latencies['rpc'])
+        return method(self, *args)
+    return call
+
+
+class FakeService:
+    """A service without a dedicated fake: every call is logged and returns None."""
+
+    def __init__(self, session, name):
+        self.session = session
+        self.name = name
+
+    def __getattr__(self, method):
+        if method.startswith("_"):
+            raise AttributeError(method)
+
+        def call(*args, _async=False):
+            if _async:
+                return FakeFuture(self.session.executor.submit(call, *args))
+            self.session.record(self.name, method, args)
+            self.session.sleep(self.session.latencies['rpc'])
+        return call
+
+
+class FakeTextToSpeech(FakeService):
+    def __init__(self, session, name):
+        super().__init__(session, name)
+        self.language = "English"
+        self.volume = 1.0
+        self.parameters = {'speed': 100.0, 'pitchShift': 1.0}
+
+    def speaking_time(self, text):
+        rate = self.session.latencies['words_per_second'] * self.parameters['speed'] / 100.0
+        return len(text.split()) / rate
+
+    @_rpc
+    def say(self, text):
+        self.session.speak(text, self.name, self.session.latencies['tts_start'], self.speaking_time(text))
+
+    @_rpc
+    def sayToFile(self, text, path):
+        self.session.sleep(self.session.latencies['say_to_file'])
+        self.session.files[path] = text
+
+    @_rpc
+    def setLanguage(self, language):
+        self.language = language
+
+    @_rpc
+    def getLanguage(self):
+        return self.language
+
+    @_rpc
+    def getVoice(self):
+        return "naoenu"
+
+    @_rpc
+    def setVolume(self, volume):
+        self.volume = volume
+
+    @_rpc
+    def getVolume(self):
+        return self.volume
+
+    @_rpc
+    def setParameter(self, parameter, value):
+        self.parameters[parameter] = value
+
+    @_rpc
+    def getParameter(self, parameter):
+        return self.parameters.get(parameter, 0.0)
+
+
+class FakeAudioPlayer(FakeService):
+    def __init__(self, session, name):
+        super().__init__(session, name)
+        self._texts = {}  # file ID -> text of the clip
+        self._next_id = 1
+
+    @_rpc
+    def loadFile(self, path):
+        if path not in self.session.files:
+            raise RuntimeError(f"ALAudioPlayer::loadFile: {path} does not exist")
+        file_id = self._next_id
+        self._next_id += 1
+        self._texts[file_id] = self.session.files[path]
+        return file_id
+
+    @_rpc
+    def play(self, file_id):
+        text = self._texts[file_id]
+        duration = self.session.service("ALTextToSpeech").speaking_time(text)
+        self.session.speak(text, self.name, self.session.latencies['player_start'], duration)
+
+    @_rpc
+    def unloadFile(self, file_id):
+        self._texts.pop(file_id, None)
+
+
+class FakeTablet(FakeService):
+    def __init__(self, session, name):
+        super().__init__(session, name)
+        self.current = None
+        self.shown = []  # (time, url), None for hideImage
+
+    def _show(self, url):
+        self.session.sleep(self.session.latencies['tablet_show'])
+        self.current = url
+        self.shown.append((time.time(), url))
+        return True
+
+    @_rpc
+    def showImage(self, url):
+        return self._show(url)
+
+    @_rpc
+    def showWebview(self, url):
+        return self._show(url)
+
+    @_rpc
+    def hideImage(self):
+        self.current = None
+        self.shown.append((time.time(), None))
+
+
+class FakeLeds(FakeService):
+    def __init__(self, session, name):
+        super().__init__(session, name)
+        self.colors = {}
+
+    @_rpc
+    def fadeRGB(self, group, *color_and_duration):
+        # fadeRGB(group, 0xRRGGBB or color name, duration) or fadeRGB(group, r, g, b, duration)
+        *color, duration = color_and_duration
+        self.session.sleep(duration)
+        self.colors[group] = color[0] if len(color) == 1 else tuple(color)
+
+
+class _FakeSignal:
+    def __init__(self):
+        self._callbacks = {}
+        self._next_link = 1
+        self._lock = threading.Lock()
+
+    def connect(self, callback):
+        with self._lock:
+            link = self._next_link
+            self._next_link += 1
+            self._callbacks[link] = callback
+        return link
+
+    def disconnect(self, link):
+        with self._lock:
+            return self._callbacks.pop(link, None) is not None
+
+    def callbacks(self):
+        with self._lock:
+            return list(self._callbacks.values())
+
+
+class _FakeSubscriber:
+    def __init__(self):
+        self.signal = _FakeSignal()
+
+
+class FakeMemory(FakeService):
+    def __init__(self, session, name):
+        super().__init__(session, name)
+        self.data = {}
+        self._subscribers = {}  # key -> [_FakeSubscriber]
+        self._lock = threading.Lock()
+
+    @_rpc
+    def getData(self, key):
+        if key not in self.data:
+            raise RuntimeError(f"ALMemory::getData: key {key} not found")
+        return self.data[key]
+
+    @_rpc
+    def getListData(self, keys):
+        return [self.data.get(key) for key in keys]
+
+    @_rpc
+    def insertData(self, key, value):
+        self.data[key] = value
+
+    @_rpc
+    def raiseEvent(self, key, value):
+        """Stores the value and calls the subscribers on other threads, as NAOqi does."""
+        self.data[key] = value
+        with self._lock:
+            subscribers = list(self._subscribers.get(key, []))
+        for subscriber in subscribers:
+            for callback in subscriber.signal.callbacks():
+                self.session.executor.submit(callback, value)
+
+    @_rpc
+    def subscriber(self, key):
+        subscriber = _FakeSubscriber()
+        with self._lock:
+            self._subscribers.setdefault(key, []).append(subscriber)
+        return subscriber
+
+
+class Utterance:
+    """Audio passed to FakeAudioDevice.inject(); the times are set as it is streamed."""
+
+    def __init__(self, samples, speech_end=None):
+        self.samples = samples
+        self.speech_end = len(samples) if speech_end is None else speech_end
+        self.position = 0
+        self.start_time = None       # Capture time of the first sample
+        self.speech_end_time = None  # Capture time of the last sample of speech
+        self.done = threading.Event()
+
+
+class FakeAudioDevice(FakeService):
+    def __init__(self, session, name):
+        super().__init__(session, name)
+        self.output_volume = 80
+        self.noise_level = 30.0  # RMS of the background noise, well under the transcriber's energy threshold
+        self._preferences = {}
+        self._subscribed = set()
+        self._queue = []
+        self._lock = threading.Lock()
+
+    @_rpc
+    def setClientPreferences(self, module_name, sample_rate, channels, deinterleave):
+        self._preferences[module_name] = (sample_rate, channels, deinterleave)
+
+    @_rpc
+    def subscribe(self, module_name):
+        module = self.session.registered.get(module_name)
+        if module is None:
+            raise RuntimeError(f"ALAudioDevice::subscribe: no module registered as {module_name}")
+        with self._lock:
+            self._subscribed.add(module_name)
+        threading.Thread(target=self._stream, args=(module_name, module), name=f"FakeMic-{module_name}",
+                         daemon=True).start()
+
+    @_rpc
+    def unsubscribe(self, module_name):
+        with self._lock:
+            self._subscribed.discard(module_name)
+
+    @_rpc
+    def setOutputVolume(self, volume):
+        self.output_volume = volume
+
+    @_rpc
+    def getOutputVolume(self):
+        return self.output_volume
+
+    @_rpc
+    def sendRemoteBufferToOutput(self, frames, buffer):
+        self.session.sleep(frames / 48000.0)  # Returns once the buffer has been played
+        return True
+
+    def inject(self, samples, speech_end=None):
+        """
+        Makes the front microphone hear `samples` (16 kHz mono int16) after anything queued before.
+        Not a NAOqi method: this is how a test plays the child's voice.
+
+        Args:
+            samples (np.ndarray): The audio.
+            speech_end (int): Sample index where speech ends (audio_fixtures.Fixture.speech_end).
+
+        Returns:
+            Utterance: Its `done` event is set once the audio has been delivered.
+        """
+        utterance = Utterance(np.asarray(samples, dtype=np.int16), speech_end)
+        with self._lock:
+            self._queue.append(utterance)
+        return utterance
+
+    def _next_buffer(self, rng, start):
+        buffer = rng.normal(0.0, self.noise_level, MIC_BUFFER_SAMPLES)
+        filled = 0
+        with self._lock:
+            while self._queue and filled < MIC_BUFFER_SAMPLES:
+                utterance = self._queue[0]
+                if utterance.start_time is None:
+                    utterance.start_time = start + filled / MIC_SAMPLE_RATE
+                n = min(MIC_BUFFER_SAMPLES - filled, len(utterance.samples) - utterance.position)
+                buffer[filled:filled + n] += utterance.samples[utterance.position:utterance.position + n]
+                if utterance.position < utterance.speech_end <= utterance.position + n:
+                    utterance.speech_end_time = start + (filled + utterance.speech_end - utterance.position) / MIC_SAMPLE_RATE
+                utterance.position += n
+                filled += n
+                if utterance.position >= len(utterance.samples):
+                    self._queue.pop(0)
+                    utterance.done.set()
+        return np.clip(buffer, -32768, 32767).astype(np.int16)
+
+    def _stream(self, module_name, module):
+        rng = np.random.default_rng(0)
+        next_time = time.time()
+        while module_name in self._subscribed:
+            start = next_time
+            buffer = self._next_buffer(rng, start)
+            next_time += MIC_BUFFER_SAMPLES / MIC_SAMPLE_RATE
+            # A buffer is delivered once it has been captured, one network hop later
+            delay = next_time + self.session.latencies['rpc'] - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            timestamp = [int(start), int((start % 1) * 1e6)]
+            try:
+                module.processRemote(1, MIC_BUFFER_SAMPLES, timestamp, buffer.tobytes())
+            except Exception as e:
+                print(f"Fake ALAudioDevice: processRemote of {module_name} failed: {e}")
+
+
+class FakeMotion(FakeService):
+    @_rpc
+    def angleInterpolation(self, names, angle_lists, time_lists, is_absolute):
+        self.session.sleep(max(max(times) if isinstance(times, list) else times for times in time_lists))
+
+    @_rpc
+    def angleInterpolationWithSpeed(self, names, angles, fraction_max_speed):
+        self.session.sleep(0.2 / max(fraction_max_speed, 0.05))
+
+
+class FakePosture(FakeService):
+    @_rpc
+    def goToPosture(self, posture, speed):
+        self.session.sleep(self.session.latencies['posture'])
+        return True
+
+
+class FakeSession:
+    """Stands in for qi.Session; see the module docstring."""
+
+    SERVICES = {
+        "ALTextToSpeech": FakeTextToSpeech,
+        "ALAudioPlayer": FakeAudioPlayer,
+        "ALTabletService": FakeTablet,
+        "ALLeds": FakeLeds,
+        "ALMemory": FakeMemory,
+        "ALAudioDevice": FakeAudioDevice,
+        "ALMotion": FakeMotion,
+        "ALRobotPosture": FakePosture,
+    }
+
+    def __init__(self, latencies=None, time_scale=1.0):
+        """
+        Args:
+            latencies (dict): Overrides of DEFAULT_LATENCIES (seconds).
+            time_scale (float): Multiplies every latency; 0 makes the services answer at once.
+        """
+        self.latencies = dict(DEFAULT_LATENCIES, **(latencies or {}))
+        self.time_scale = time_scale
+        self.executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="FakeNaoqi")
+        self.url = None
+        self.calls = []      # (time, service, method, args)
+        self.speech = []     # {'text', 'source', 'called', 'start', 'end'}; 'end' is None while speaking
+        self.files = {}      # Robot path -> text, for clips made with sayToFile
+        self.registered = {}  # Module name -> object registered with registerService
+        self._service_ids = {}
+        self._next_service_id = itertools.count(1)
+        self._services = {}
+        self._lock = threading.Lock()
+        self._speech_changed = threading.Condition()
+
+    # --- qi.Session ---
+
+    def connect(self, url=None):
+        self.url = url
+
+    def isConnected(self):
+        return True
+
+    def listen(self, url):
+        pass
+
+    def service(self, name):
+        with self._lock:
+            if name not in self._services:
+                self._services[name] = self.SERVICES.get(name, FakeService)(self, name)
+            return self._services[name]
+
+    def registerService(self, name, obj):
+        with self._lock:
+            if name in self.registered:
+                raise RuntimeError(f"Service {name} is already registered")
+            service_id = next(self._next_service_id)
+            self._service_ids[service_id] = name
+            self.registered[name] = obj
+        return service_id
+
+    def unregisterService(self, service_id):
+        with self._lock:
+            name = self._service_ids.pop(service_id, None)
+            self.registered.pop(name, None)
+
+    def close(self):
+        audio_device = self._services.get("ALAudioDevice")
+        if audio_device is not None:
+            with audio_device._lock:
+                audio_device._subscribed.clear()
+        self.executor.shutdown(wait=False)
+
+    # --- Used by the fake services and by tests ---
+
+    def record(self, service, method, args):
+        self.calls.append((time.time(), service, method, args))
+
+    def sleep(self, seconds):
+        if seconds > 0 and self.time_scale > 0:
+            time.sleep(seconds * self.time_scale)
+
+    def speak(self, text, source, start_latency, duration):
+        """Pepper says `text`: `start_latency` until the sound starts, then `duration` of speech."""
+        entry = {'text': text, 'source': source, 'called': time.time(), 'start': None, 'end': None}
+        self.sleep(start_latency)
+        with self._speech_changed:
+            entry['start'] = time.time()
+            self.speech.append(entry)
+            self._speech_changed.notify_all()
+        self.sleep(duration)
+        with self._speech_changed:
+            entry['end'] = time.time()
+            self._speech_changed.notify_all()
+
+    def wait_for_speech(self, after=0, quiet=0.0, timeout=None):
+        """
+        Waits until Pepper has said something (the speech entry numbered `after` or later),
+        finished, and stayed quiet for `quiet` seconds.
+
+        Returns:
+            bool: False on timeout.
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        with self._speech_changed:
+            while True:
+                now = time.time()
+                if len(self.speech) > after and self.speech[-1]['end'] is not None:
+                    remaining_quiet = self.speech[-1]['end'] + quiet - now
+                    if remaining_quiet <= 0:
+                        return True
+                else:
+                    remaining_quiet = None
+                if deadline is not None and now >= deadline:
+                    return False
+                waits = [w for w in (remaining_quiet, None if deadline is None else deadline - now) if w is not None]
+                self._speech_changed.wait(min(waits) if waits else None)
@@ -0,0 +1,107 @@
+"""Gestures compiled to one ALMotion.angleInterpolation call each.
+
+pepper_wave used to move the arm with a series of blocking
+angleInterpolationWithSpeed/setAngles calls and time.sleep gaps: about eight
+round trips, timing that depended on the speed fraction and the network, and a
+conversation on hold until the wave was over.
+
+A Gesture is a list of keyframes (time from the start, one angle per joint),
+compiled once into the name/angle-list/time-list form angleInterpolation takes.
+GesturePlayer.play() sends it as a single asynchronous call and returns a
+qi.Future, so Pepper can talk while moving:
+
+    player = GesturePlayer(session)
+    player.say(tts, "Hello! Let's wave together!", WAVE)
+"""
+
+RIGHT_ARM = ["RShoulderPitch", "RShoulderRoll", "RElbowYaw", "RElbowRoll", "RWristYaw"]
+HEAD = ["HeadYaw", "HeadPitch"]
+
+
+class Gesture:
+    """A fixed motion timeline for a set of joints."""
+
+    def __init__(self, name, joints, keyframes):
+        """
+        Args:
+            name (str): For log messages.
+            joints (list[str]): ALMotion joint names.
+            keyframes (list[tuple]): (seconds from the start, [angle in radians per joint]),
+                in increasing time order.
+        """
+        times = [t for t, _ in keyframes]
+        if not times or times[0] <= 0 or any(b <= a for a, b in zip(times, times[1:])):
+            raise ValueError(f"Gesture '{name}': keyframe times must be positive and increasing")
+        if any(len(angles) != len(joints) for _, angles in keyframes):
+            raise ValueError(f"Gesture '{name}': every keyframe needs one angle per joint")
+        self.name = name
+        self.names = list(joints)
+        self.angle_lists = [[angles[i] for _, angles in keyframes] for i in range(len(joints))]
+        self.time_lists = [list(times) for _ in joints]
+        self.duration = times[-1]
+
+    def scaled(self, speed):
+        """The same gesture played `speed` times as fast."""
+        keyframes = [(t / speed, [angles[i] for angles in self.angle_lists])
+                     for i, t in enumerate(self.time_lists[0])]
+        return Gesture(self.name, self.names, keyframes)
+
+
+def wave(cycles=3, swing=0.7):
+    """Right hand raised, then waved `cycles` times (the motion pepper_wave always made)."""
+    up = [-0.195, -0.657, 1.2, 0.5, 0.0]
+    down = [-0.195, -0.655, 1.2, 1.0, 0.0]
+    keyframes = [(1.5, up), (2.5, down)]
+    t = 2.5
+    for i in range(cycles):
+        if i:
+            t = round(t + swing, 3)
+            keyframes.append((t, down))
+        t = round(t + swing, 3)
+        keyframes.append((t, up))  # Finishes with the hand up, as before
+    return Gesture("wave", RIGHT_ARM, keyframes)
+
+
+WAVE = wave()
+NOD = Gesture("nod", HEAD, [(0.3, [0.0, 0.25]), (0.6, [0.0, -0.05]), (0.9, [0.0, 0.25]), (1.2, [0.0, 0.0])])
+HEAD_SHAKE = Gesture("head_shake", HEAD, [(0.35, [0.35, 0.0]), (0.9, [-0.35, 0.0]), (1.45, [0.35, 0.0]),
+                                          (1.8, [0.0, 0.0])])
+GESTURES = {gesture.name: gesture for gesture in (WAVE, NOD, HEAD_SHAKE)}
+
+
+class GesturePlayer:
+    """Plays gestures on one robot, one RPC per gesture."""
+
+    def __init__(self, session):
+        """
+        Args:
+            session (qi.Session): Connected NAOqi session.
+        """
+        self.motion = session.service("ALMotion")
+
+    def play(self, gesture, wait=False):
+        """
+        Starts a gesture.
+
+        Args:
+            gesture (Gesture): What to play.
+            wait (bool): Return only when the motion is over.
+
+        Returns:
+            qi.Future: Finishes when the motion is over.
+        """
+        future = self.motion.angleInterpolation(gesture.names, gesture.angle_lists, gesture.time_lists, True,
+                                                _async=True)
+        if wait:
+            future.wait()
+        return future
+
+    def say(self, tts, text, gesture):
+        """Says `text` while playing `gesture`; returns when both are done."""
+        future = self.play(gesture)
+        tts.say(text)
+        future.wait()
+
+    def stop(self, gesture):
+        """Interrupts a gesture that is playing."""
+        self.motion.killTasksUsingResources(gesture.names)
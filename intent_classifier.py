@@ -0,0 +1,355 @@
+"""Local intent recognition for the short answers and commands of a session: yes, no, quit, back, go to picture N.
+
+ChildSession matched readiness answers by exact list membership ("yeah I'm
+ready!" was not a yes) and picture navigation used substring checks, so any
+"back" or digit in a picture description navigated. IntentClassifier resolves
+these intents on the transcript in well under a millisecond, before any chatbot
+call, in three steps:
+
+    1. keywords  rules over the normalized words, with negation taking
+                 precedence ("I'm not ready" is no, "don't stop" is not quit)
+                 and number words and ordinals read as picture numbers
+                 ("go to the third picture");
+    2. fuzzy     words close to a yes or navigation keyword (difflib) are
+                 corrected and the rules run again, for ASR spellings like
+                 "yess" or "previus";
+    3. model     nearest neighbour among the example phrases in EXAMPLES by
+                 cosine similarity of hashed character n-gram vectors (one
+                 matrix product), for answers no rule covers ("I guess so").
+
+QUIT and NO end the session, so they only come from the keyword step: a
+bare command ("stop", "bye") or a first-person request ("I want to stop",
+"can we stop now", "I'm done"). Fuzzy matching and the model never produce
+them, since "fish" is close to "finish" and "he wants to go home" is close
+to "I want to go home". A picture number needs an explicit cue ("picture
+two", "number three") and going back a command form ("go back", "previous
+picture"), so "two birds" or "he went back" describe a picture rather than
+navigate. classify() is cheap enough to run on every partial transcript (see
+Transcriber.get_transcription(on_partial=...)), so a picture request can
+end the phrase before the endpoint (see ends_phrase()).
+"""
+
+import difflib
+import re
+import time
+import zlib
+
+import numpy as np
+
+YES, NO, QUIT, BACK, GOTO, NONE = "yes", "no", "quit", "back", "goto", "none"
+READINESS = (YES, NO, QUIT)
+NAVIGATION = (QUIT, BACK, GOTO)
+
+NUMBER_WORDS = {
+    "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7, "eight": 8, "nine": 9, "ten": 10,
+    "first": 1, "second": 2, "third": 3, "fourth": 4, "fifth": 5, "sixth": 6, "seventh": 7, "eighth": 8,
+    "ninth": 9, "tenth": 10, "1st": 1, "2nd": 2, "3rd": 3, "4th": 4, "5th": 5,
+}
+YES_WORDS = {"yes", "yeah", "yep", "yup", "yea", "ya", "sure", "okay", "ok", "ready", "alright", "course",
+             "definitely", "absolutely", "lets", "start", "begin"}
+NO_WORDS = {"no", "nope", "nah", "never", "later"}
+NEGATIONS = {"not", "dont", "never", "cant", "wont"}
+QUIT_WORDS = {"quit", "exit", "stop", "goodbye", "bye"}
+PICTURE_CUES = {"picture", "pictures", "pic", "image", "photo", "number", "page", "slide"}
+# Words that do not change a command: "okay stop", "go back please"
+FILLERS = {"please", "okay", "ok", "now", "pepper", "um", "uh", "so", "just"}
+# Only words of intents that do not end the session are fuzzy-corrected
+_VOCABULARY = sorted(YES_WORDS | {"back", "previous"} | PICTURE_CUES | set(NUMBER_WORDS))
+
+# "not ready", "I don't want to", "not now"
+_NEGATED_ANSWER = re.compile(r"\b(not|dont)\b.*\b(ready|now|yet|want|wanna|like|feel|think|really)\b")
+# "no" that means yes
+_AGREEING_NO = re.compile(r"\bno (problem|worries)\b")
+# First-person requests to stop, matched on the whole command (fillers removed)
+_QUIT_REQUEST = re.compile(
+    r"^(?:(?:(?:i|we) (?:want|wanna|would like|need)|id like)(?: to)? (?:stop|quit|finish|go home)"
+    r"|(?:can|could|may) (?:i|we) (?:stop|quit|finish|go home)"
+    r"|lets (?:stop|quit|finish)"
+    r"|(?:i am|we are) (?:done|finished)"
+    r"|(?:thats|that is) enough"
+    r"|no more)$")
+# "back", "go back", "can we go back", "back to the previous picture"
+_BACK_REQUEST = re.compile(
+    r"^(?:(?:can|could) (?:we|i) |lets |i want to )?(?:go |move )?back"
+    r"(?: to the (?:previous|last|other) (?:one|picture|page|image))?$")
+# "previous picture", "show me the previous one"
+_PREVIOUS_REQUEST = re.compile(r"^(?:(?:show me|go to) )?(?:the )?previous(?: (?:one|picture|page|image|slide))?$")
+
+# Training phrases of the n-gram model
+EXAMPLES = {
+    YES: ["yes", "yeah i am ready", "i am ready", "lets go", "lets do it", "i guess so", "sounds good",
+          "okay lets start", "sure thing", "i want to play", "uh huh", "go ahead", "of course", "yes please",
+          "i think so", "ready"],
+    NO: ["no", "not now", "i am not ready", "maybe later", "i dont want to", "no thank you", "not yet",
+         "i dont feel like it", "nah", "no way", "i dont think so"],
+    QUIT: ["stop", "i want to stop", "can we stop", "i am done", "i am finished", "thats enough", "goodbye",
+           "i want to go home", "no more", "exit", "quit", "i want to finish"],
+    BACK: ["go back", "previous picture", "the one before", "back please", "last picture",
+           "show me the previous one", "can we go back"],
+    GOTO: ["go to picture two", "picture three", "show me number four", "jump to the first picture",
+           "can i see picture two"],
+    # Background: near misses and picture descriptions, so they are not pulled into a command
+    NONE: ["next picture", "next one", "i see a cat", "there is a big fish", "he caught a fish",
+           "the man is in the boat", "the cat is sleeping", "he is going home", "i like the cat",
+           "he wants to go home", "he went back", "now", "i dont know", "two birds", "the end"],
+}
+
+
+# (phrase, allowed, expected intent) checked by `python intent_classifier.py --check`
+CHECKS = [
+    ("yeah I'm ready!", READINESS, YES),
+    ("I guess so", READINESS, YES),
+    ("I'm not ready", READINESS, NO),
+    ("maybe later", READINESS, NO),
+    ("not really", READINESS, NO),
+    ("no problem", READINESS, YES),
+    ("no, I'm ready", READINESS, YES),
+    ("no, I'm not ready", READINESS, NO),
+    ("now", READINESS, NONE),
+    ("I don't know", READINESS, NONE),
+    ("stop", NAVIGATION, QUIT),
+    ("okay stop please", NAVIGATION, QUIT),
+    ("I want to stop", NAVIGATION, QUIT),
+    ("can we stop now", NAVIGATION, QUIT),
+    ("I'd like to stop", NAVIGATION, QUIT),
+    ("I'm done", NAVIGATION, QUIT),
+    ("go back", NAVIGATION, BACK),
+    ("previous picture", NAVIGATION, BACK),
+    ("go to picture two", NAVIGATION, GOTO),
+    ("go back to picture two", NAVIGATION, GOTO),
+    ("show me the third picture", NAVIGATION, GOTO),
+    # Picture descriptions and story words must not end the session or navigate
+    ("fish", NAVIGATION, NONE),
+    ("a big fish", NAVIGATION, NONE),
+    ("a big fish", READINESS, NONE),
+    ("the fish", (QUIT,), NONE),
+    ("end up", (QUIT,), NONE),
+    ("done", (QUIT,), NONE),
+    ("the end", (QUIT,), NONE),
+    ("don't stop", (QUIT,), NONE),
+    ("I don't want to stop", (QUIT,), NONE),
+    ("he can stop the boat", (QUIT,), NONE),
+    ("I like the end", (QUIT,), NONE),
+    ("he wants to go home", (QUIT,), NONE),
+    ("the boy wants to go home", (QUIT,), NONE),
+    ("two birds", NAVIGATION, NONE),
+    ("three fish", NAVIGATION, NONE),
+    ("first he will go fishing", NAVIGATION, NONE),
+    ("he went back", NAVIGATION, NONE),
+]
+
+
+# (partial transcript, whether ends_phrase() may cut the phrase there)
+PARTIAL_CHECKS = [
+    ("go back", False),              # May go on "... to picture two"
+    ("go back to picture two", True),
+    ("picture three", True),
+    ("stop", False),                 # May go on "... the cat"
+]
+
+
+def ends_phrase(intent):
+    """
+    Whether a partial transcript with this intent is complete enough to end the phrase early.
+
+    Only a keyword GOTO qualifies: "go back" or "stop" may be the start of a
+    longer phrase ("go back to picture two"), while a picture number is the
+    last thing a picture request says.
+    """
+    return intent.name == GOTO and intent.method == "keyword"
+
+
+class Intent:
+    """Result of IntentClassifier.classify()."""
+
+    def __init__(self, name, confidence=0.0, picture=None, method=None, elapsed_ms=0.0):
+        self.name = name
+        self.confidence = confidence
+        self.picture = picture        # 1-based picture number, for GOTO
+        self.method = method          # "keyword", "fuzzy" or "model"; only keyword hits are certain
+        self.elapsed_ms = elapsed_ms
+
+    def __bool__(self):
+        return self.name != NONE
+
+    def __repr__(self):
+        picture = f", picture={self.picture}" if self.picture is not None else ""
+        return f"Intent({self.name}{picture}, {self.confidence:.2f}, {self.method}, {self.elapsed_ms:.2f} ms)"
+
+
+def normalize(text):
+    """Lower case, apostrophes dropped (don't -> dont), punctuation removed; returns the words."""
+    text = text.casefold().replace("'", "").replace("’", "")
+    words = []
+    for word in re.findall(r"[a-z0-9]+", text):
+        words.extend(("i", "am") if word == "im" else (word,))
+    return words
+
+
+def picture_number(words):
+    """The first number (digits, number word or ordinal) in the words, or None."""
+    for word in words:
+        if word.isdigit():
+            return int(word)
+        if word in NUMBER_WORDS:
+            return NUMBER_WORDS[word]
+    return None
+
+
+class IntentClassifier:
+    """Keyword rules, fuzzy keyword matching and a char n-gram nearest-neighbour model."""
+
+    # Intents the model may return; QUIT, NO and GOTO need a keyword match
+    MODEL_INTENTS = (YES, BACK)
+
+    def __init__(self, examples=None, max_words=8, dimensions=4096, ngrams=(2, 3, 4), min_similarity=0.7,
+                 margin=0.1):
+        """
+        Args:
+            examples (dict): Intent -> example phrases for the model (EXAMPLES by default).
+            max_words (int): Longer utterances are never commands (a story, not an answer).
+            dimensions (int): Size of the hashed n-gram vectors.
+            ngrams (tuple): Character n-gram lengths.
+            min_similarity (float): Cosine similarity to an example the model needs to accept its intent.
+            margin (float): How much closer than the nearest NONE example that example must be.
+        """
+        self.max_words = max_words
+        self.dimensions = dimensions
+        self.ngrams = ngrams
+        self.min_similarity = min_similarity
+        self.margin = margin
+        self.labels = []
+        vectors = []
+        for intent, phrases in (examples or EXAMPLES).items():
+            for phrase in phrases:
+                vectors.append(self.vectorize(normalize(phrase)))
+                self.labels.append(intent)
+        self.examples = np.stack(vectors)
+
+    def vectorize(self, words):
+        """Unit vector of hashed character n-gram counts of the words."""
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        text = f" {' '.join(words)} "
+        for n in self.ngrams:
+            for i in range(len(text) - n + 1):
+                vector[zlib.crc32(text[i:i + n].encode()) % self.dimensions] += 1.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def classify(self, text, total_pictures=None, allowed=None):
+        """
+        Finds the intent of an utterance.
+
+        Args:
+            text (str): Transcript, final or partial.
+            total_pictures (int): Pictures there are; GOTO outside 1..total_pictures is ignored.
+            allowed (tuple): Intents to consider (e.g. READINESS or NAVIGATION); all by default.
+
+        Returns:
+            Intent: Intent NONE (falsy) if nothing matched.
+        """
+        start = time.perf_counter()
+        words = normalize(text)
+        intent = Intent(NONE)
+        if words and len(words) <= self.max_words:
+            intent = self._rules(words, total_pictures, allowed, "keyword")
+            if not intent:
+                corrected = [self._correct(word) for word in words]
+                if corrected != words:
+                    intent = self._rules(corrected, total_pictures, allowed, "fuzzy")
+            if not intent:
+                intent = self._model(words, allowed)
+        intent.elapsed_ms = (time.perf_counter() - start) * 1000
+        return intent
+
+    def _rules(self, words, total_pictures, allowed, method):
+        candidates = []
+        word_set = set(words)
+        command = [word for word in words if word not in FILLERS]
+        text = " ".join(command)
+        negated = bool(word_set & NEGATIONS)  # "don't stop" asks to go on
+        sentence = " ".join(words)
+        agreeing = bool(_AGREEING_NO.search(sentence))
+        no_positions = [i for i, word in enumerate(words) if word in NO_WORDS]
+        # A yes after the "no" wins: "no, I'm ready"
+        answered_no = bool(no_positions) and not agreeing and not set(words[no_positions[-1] + 1:]) & YES_WORDS
+        no = answered_no or bool(_NEGATED_ANSWER.search(sentence))
+        if no and negated:
+            candidates.append(Intent(NO, 0.9))
+        if not negated and command and (set(command) <= QUIT_WORDS or _QUIT_REQUEST.match(text)):
+            candidates.append(Intent(QUIT, 0.95))
+        if _BACK_REQUEST.match(text) or _PREVIOUS_REQUEST.match(text):
+            candidates.append(Intent(BACK, 0.9))
+        number = picture_number(words)
+        if number is not None and word_set & PICTURE_CUES:
+            if total_pictures is None or 1 <= number <= total_pictures:
+                candidates.append(Intent(GOTO, 0.9, picture=number))
+        if no and not negated:
+            candidates.append(Intent(NO, 0.9))
+        elif not no and (word_set & YES_WORDS or agreeing):
+            candidates.append(Intent(YES, 0.9))
+        for candidate in candidates:
+            if allowed is None or candidate.name in allowed:
+                candidate.method = method
+                return candidate
+        return Intent(NONE)
+
+    def _correct(self, word):
+        # Short words are left alone: "now" is not a misheard "no"
+        if len(word) < 4 or word in _VOCABULARY or word.isdigit():
+            return word
+        matches = difflib.get_close_matches(word, _VOCABULARY, n=1, cutoff=0.8)
+        return matches[0] if matches else word
+
+    def _model(self, words, allowed):
+        similarities = self.examples @ self.vectorize(words)
+        best = int(np.argmax(similarities))
+        name = self.labels[best]
+        if (name not in self.MODEL_INTENTS or (allowed is not None and name not in allowed)
+                or similarities[best] < self.min_similarity):
+            return Intent(NONE)
+        background = max((similarity for similarity, label in zip(similarities, self.labels) if label == NONE),
+                         default=0.0)
+        if similarities[best] - background < self.margin:
+            return Intent(NONE)
+        return Intent(name, float(similarities[best]), method="model")
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Classify phrases, or time the classifier on its examples.")
+    parser.add_argument("phrases", nargs="*", help="Phrases to classify")
+    parser.add_argument("--pictures", type=int, default=None, help="Number of pictures, for GOTO")
+    parser.add_argument("--check", action="store_true", help="Check the phrases in CHECKS; exit status 1 on a miss")
+    args = parser.parse_args()
+
+    classifier = IntentClassifier()
+    if args.check:
+        misses = 0
+        for phrase, allowed, expected in CHECKS:
+            intent = classifier.classify(phrase, 5, allowed)
+            if intent.name != expected:
+                misses += 1
+                print(f"MISS {phrase!r} {allowed}: expected {expected}, got {intent}")
+        for phrase, expected in PARTIAL_CHECKS:
+            if ends_phrase(classifier.classify(phrase, 5, NAVIGATION)) != expected:
+                misses += 1
+                print(f"MISS partial {phrase!r}: expected ends_phrase {expected}")
+        total = len(CHECKS) + len(PARTIAL_CHECKS)
+        print(f"{total - misses}/{total} checks passed")
+        raise SystemExit(1 if misses else 0)
+    if args.phrases:
+        for phrase in args.phrases:
+            print(f"{phrase!r}: {classifier.classify(phrase, args.pictures)}")
+        return
+    timings = []
+    for phrases in EXAMPLES.values():
+        for phrase in phrases:
+            timings.append(classifier.classify(phrase, args.pictures).elapsed_ms)
+    timings.sort()
+    print(f"{len(timings)} phrases: p50 {timings[len(timings) // 2]:.3f} ms, max {timings[-1]:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
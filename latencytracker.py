@@ -1,10 +1,156 @@
+import json
+import math
+import os
+import subprocess
+import sys
 import time
-from collections import deque
+from datetime import datetime
+from turn_tracer import get_tracer
+
+DEFAULT_STATS_PATH = "latency_stats.json"
+
+
+class LogHistogram:
+    """Log-bucketed latency histogram (HDR-style) with a fixed relative precision.
+
+    Values are in milliseconds. Each bucket is `precision` wider than the one before,
+    so percentiles are accurate to about that fraction of the value anywhere
+    between min_value and max_value, in a few hundred integer counters.
+    """
+
+    def __init__(self, min_value=1.0, max_value=120000.0, precision=0.02):
+        self.min_value = min_value
+        self.max_value = max_value
+        self.precision = precision
+        self._log_base = math.log1p(precision)
+        self.num_buckets = int(math.ceil(math.log(max_value / min_value) / self._log_base)) + 1
+        self.counts = [0] * self.num_buckets
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def _index(self, value):
+        if value <= self.min_value:
+            return 0
+        index = int(math.log(value / self.min_value) / self._log_base)
+        return min(index, self.num_buckets - 1)
+
+    def _bucket_value(self, index):
+        # Geometric middle of the bucket
+        return self.min_value * math.exp((index + 0.5) * self._log_base)
+
+    def record(self, value):
+        """Adds one measurement (in ms)."""
+        self.counts[self._index(value)] += 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def percentile(self, p):
+        """Returns the value below which p percent of the measurements fall."""
+        if not self.count:
+            return None
+        target = max(1, int(math.ceil(self.count * p / 100.0)))
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= target:
+                return min(max(self._bucket_value(index), self.min), self.max)
+        return self.max
+
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+    def merge(self, other):
+        """Adds every measurement of another histogram with the same layout."""
+        if (other.min_value, other.max_value, other.precision) != (self.min_value, self.max_value, self.precision):
+            raise ValueError("Cannot merge histograms with different bucket layouts")
+        for index, bucket_count in enumerate(other.counts):
+            self.counts[index] += bucket_count
+        self.count += other.count
+        self.total += other.total
+        if other.count:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+
+    def summary(self):
+        """Returns count, mean, min, max and p50/p90/p99 in ms."""
+        return {
+            'count': self.count,
+            'average_ms': self.mean(),
+            'min_ms': self.min,
+            'max_ms': self.max,
+            'p50_ms': self.percentile(50),
+            'p90_ms': self.percentile(90),
+            'p99_ms': self.percentile(99),
+        }
+
+    def to_dict(self):
+        return {
+            'min_value': self.min_value,
+            'max_value': self.max_value,
+            'precision': self.precision,
+            'count': self.count,
+            'total': self.total,
+            'min': self.min,
+            'max': self.max,
+            # Sparse: only non-empty buckets
+            'buckets': {str(i): c for i, c in enumerate(self.counts) if c},
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        hist = cls(data['min_value'], data['max_value'], data['precision'])
+        for index, bucket_count in data.get('buckets', {}).items():
+            hist.counts[int(index)] = bucket_count
+        hist.count = data.get('count', 0)
+        hist.total = data.get('total', 0.0)
+        hist.min = data.get('min')
+        hist.max = data.get('max')
+        return hist
+
+
+def default_build_label():
+    """Build label used to key persisted stats: $PEPPER_BUILD, else the git commit."""
+    label = os.environ.get("PEPPER_BUILD")
+    if label:
+        return label
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+def load_stats_file(stats_path):
+    """Returns the persisted stats ({"builds": {...}}), or an empty structure."""
+    try:
+        with open(stats_path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"builds": {}}
+    except (ValueError, OSError) as e:
+        print(f"[LATENCY] Could not read {stats_path}: {e}. Starting fresh.")
+        return {"builds": {}}
+
 
 class LatencyTracker:
     """Track latency metrics for voice conversations."""
-    
-    def __init__(self):
+
+    def __init__(self, tracer=None, stats_path=DEFAULT_STATS_PATH, build=None, report_interval=30.0):
+        """
+        Args:
+            tracer (TurnTracer): Receives the per-turn spans; defaults to the process-wide tracer.
+            stats_path (str): JSON file the histograms are persisted to, keyed by build.
+                None disables persistence.
+            build (str): Label of the build being measured; defaults to default_build_label().
+            report_interval (float): Minimum seconds between two latency summaries on the console.
+        """
+        self.tracer = tracer if tracer is not None else get_tracer()
         self.user_speaking_start = None
         self.user_speaking_end = None
         self.agent_response_start = None
@@ -13,57 +159,149 @@ class LatencyTracker:
         self.agent_silence_threshold = 200  # Agent speech detection (higher to avoid false positives)
         self.silence_duration = 1.0  # Longer silence before confirming "stopped"
         self.conversation_count = 0
-        self.recent_latencies = deque(maxlen=10)  # Keep last 10 measurements
-        
+        self.stats_path = stats_path
+        self.build = build or default_build_label()
+        self.report_interval = report_interval
+        self.session_histogram = LogHistogram()
+        self.session_started = datetime.now()
+        self._last_report = 0.0
+        self._unreported = 0
+
+        # Everything measured for this build in earlier sessions
+        self.cumulative_histogram = LogHistogram()
+        if stats_path:
+            build_stats = load_stats_file(stats_path)["builds"].get(self.build)
+            if build_stats:
+                self.cumulative_histogram = LogHistogram.from_dict(build_stats["cumulative"])
+
     def user_started_speaking(self):
         """Called when user starts speaking."""
         self.user_speaking_start = time.time()
         self.agent_response_start = None
+        self.tracer.begin_turn()
+        self.tracer.begin("user_speech")
         print(f"\n{'='*60}")
         print(f"[USER SPEAKING] Started at {time.strftime('%H:%M:%S')}")
-                
+
     def user_stopped_speaking(self):
         """Called when user stops speaking."""
         self.user_speaking_end = time.time()
+        self.tracer.end("user_speech")
+        self.tracer.mark("vad_endpoint")
         if self.user_speaking_start:
             duration = self.user_speaking_end - self.user_speaking_start
             print(f"[LATENCY] User stopped speaking (spoke for {duration:.2f}s)")
-        
+
     def agent_started_responding(self):
         """Called when agent starts responding."""
         self.agent_response_start = time.time()
-        
+        self.tracer.begin("tts")
+
         if self.user_speaking_end:
             # Time from user stopped speaking to agent started responding
             latency = self.agent_response_start - self.user_speaking_end
-            self.recent_latencies.append(latency)
-            
-            avg_latency = sum(self.recent_latencies) / len(self.recent_latencies)
-            
-            print(f"\n[LATENCY MEASUREMENT]")
-            print(f"  Response latency: {latency*1000:.0f}ms")
-            print(f"  Average (last {len(self.recent_latencies)}): {avg_latency*1000:.0f}ms")
-            print(f"  Min: {min(self.recent_latencies)*1000:.0f}ms")
-            print(f"  Max: {max(self.recent_latencies)*1000:.0f}ms\n")
-        
+            self.session_histogram.record(latency * 1000)
+            self.conversation_count += 1
+            self._unreported += 1
+            self.maybe_report()
+
+    def maybe_report(self, force=False):
+        """Prints a one-line latency summary at most once per report_interval seconds."""
+        now = time.monotonic()
+        if not self._unreported or (not force and now - self._last_report < self.report_interval):
+            return
+        s = self.session_histogram.summary()
+        print(f"\n[LATENCY] {self._unreported} new, {s['count']} total | "
+              f"p50 {s['p50_ms']:.0f}ms  p90 {s['p90_ms']:.0f}ms  p99 {s['p99_ms']:.0f}ms  "
+              f"max {s['max_ms']:.0f}ms\n")
+        self._last_report = now
+        self._unreported = 0
+
     def agent_stopped_responding(self):
         """Called when agent stops responding."""
         self.agent_response_end = time.time()
+        self.tracer.end("tts")
         if self.agent_response_start:
             duration = self.agent_response_end - self.agent_response_start
             print(f"[LATENCY] Agent finished responding (spoke for {duration:.2f}s)")
             print(f"{'='*60}\n")
-            
+
     def get_stats(self):
-        """Get latency statistics."""
-        if not self.recent_latencies:
+        """Get latency statistics for this session, plus the cumulative ones for this build."""
+        if not self.session_histogram.count:
             return "No latency measurements yet"
-        
-        avg = sum(self.recent_latencies) / len(self.recent_latencies)
-        return {
-            'average_ms': avg * 1000,
-            'min_ms': min(self.recent_latencies) * 1000,
-            'max_ms': max(self.recent_latencies) * 1000,
-            'count': len(self.recent_latencies)
-            # 'total_turns': self.conversation_count
-        }
\ No newline at end of file
+
+        stats = self.session_histogram.summary()
+        cumulative = LogHistogram()
+        cumulative.merge(self.cumulative_histogram)
+        cumulative.merge(self.session_histogram)
+        stats['build'] = self.build
+        stats['cumulative'] = cumulative.summary()
+        return stats
+
+    def save_stats(self):
+        """
+        Adds this session to the persisted stats of its build and writes the stats file.
+
+        Returns:
+            str: The stats file path, or None if persistence is disabled or nothing was measured.
+        """
+        if not self.stats_path or not self.session_histogram.count:
+            return None
+        data = load_stats_file(self.stats_path)
+        build_stats = data["builds"].setdefault(self.build, {"sessions": []})
+        # Re-read so that concurrently running sessions of the same build are not lost
+        cumulative = (LogHistogram.from_dict(build_stats["cumulative"])
+                      if "cumulative" in build_stats else LogHistogram())
+        cumulative.merge(self.session_histogram)
+        build_stats["cumulative"] = cumulative.to_dict()
+        build_stats["sessions"].append({
+            "started": self.session_started.isoformat(timespec="seconds"),
+            "ended": datetime.now().isoformat(timespec="seconds"),
+            "summary": self.session_histogram.summary(),
+        })
+        tmp_path = self.stats_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_path, self.stats_path)
+        self.cumulative_histogram = cumulative
+        self.session_histogram = LogHistogram()
+        return self.stats_path
+
+    def print_final_stats(self):
+        """Prints the end-of-session summary used by the LiveKit scripts."""
+        print("\n\nFinal Latency Statistics:")
+        print("="*60)
+        stats = self.get_stats()
+        if isinstance(stats, dict):
+            print(f"  Build: {stats['build']}")
+            print(f"  Measurements: {stats['count']}")
+            print(f"  Average latency: {stats['average_ms']:.0f}ms")
+            print(f"  p50 / p90 / p99: {stats['p50_ms']:.0f} / {stats['p90_ms']:.0f} / {stats['p99_ms']:.0f}ms")
+            print(f"  Min latency: {stats['min_ms']:.0f}ms")
+            print(f"  Max latency: {stats['max_ms']:.0f}ms")
+            c = stats['cumulative']
+            print(f"  All sessions of this build: {c['count']} measurements, "
+                  f"p50 {c['p50_ms']:.0f}ms, p90 {c['p90_ms']:.0f}ms, p99 {c['p99_ms']:.0f}ms")
+        else:
+            print("  No meaningful latency measurements recorded.")
+            print(f"  {stats}")
+        print("="*60 + "\n")
+
+
+def compare_builds(stats_path=DEFAULT_STATS_PATH):
+    """Prints the cumulative percentiles of every build found in the stats file."""
+    builds = load_stats_file(stats_path)["builds"]
+    if not builds:
+        print(f"No latency stats found in {stats_path}")
+        return
+    print(f"{'build':<16}{'sessions':>9}{'count':>8}{'p50':>9}{'p90':>9}{'p99':>9}{'max':>9}")
+    for build, build_stats in builds.items():
+        s = LogHistogram.from_dict(build_stats["cumulative"]).summary()
+        print(f"{build:<16}{len(build_stats['sessions']):>9}{s['count']:>8}"
+              f"{s['p50_ms']:>7.0f}ms{s['p90_ms']:>7.0f}ms{s['p99_ms']:>7.0f}ms{s['max_ms']:>7.0f}ms")
+
+
+if __name__ == "__main__":
+    # Usage: python latencytracker.py [latency_stats.json]
+    compare_builds(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_STATS_PATH)
@@ -10,7 +10,9 @@ product_id = os.environ["EMOEX_PRODUCT_ID"]
 firebase_api_key = os.environ["FIREBASE_API_KEY"]
 
 # Sign in to Firebase to get an ID token
-firebase_auth_url = f"https://identitytoolkit.googleapis.com/v1/accounts:signInWithPassword?key={firebase_api_key}"
+firebase_auth_url = os.environ.get(
+    "FIREBASE_AUTH_URL", "https://identitytoolkit.googleapis.com/v1/accounts:signInWithPassword")
+firebase_auth_url = f"{firebase_auth_url}?key={firebase_api_key}"
 auth_payload = {
     "email": emoex_email,
     "password": emoex_password,
@@ -27,7 +29,7 @@ auth_data = auth_response.json()
 id_token = auth_data["idToken"]
 
 # Use the ID token to request the room token
-room_token_url = "https://api.emoexai.com/realtime/roomToken"
+room_token_url = os.environ.get("EMOEX_ROOM_TOKEN_URL", "https://api.emoexai.com/realtime/roomToken")
 headers = {"Authorization": f"Bearer {id_token}"}
 room_payload = {"productId": product_id}
 room_response = requests.post(room_token_url, headers=headers, data=room_payload)
@@ -102,7 +104,7 @@ def update_env_file(filepath, updates):
 env_updates = {
     "LIVEKIT_URL": '"wss://emoex-hbcswei7.livekit.cloud"',
     # "wsUrl": "'wss://emoex-hbcswei7.livekit.cloud'",
-    "room_token_url": "https://api.emoexai.com/realtime/roomToken",
+    "room_token_url": room_token_url,
     "USER_TOKEN": f'"{user_token}"' if user_token else '""',
     "ROOM_NAME": f'"{room_name}"' if room_name else '""'
 }
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- encoding: UTF-8 -*-
+"""
+ALMemory subscriptions through qi signals instead of by-name service dispatch.
+
+memory.subscribeToEvent(event, "NaoqiEventHandler", "on_bumper_pressed") needs the
+handler registered as a qi service, and every event then goes through an RPC
+call of the method by name. ALMemory.subscriber(key).signal.connect(callback)
+calls a plain Python callable directly. MemorySubscriptions keeps the subscriber
+objects alive (the connection ends when one is garbage collected) and
+disconnects all of them on shutdown.
+
+For values that are not events, read() fetches several keys in one getListData
+call, and poll() does so periodically and reports the keys that changed.
+"""
+
+import threading
+import traceback
+
+
+class MemorySubscriptions:
+    """Signal-based ALMemory event subscriptions plus batched key reads."""
+
+    def __init__(self, memory):
+        """
+        Args:
+            memory: The ALMemory service.
+        """
+        self.memory = memory
+        self._subscriptions = []  # (key, subscriber, link id)
+        self._pollers = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, key, callback, pass_key=False):
+        """
+        Connects `callback` to an ALMemory event.
+
+        Args:
+            key (str): Event name, e.g. "RightBumperPressed".
+            callback (callable): Called with the event value, on a NAOqi thread.
+            pass_key (bool): Call callback(key, value) instead, as subscribeToEvent
+                callbacks with two arguments were.
+        """
+        if pass_key:
+            target = lambda value: callback(key, value)
+        else:
+            target = callback
+        subscriber = self.memory.subscriber(key)
+        link = subscriber.signal.connect(target)
+        with self._lock:
+            self._subscriptions.append((key, subscriber, link))
+        print("Subscribed to %s" % key)
+
+    def read(self, keys):
+        """Reads several ALMemory keys in one call. Returns {key: value}."""
+        return dict(zip(keys, self.memory.getListData(list(keys))))
+
+    def poll(self, keys, callback, interval=0.1, changes_only=True):
+        """
+        Reads `keys` every `interval` seconds with one getListData call and calls
+        callback(key, value) for each key whose value changed (or for every key).
+
+        Returns:
+            threading.Event: Set it to stop this poller; unsubscribe_all() stops all of them.
+        """
+        stop = threading.Event()
+
+        def run():
+            last = {}
+            while not stop.wait(interval):
+                try:
+                    values = self.read(keys)
+                except Exception as e:
+                    print("Error polling ALMemory: %s" % e)
+                    continue
+                for key, value in values.items():
+                    if not changes_only or last.get(key) != value:
+                        try:
+                            callback(key, value)
+                        except Exception:
+                            traceback.print_exc()
+                last = values
+
+        thread = threading.Thread(target=run, name="ALMemoryPoller", daemon=True)
+        with self._lock:
+            self._pollers.append(stop)
+        thread.start()
+        return stop
+
+    def unsubscribe_all(self):
+        """Disconnects every signal and stops every poller."""
+        with self._lock:
+            subscriptions, self._subscriptions = self._subscriptions, []
+            pollers, self._pollers = self._pollers, []
+        for stop in pollers:
+            stop.set()
+        for key, subscriber, link in subscriptions:
+            try:
+                subscriber.signal.disconnect(link)
+            except Exception as e:
+                print("Error unsubscribing from %s: %s" % (key, e))
+        if subscriptions:
+            print("Unsubscribed from %d ALMemory events" % len(subscriptions))
+
+    def __len__(self):
+        return len(self._subscriptions)
@@ -9,7 +9,6 @@ Handles:
 - Face tracking
 """
 
-import qi
 import time
 import threading
 import queue
@@ -22,10 +21,16 @@ import json
 from datetime import datetime
 import sys
 import traceback
+from naoqi_dispatcher import EventDispatcher
 
 class NaoqiEventHandler:
-    def __init__(self, session=None, motion=None, tracker=None):
-        """Initialize the event handler with optional session and face tracking services"""
+    def __init__(self, session=None, motion=None, tracker=None, dispatcher=None):
+        """Initialize the event handler with optional session and face tracking services.
+
+        The ALMemory callbacks only hand their event to `dispatcher` (a private
+        EventDispatcher by default), whose workers do the speaking, so the NAOqi
+        callback threads return immediately.
+        """
         self.session = session
         self.tts = None
         self.memory = None
@@ -36,6 +41,15 @@ class NaoqiEventHandler:
         self.is_listening = True
         self.is_tracking = False
         self.running = True
+        self._stop_callbacks = []
+
+        # Touch and bumper contacts bounce: one reaction per second is plenty.
+        # Word spotting fires in bursts: wait briefly and react to the latest word only.
+        self.dispatcher = dispatcher if dispatcher is not None else EventDispatcher(workers=2)
+        self.dispatcher.register("head_touched", self._handle_head_touched, debounce=1.0)
+        self.dispatcher.register("hand_touched", self._handle_hand_touched, debounce=1.0)
+        self.dispatcher.register("bumper_pressed", self._handle_bumper_pressed, debounce=1.5)
+        self.dispatcher.register("word_recognized", self._handle_sound_detected, coalesce=0.3)
         
         if session:
             try:
@@ -115,9 +129,23 @@ class NaoqiEventHandler:
             except:
                 pass
 
+    def add_stop_callback(self, callback):
+        """Register a function to call (without arguments) when stop() is called"""
+        self._stop_callbacks.append(callback)
+
+    def remove_stop_callback(self, callback):
+        """Unregister a function added with add_stop_callback (no error if it is not registered)"""
+        if callback in self._stop_callbacks:
+            self._stop_callbacks.remove(callback)
+
     def stop(self):
         """Stop all services and cleanup"""
         self.running = False
+        for callback in self._stop_callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print("Error in stop callback: %s" % e)
         
         # Stop face tracking
         if self.tracker:
@@ -145,6 +173,11 @@ class NaoqiEventHandler:
             except Exception as e:
                 print("Error resetting LEDs: %s" % e)
 
+        if self.dispatcher:
+            self.dispatcher.close()
+            self.dispatcher.print_stats()
+            self.dispatcher = None
+
     def is_running(self):
         """Check if the handler is running"""
         return self.running
@@ -178,10 +211,13 @@ class NaoqiEventHandler:
             print("Error toggling listening mode: %s" % e)
 
     def on_sound_detected(self, key, value):
-        """Process detected sounds"""
-        if not self.is_listening or not value:
+        """ALMemory callback for WordRecognized: queues the word for _handle_sound_detected"""
+        if not self.is_listening or not value or not self.dispatcher:
             return
-            
+        self.dispatcher.dispatch("word_recognized", key, value)
+
+    def _handle_sound_detected(self, key, value):
+        """Process detected sounds"""
         print("\n---------- Speech Detected ----------")
         print("Event Received:   ", key)
         print("Raw Event Value:  ", value)
@@ -218,11 +254,29 @@ class NaoqiEventHandler:
         print("-----------------------------------\n")
 
     def on_head_touched(self, value):
-        """Handle head touch events"""
-        if value:
-            self.say("Head touched")
+        """ALMemory callback for the head tactile sensors"""
+        # Releases (value 0) are not reactions, so they do not start a debounce window.
+        if value and self.dispatcher:
+            self.dispatcher.dispatch("head_touched", value)
+
+    def on_hand_touched(self, value):
+        """ALMemory callback for the hand tactile sensors"""
+        if value and self.dispatcher:
+            self.dispatcher.dispatch("hand_touched", value)
 
     def on_bumper_pressed(self, value):
+        """ALMemory callback for the bumpers"""
+        if value and self.dispatcher:
+            self.dispatcher.dispatch("bumper_pressed", value)
+
+    def _handle_head_touched(self, value):
+        """Handle head touch events"""
+        self.say("Head touched")
+
+    def _handle_hand_touched(self, value):
+        """Handle hand touch events"""
+        self.say("Hand touched")
+
+    def _handle_bumper_pressed(self, value):
         """Handle bumper press events"""
-        if value:
-            self.say("Bumper pressed") 
\ No newline at end of file
+        self.say("Bumper pressed") 
\ No newline at end of file
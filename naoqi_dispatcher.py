@@ -0,0 +1,187 @@
+"""Moves ALMemory event callbacks off the NAOqi callback threads, with debouncing and coalescing.
+
+NaoqiEventHandler's callbacks used to call the blocking tts.say() inside the
+ALMemory callback itself: while Pepper was speaking, event delivery backed up,
+and a bouncing bumper queued one "Bumper pressed" per bounce.
+
+EventDispatcher.dispatch() only records the event and returns; a small pool of
+worker threads runs the handlers. Each event type can have:
+    debounce   seconds after an accepted event during which further events of
+               the same type are dropped (leading edge: the first press counts);
+    coalesce   seconds to wait after the first event before running the handler,
+               with every event arriving meanwhile replacing the pending one
+               (trailing edge: only the latest value is handled).
+Handlers of one event type never run concurrently; an event arriving while its
+handler is busy waits in a single pending slot, replacing any older pending one.
+
+stats() reports received, handled, debounced, coalesced and dropped counts, the
+current and highest queue depth, and percentiles of the wait between an event
+(the latest one, for coalesced events) and the start of its handler.
+"""
+
+import threading
+import time
+import traceback
+from queue import Queue, Empty, Full
+
+from latencytracker import LogHistogram
+
+
+class _EventState:
+    def __init__(self, handler, debounce, coalesce):
+        self.handler = handler
+        self.debounce = debounce
+        self.coalesce = coalesce
+        self.last_accepted = None
+        self.pending = None       # (args, received_at) waiting for the coalesce window or a busy handler
+        self.timer = None
+        self.busy = False
+        self.received = 0
+        self.handled = 0
+        self.debounced = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.errors = 0
+
+
+class EventDispatcher:
+    """Runs registered event handlers on worker threads, with per-event debounce and coalesce windows."""
+
+    def __init__(self, workers=2, max_queue=64):
+        """
+        Args:
+            workers (int): Worker threads running handlers.
+            max_queue (int): Events waiting for a worker before new ones are dropped.
+        """
+        self._events = {}
+        self._lock = threading.Lock()
+        self._queue = Queue(maxsize=max_queue)
+        self._running = True
+        self.max_queue_depth = 0
+        self.queue_wait = LogHistogram(min_value=0.01)
+        self._workers = [threading.Thread(target=self._work, name="EventDispatcher-%d" % i, daemon=True)
+                         for i in range(workers)]
+        for worker in self._workers:
+            worker.start()
+
+    def register(self, name, handler, debounce=0.0, coalesce=0.0):
+        """
+        Args:
+            name (str): Event type, as passed to dispatch().
+            handler (callable): Called with the dispatch() arguments on a worker thread.
+            debounce (float): Seconds during which events following an accepted one are dropped.
+            coalesce (float): Seconds to collect events before handling only the latest.
+        """
+        with self._lock:
+            self._events[name] = _EventState(handler, debounce, coalesce)
+
+    def dispatch(self, name, *args):
+        """Hands an event to the workers. Never blocks; safe to call from NAOqi callback threads."""
+        if not self._running:
+            return
+        now = time.monotonic()
+        with self._lock:
+            state = self._events[name]
+            state.received += 1
+            if state.debounce and state.last_accepted is not None and now - state.last_accepted < state.debounce:
+                state.debounced += 1
+                return
+            if state.pending is not None:
+                # A coalesce window is open or the handler is busy: the newest value wins.
+                state.pending = (args, now)
+                state.coalesced += 1
+                return
+            state.last_accepted = now
+            if state.coalesce:
+                state.pending = (args, now)
+                state.timer = threading.Timer(state.coalesce, self._release, (name,))
+                state.timer.daemon = True
+                state.timer.start()
+                return
+            if state.busy:
+                state.pending = (args, now)
+                return
+            self._enqueue(name, state, args, now)
+
+    def _enqueue(self, name, state, args, received_at):
+        # Called with self._lock held.
+        try:
+            self._queue.put_nowait((name, args, received_at))
+        except Full:
+            state.dropped += 1
+            return
+        state.busy = True
+        depth = self._queue.qsize()
+        if depth > self.max_queue_depth:
+            self.max_queue_depth = depth
+
+    def _release(self, name):
+        """Ends a coalesce window: queues the latest value unless the handler is still busy."""
+        with self._lock:
+            state = self._events[name]
+            state.timer = None
+            if state.pending is not None and not state.busy:
+                args, received_at = state.pending
+                state.pending = None
+                self._enqueue(name, state, args, received_at)
+
+    def _work(self):
+        while self._running:
+            try:
+                name, args, received_at = self._queue.get(timeout=0.5)
+            except Empty:
+                continue
+            wait_ms = (time.monotonic() - received_at) * 1000
+            state = self._events[name]
+            try:
+                state.handler(*args)
+            except Exception as e:
+                state.errors += 1
+                print("Error in %s handler: %s" % (name, e))
+                traceback.print_exc()
+            with self._lock:
+                self.queue_wait.record(wait_ms)
+                state.handled += 1
+                state.busy = False
+                if state.pending is not None and state.timer is None:
+                    # Arrived while the handler ran; handle the latest one now.
+                    args, received_at = state.pending
+                    state.pending = None
+                    self._enqueue(name, state, args, received_at)
+
+    def close(self, timeout=2.0):
+        """Stops the workers after they finish the handlers they are running; queued events are dropped."""
+        self._running = False
+        with self._lock:
+            for state in self._events.values():
+                if state.timer is not None:
+                    state.timer.cancel()
+                    state.timer = None
+                state.pending = None
+        for worker in self._workers:
+            worker.join(timeout=timeout)
+
+    def stats(self):
+        with self._lock:
+            events = {name: {'received': s.received, 'handled': s.handled, 'debounced': s.debounced,
+                             'coalesced': s.coalesced, 'dropped': s.dropped, 'errors': s.errors}
+                      for name, s in self._events.items()}
+        wait = self.queue_wait.summary()
+        return {
+            'events': events,
+            'queue_depth': self._queue.qsize(),
+            'max_queue_depth': self.max_queue_depth,
+            'queue_wait_p50_ms': wait['p50_ms'],
+            'queue_wait_p99_ms': wait['p99_ms'],
+        }
+
+    def print_stats(self):
+        stats = self.stats()
+        print("Event dispatcher: queue depth %d (max %d), queue wait p50 %s ms, p99 %s ms" % (
+            stats['queue_depth'], stats['max_queue_depth'],
+            "%.1f" % stats['queue_wait_p50_ms'] if stats['queue_wait_p50_ms'] is not None else "-",
+            "%.1f" % stats['queue_wait_p99_ms'] if stats['queue_wait_p99_ms'] is not None else "-"))
+        for name, counts in stats['events'].items():
+            print("  %-16s received %d, handled %d, debounced %d, coalesced %d, dropped %d, errors %d" % (
+                name, counts['received'], counts['handled'], counts['debounced'], counts['coalesced'],
+                counts['dropped'], counts['errors']))
@@ -16,11 +16,14 @@ Workflow:
 
 Dependencies:
     - classTranscriber.py: Provides the Transcriber class for speech recognition.
-    - chat_master/src/classChatbot.py: Provides the Chatbot class for AI interaction."""
+    - chat_master/src/classChatbot.py: Provides the Chatbot class for AI interaction.
+
+Set PEPPER_TRACE=1 to print a per-turn latency breakdown and write a Chrome trace on exit."""
 
 import time
 from classTranscriber import Transcriber
 from chat_master.src.classChatbot import Chatbot
+from turn_tracer import get_tracer
 
 def main():
     user_transcriptions = []
@@ -28,6 +31,7 @@ def main():
     max_wait_time = 15  # seconds to wait for user voice input
     wait_start_time = None
     prompted = False
+    tracer = get_tracer()
 
     # Initialize the transcriber
     transcriber = Transcriber(
@@ -35,10 +39,11 @@ def main():
         energy_threshold=1000,
         record_timeout=2,
         phrase_timeout=3,
-        default_microphone="HDA Intel PCH: ALC3266 Analog (hw:0,0)"
+        default_microphone="HDA Intel PCH: ALC3266 Analog (hw:0,0)",
+        tracer=tracer
     )
     
-    chatbot = Chatbot()
+    chatbot = Chatbot(tracer=tracer)
 
     if not chatbot.authenticate():
         print("Authentication failed. Exiting.")
@@ -47,6 +52,7 @@ def main():
     # print("Authentication successful. Starting transcription. \n(Say 'quit', 'exit', or 'stop' to end conversation)")
     
     total_start_time = transcriber_start_time = time.time() #To calculate transcription time lag
+    tracer.begin_turn()
 
     while True:
         # Initialising total and transcription time calculation
@@ -97,6 +103,9 @@ def main():
                 print(f"[Transcription Lag: {transcriber_end_time - transcriber_start_time:.2f} seconds]")
                 print(f"[Chatbot Lag: {chatbot_end_time - chatbot_start_time:.2f} seconds]")
                 print(f"[Total Lag: {time.time() - total_start_time:.2f} seconds]")
+                if tracer.enabled:
+                    print(tracer.format_turn_summary())
+                tracer.begin_turn()
                 continue
             else:
                 print("Silence detected. Waiting for you to say something...")
@@ -104,6 +113,9 @@ def main():
     print("Full Conversation: ")
     for entry in conversation_history:
         print(entry)
+    if tracer.enabled:
+        tracer.end_turn()
+        print(f"Latency trace saved to: {tracer.export_chrome_trace('orchestrator_trace.json')}")
 
 if __name__ == "__main__":
     main()
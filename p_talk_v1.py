@@ -221,22 +221,17 @@ async def main() -> None:
         await asyncio.Event().wait()
     except KeyboardInterrupt:
         print("\nInterrupted. Leaving...")
-        print("\n\nFinal Latency Statistics:")
-        print("="*60)
-        stats = latency_tracker.get_stats()
-        if isinstance(stats, dict):
-            print(f"  Average latency: {stats['average_ms']:.0f}ms")
-            print(f"  Min latency: {stats['min_ms']:.0f}ms")
-            print(f"  Max latency: {stats['max_ms']:.0f}ms")
-            print(f"  Measurements: {stats['count']}")
-        else:
-            print("  No meaningful latency measurements recorded.")
-            print(f"  {stats}")
-        print("="*60 + "\n")
+        latency_tracker.print_final_stats()
     finally:
+        latency_tracker.maybe_report(force=True)  # Latencies since the last periodic report
         await room.disconnect()
         if pepper_session:
             pepper_session.close()
+        stats_file = latency_tracker.save_stats()
+        if stats_file:
+            print(f"Latency histograms saved to: {stats_file}")
+        if latency_tracker.tracer.enabled:
+            print(f"Latency trace saved to: {latency_tracker.tracer.export_chrome_trace('livekit_trace.json')}")
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
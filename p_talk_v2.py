@@ -1,11 +1,13 @@
 import asyncio
-import pyaudio
 from livekit import rtc
-import numpy as np
 import dotenv
 import concurrent.futures
-import qi
+from fake_naoqi import new_session
 from latencytracker import LatencyTracker
+from audio_metrics import FrameMeter, SpeechGate
+from audio_capture import MicrophoneCapture, LoopLagMonitor
+from pepper_audio_out import PepperAudioSender
+from audio_resample import StreamingResampler
 
 # Configuration
 PEPPER_IP = "169.254.84.236"  # Change this to your Pepper's IP
@@ -18,17 +20,19 @@ ROOM_NAME = dotenv.get_key(".env.livekit", "ROOM_NAME")
 WS_URL = dotenv.get_key(".env.livekit", "LIVEKIT_URL")
 
 latency_tracker = LatencyTracker()
+loop_lag_monitor = LoopLagMonitor()
 
 # Global Pepper connection
 pepper_session = None
 pepper_audio_device = None
+pepper_sender = None  # Jitter buffer + sender thread in front of pepper_audio_device
 
 def connect_to_pepper():
     """Connect to Pepper robot and return audio device service."""
-    global pepper_session, pepper_audio_device
+    global pepper_session, pepper_audio_device, pepper_sender
     try:
         print(f"Connecting to Pepper at {PEPPER_IP}:{PEPPER_PORT}...")
-        pepper_session = qi.Session()
+        pepper_session = new_session()  # A fake session when PEPPER_FAKE=1
         pepper_session.connect(f"tcp://{PEPPER_IP}:{PEPPER_PORT}")
         pepper_audio_device = pepper_session.service("ALAudioDevice")
         
@@ -39,6 +43,7 @@ def connect_to_pepper():
         except Exception as e:
             print(f"✅ Connected to Pepper, but couldn't set volume: {e}")
         
+        pepper_sender = PepperAudioSender(pepper_audio_device, sample_rate=48000, channels=2)
         return pepper_audio_device
     except Exception as e:
         print(f"❌ Failed to connect to Pepper: {e}")
@@ -48,10 +53,11 @@ async def play_audio_track(track: rtc.RemoteAudioTrack):
     """Receive agent audio from LiveKit and stream to Pepper."""
     audio_stream = rtc.AudioStream(track)
     
-    agent_was_speaking = False
     first_frame = True
-    silence_frames = 0
-    silence_threshold_frames = int(latency_tracker.silence_duration * 100)
+    resampler = None  # Built from the first frame's format, rebuilt if the format changes
+    meter = FrameMeter()
+    agent_gate = SpeechGate(latency_tracker.agent_silence_threshold,
+                            hangover_frames=int(latency_tracker.silence_duration * 100))
     
     try:
         async for event in audio_stream:
@@ -61,58 +67,33 @@ async def play_audio_track(track: rtc.RemoteAudioTrack):
                 print(f"\n[AUDIO CONFIG] {frame.sample_rate}Hz, {frame.num_channels}ch")
                 first_frame = False
             
-            audio_bytes = frame.data.tobytes()
+            if resampler is None or (resampler.in_rate, resampler.in_channels) != (frame.sample_rate, frame.num_channels):
+                resampler = StreamingResampler(frame.sample_rate, 48000, frame.num_channels, 2)
+                if frame.sample_rate != 48000:
+                    print(f"[AUDIO CONFIG] Resampling {frame.sample_rate}Hz -> 48000Hz for Pepper")
             
-            if len(audio_bytes) > 0:
+            if frame.samples_per_channel > 0:
                 # Calculate RMS for speech detection
-                audio_array = np.frombuffer(audio_bytes, np.int16)
-                mean_square = np.mean(audio_array.astype(np.float64)**2)
-                
-                if not np.isnan(mean_square) and mean_square >= 0:
-                    rms = int(np.sqrt(mean_square))
-                    if rms > 100:
-                        print(f"[Agent speaking: RMS {rms}]", end=' ', flush=True)
-                else:
-                    rms = 0
+                rms = meter.rms(frame.data)
+                if rms > 100:
+                    print(f"[Agent speaking: RMS {rms}]", end=' ', flush=True)
                 
                 # Detect when agent starts/stops speaking
-                is_speaking = rms > latency_tracker.agent_silence_threshold
-                
-                if is_speaking:
-                    silence_frames = 0
-                    if not agent_was_speaking:
-                        latency_tracker.agent_started_responding()
-                        agent_was_speaking = True
-                else:
-                    if agent_was_speaking:
-                        silence_frames += 1
-                        if silence_frames >= silence_threshold_frames:
-                            latency_tracker.agent_stopped_responding()
-                            agent_was_speaking = False
-                            silence_frames = 0
+                transition = agent_gate.update(rms)
+                if transition == "start":
+                    latency_tracker.agent_started_responding()
+                elif transition == "stop":
+                    latency_tracker.agent_stopped_responding()
+                    if pepper_sender:
+                        pepper_sender.flush()  # Don't hold back the tail of the sentence
                 
                 # Convert to Pepper format and send
-                if pepper_audio_device:
-                    # Convert mono to stereo by duplicating channels
-                    if frame.num_channels == 1:
-                        mono_array = np.frombuffer(audio_bytes, dtype=np.int16)
-                        stereo_array = np.repeat(mono_array, 2)
-                        stereo_bytes = stereo_array.tobytes()
-                    else:
-                        # Already stereo
-                        stereo_bytes = audio_bytes
-                    
-                    # Resample if needed (Pepper expects 48kHz)
-                    if frame.sample_rate != 48000:
-                        print(f"⚠️  Warning: Sample rate is {frame.sample_rate}Hz, Pepper expects 48000Hz")
-                        # For now, send as-is. You may need resampling library for perfect quality
+                if pepper_sender:
+                    # 48 kHz interleaved stereo, written into the resampler's reused buffer
+                    pepper_audio = resampler.process(frame.data)
                     
-                    # Send to Pepper
-                    nbOfFrames = len(stereo_bytes) // 4  # 4 bytes per stereo frame (2 channels * 2 bytes)
-                    try:
-                        pepper_audio_device.sendRemoteBufferToOutput(nbOfFrames, bytes(stereo_bytes))
-                    except Exception as e:
-                        print(f"\n❌ Error sending audio to Pepper: {e}")
+                    # Queue for Pepper; the sender thread batches frames into ~100-200 ms RPCs
+                    pepper_sender.push(pepper_audio.data)
     
     except Exception as e:
         print(f"\n❌ Error in audio playback: {e}")
@@ -130,30 +111,23 @@ async def publish_microphone(local: rtc.LocalParticipant):
 
 async def capture_microphone(source: rtc.AudioSource):
     """Read PC microphone frames and push them to LiveKit."""
-    pa = pyaudio.PyAudio()
-    stream = pa.open(
-        format=pyaudio.paInt16,
-        channels=1,
-        rate=48000,
-        input=True,
-        frames_per_buffer=480)  # 10 ms @ 48 kHz
+    # PyAudio runs in callback mode on its own thread; frames arrive through a bounded queue.
+    capture = MicrophoneCapture(rate=48000, channels=1, frames_per_buffer=480).start()  # 10 ms @ 48 kHz
     
-    user_was_speaking = False
-    silence_frames = 0
-    silence_threshold_frames = int(latency_tracker.silence_duration * 100)
+    meter = FrameMeter()
+    user_gate = SpeechGate(latency_tracker.user_silence_threshold,
+                           hangover_frames=int(latency_tracker.silence_duration * 100))
     noise_gate_threshold = 80
+    silent_frame = bytes(480 * 2)  # One 10 ms frame of int16 zeros, reused by the noise gate
     
     try:
-        while True:
-            data = stream.read(480, exception_on_overflow=False)
-            frame = np.frombuffer(data, dtype=np.int16)
-            
+        async for data in capture:
             # Calculate RMS for visual feedback
-            rms = int(np.sqrt(np.mean(np.abs(frame.astype(np.float64))**2)))
+            rms = meter.rms(data)
             
             # Apply noise gate
             if rms < noise_gate_threshold:
-                frame = np.zeros(480, dtype=np.int16)
+                data = silent_frame
                 rms = 0
             
             if rms > 50:
@@ -161,30 +135,20 @@ async def capture_microphone(source: rtc.AudioSource):
                 bar = "█" * bar_length
                 print(f"\r{bar:<30} {rms:4d}", end='', flush=True)
             
-            is_speaking = rms > latency_tracker.user_silence_threshold
-            
-            if is_speaking:
-                silence_frames = 0
-                if not user_was_speaking:
-                    latency_tracker.user_started_speaking()
-                    user_was_speaking = True
-            else:
-                if user_was_speaking:
-                    silence_frames += 1
-                    if silence_frames >= silence_threshold_frames:
-                        latency_tracker.user_stopped_speaking()
-                        user_was_speaking = False
-                        silence_frames = 0
+            transition = user_gate.update(rms)
+            if transition == "start":
+                latency_tracker.user_started_speaking()
+            elif transition == "stop":
+                latency_tracker.user_stopped_speaking()
 
             await source.capture_frame(rtc.AudioFrame(
-                data=frame.tobytes(),
+                data=data,
                 sample_rate=48000,
                 samples_per_channel=480,
                 num_channels=1))
     finally:
-        stream.stop_stream()
-        stream.close()
-        pa.terminate()
+        capture.close()
+        print(f"\n[CAPTURE] {capture.stats()}")
 
 
 async def main() -> None:
@@ -230,6 +194,7 @@ async def main() -> None:
     print("="*60)
     print("Speak into your PC mic. Agent will respond through Pepper.")
     print("Press Ctrl+C to exit and see final statistics.\n")
+    loop_lag_monitor.start()
     
     await publish_microphone(room.local_participant)
 
@@ -240,22 +205,22 @@ async def main() -> None:
         await asyncio.Event().wait()
     except KeyboardInterrupt:
         print("\nInterrupted. Leaving...")
-        print("\n\nFinal Latency Statistics:")
-        print("="*60)
-        stats = latency_tracker.get_stats()
-        if isinstance(stats, dict):
-            print(f"  Average latency: {stats['average_ms']:.0f}ms")
-            print(f"  Min latency: {stats['min_ms']:.0f}ms")
-            print(f"  Max latency: {stats['max_ms']:.0f}ms")
-            print(f"  Measurements: {stats['count']}")
-        else:
-            print("  No meaningful latency measurements recorded.")
-            print(f"  {stats}")
-        print("="*60 + "\n")
+        latency_tracker.print_final_stats()
     finally:
+        latency_tracker.maybe_report(force=True)  # Latencies since the last periodic report
+        loop_lag_monitor.stop()
+        print(loop_lag_monitor.format_summary())
         await room.disconnect()
+        if pepper_sender:
+            pepper_sender.close()
+            print(f"[PEPPER AUDIO] {pepper_sender.stats()}")
         if pepper_session:
             pepper_session.close()
+        stats_file = latency_tracker.save_stats()
+        if stats_file:
+            print(f"Latency histograms saved to: {stats_file}")
+        if latency_tracker.tracer.enabled:
+            print(f"Latency trace saved to: {latency_tracker.tracer.export_chrome_trace('livekit_trace.json')}")
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
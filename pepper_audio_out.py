@@ -0,0 +1,170 @@
+"""Jitter buffer and batched sender for agent audio streamed to Pepper.
+
+play_audio_track used to call ALAudioDevice.sendRemoteBufferToOutput once per
+10 ms LiveKit frame, synchronously, from inside the event loop. Every call is a
+network RPC to the robot, so any hiccup on the network or the loop shows up as
+choppy, truncated speech.
+
+PepperAudioSender takes the frames from the loop without blocking, aggregates
+them into chunks of roughly 100-200 ms and sends them from a dedicated thread.
+The chunk size adapts: an underrun (the robot ran out of audio while the agent
+was still talking) grows the target by one step, and a long run of clean sends
+shrinks it back towards the minimum, so latency stays as low as the link allows.
+If the robot cannot keep up and more than max_buffer_ms piles up, the oldest
+audio is discarded and counted as an overrun.
+"""
+
+import threading
+import time
+
+MAX_FRAMES_PER_CALL = 16384  # ALAudioDevice limit for sendRemoteBufferToOutput
+
+
+class PepperAudioSender:
+    """Buffers interleaved int16 PCM and sends it to ALAudioDevice in larger chunks."""
+
+    def __init__(self, audio_device, sample_rate=48000, channels=2,
+                 target_ms=120, min_ms=100, max_ms=200, step_ms=20,
+                 max_buffer_ms=2000, end_of_stream_ms=60, shrink_after=50):
+        """
+        Args:
+            audio_device: The ALAudioDevice service.
+            sample_rate (int): Sample rate of the pushed audio (Pepper plays 48000 Hz).
+            channels (int): Interleaved channels of the pushed audio (Pepper expects 2).
+            target_ms (int): Initial chunk size.
+            min_ms, max_ms (int): Bounds for the adaptive chunk size.
+            step_ms (int): How much an underrun grows the chunk size.
+            max_buffer_ms (int): Buffered audio beyond which the oldest audio is dropped.
+            end_of_stream_ms (int): Idle time after which a partial chunk is sent anyway
+                (the agent paused or finished a sentence).
+            shrink_after (int): Clean chunks in a row before the chunk size shrinks by one step.
+        """
+        self.audio_device = audio_device
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.bytes_per_ms = sample_rate * channels * 2 // 1000
+        self.frame_bytes = channels * 2
+        self.target_ms = target_ms
+        self.min_ms = min_ms
+        self.max_ms = max_ms
+        self.step_ms = step_ms
+        self.max_buffer_bytes = max_buffer_ms * self.bytes_per_ms
+        self.end_of_stream_s = end_of_stream_ms / 1000.0
+        self.shrink_after = shrink_after
+
+        self.underruns = 0
+        self.overruns = 0
+        self.dropped_ms = 0.0
+        self.chunks_sent = 0
+        self.send_errors = 0
+        self.max_send_ms = 0.0
+
+        self._buffer = bytearray()
+        self._cond = threading.Condition()
+        self._last_push = 0.0
+        self._flush_requested = False
+        self._streaming = False  # True between the first chunk of an utterance and its end
+        self._playout_deadline = 0.0
+        self._clean_chunks = 0
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="PepperAudioSender", daemon=True)
+        self._thread.start()
+
+    def push(self, pcm):
+        """Appends interleaved int16 PCM. Never blocks on the network; safe from the event loop."""
+        with self._cond:
+            self._buffer += pcm
+            overflow = len(self._buffer) - self.max_buffer_bytes
+            if overflow > 0:
+                overflow -= overflow % self.frame_bytes
+                del self._buffer[:overflow]
+                self.overruns += 1
+                self.dropped_ms += overflow / self.bytes_per_ms
+            self._last_push = time.monotonic()
+            self._cond.notify()
+
+    def flush(self):
+        """Sends whatever is buffered without waiting for a full chunk (end of an utterance)."""
+        with self._cond:
+            self._flush_requested = True
+            self._cond.notify()
+
+    def _next_chunk(self):
+        """Waits for a chunk to send. Returns None when the sender is closed."""
+        with self._cond:
+            while self._running:
+                target_bytes = self.target_ms * self.bytes_per_ms
+                buffered = len(self._buffer)
+                now = time.monotonic()
+                idle = now - self._last_push
+                if buffered >= target_bytes or (buffered and (self._flush_requested or idle >= self.end_of_stream_s)):
+                    size = min(buffered, target_bytes, MAX_FRAMES_PER_CALL * self.frame_bytes)
+                    size -= size % self.frame_bytes
+                    chunk = bytes(self._buffer[:size])
+                    del self._buffer[:size]
+                    if not self._buffer:
+                        self._flush_requested = False
+                    return chunk
+
+                if self._streaming and idle < self.end_of_stream_s and now > self._playout_deadline:
+                    # The agent is still talking but Pepper has played everything we sent.
+                    self.underruns += 1
+                    self._clean_chunks = 0
+                    self.target_ms = min(self.max_ms, self.target_ms + self.step_ms)
+                    self._playout_deadline = float("inf")  # Count each gap once
+                elif self._streaming and idle >= self.end_of_stream_s and not buffered:
+                    self._streaming = False  # Utterance over; the next one prebuffers again
+                self._cond.wait(0.005 if self._streaming else 0.05)
+            return None
+
+    def _run(self):
+        while True:
+            chunk = self._next_chunk()
+            if chunk is None:
+                return
+            frames = len(chunk) // self.frame_bytes
+            start = time.monotonic()
+            try:
+                self.audio_device.sendRemoteBufferToOutput(frames, chunk)
+            except Exception as e:
+                self.send_errors += 1
+                print(f"\n❌ Error sending audio to Pepper: {e}")
+            elapsed = time.monotonic() - start
+            self.max_send_ms = max(self.max_send_ms, elapsed * 1000)
+            duration = frames / self.sample_rate
+            with self._cond:
+                self.chunks_sent += 1
+                # Pepper plays the chunks back to back, so this one ends `duration` after the previous one.
+                previous_end = self._playout_deadline
+                if not self._streaming or previous_end == float("inf"):
+                    previous_end = start
+                self._playout_deadline = max(start, previous_end) + duration
+                self._streaming = True
+                self._clean_chunks += 1
+                if self._clean_chunks >= self.shrink_after and self.target_ms > self.min_ms:
+                    self.target_ms = max(self.min_ms, self.target_ms - self.step_ms)
+                    self._clean_chunks = 0
+
+    def close(self, drain=True, timeout=2.0):
+        """Stops the sender thread, first sending what is left if drain is True."""
+        if drain:
+            self.flush()
+            deadline = time.monotonic() + timeout
+            while self._buffer and time.monotonic() < deadline:
+                time.sleep(0.01)
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        self._thread.join(timeout)
+
+    def stats(self):
+        return {
+            'chunks_sent': self.chunks_sent,
+            'target_ms': self.target_ms,
+            'buffered_ms': len(self._buffer) / self.bytes_per_ms,
+            'underruns': self.underruns,
+            'overruns': self.overruns,
+            'dropped_ms': round(self.dropped_ms, 1),
+            'send_errors': self.send_errors,
+            'max_send_ms': round(self.max_send_ms, 1),
+        }
@@ -0,0 +1,241 @@
+"""Live frames from Pepper's cameras as numpy arrays.
+
+Pepper_actions.record_video writes an MJPG file on the robot that can only be
+looked at after it has been downloaded. PepperCamera subscribes to ALVideoDevice
+(subscribeCamera) and keeps fetching frames with getImageRemote on a background
+thread, so analysis code (engagement, face presence) can ask for the latest one:
+
+    with PepperCamera(session) as camera:
+        frame = camera.latest(max_age=0.2)
+        if frame is not None:
+            analyse(frame.image)  # height x width x 3, BGR, uint8
+
+Two getImageRemote calls are kept in flight (the next transfer runs while the
+previous one is delivered), paced at the subscription's frame rate so the same
+image is not fetched twice. Each image buffer is wrapped with np.frombuffer
+rather than copied, so frames are read-only; copy one before drawing on it.
+
+Measured:
+    fetch_ms    time from a getImageRemote request to its image arriving here
+    fps         frames delivered per second (duplicates of the previous image not counted)
+"""
+
+import argparse
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from latencytracker import LogHistogram
+
+TOP_CAMERA, BOTTOM_CAMERA = 0, 1
+RESOLUTIONS = {0: (160, 120), 1: (320, 240), 2: (640, 480)}  # ALVideoDevice kQQVGA, kQVGA, kVGA
+YUV_COLOR_SPACE, RGB_COLOR_SPACE, BGR_COLOR_SPACE = 0, 11, 13  # kYuvColorSpace is grayscale (Y only)
+
+
+class Frame:
+    """One camera image, as returned by PepperCamera.latest()."""
+
+    def __init__(self, image, timestamp, received, fetch_ms, index):
+        self.image = image          # Read-only numpy view of the image buffer
+        self.timestamp = timestamp  # Robot time the image was taken
+        self.received = received    # Local time it arrived here
+        self.fetch_ms = fetch_ms
+        self.index = index          # Counts delivered frames from 1
+
+    @property
+    def age(self):
+        """Seconds since the frame arrived."""
+        return time.time() - self.received
+
+
+class PepperCamera:
+    """Streams one of Pepper's cameras on a background thread; latest() returns the newest frame."""
+
+    def __init__(self, session, camera=TOP_CAMERA, resolution=1, color_space=BGR_COLOR_SPACE, fps=15,
+                 name="PepperCamera", in_flight=2):
+        """
+        Args:
+            session (qi.Session): Connected NAOqi session.
+            camera (int): TOP_CAMERA or BOTTOM_CAMERA.
+            resolution (int): Key of RESOLUTIONS; 1 (320x240) is enough for face presence.
+            color_space (int): BGR_COLOR_SPACE (OpenCV order), RGB_COLOR_SPACE or YUV_COLOR_SPACE.
+            fps (int): Frame rate asked of the camera and rate of the fetches.
+            name (str): Subscriber name; ALVideoDevice makes it unique.
+            in_flight (int): getImageRemote calls outstanding at once (2 = double buffering).
+        """
+        self.session = session
+        self.camera = camera
+        self.resolution = resolution
+        self.color_space = color_space
+        self.fps = fps
+        self.name = name
+        self.in_flight = in_flight
+
+        self._video = None
+        self._handle = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._cond = threading.Condition()
+        self._latest = None
+
+        self.frames = 0
+        self.duplicates = 0
+        self.errors = 0
+        self._first_received = None
+        self.fetch_ms = LogHistogram(min_value=0.1)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def start(self):
+        """Subscribes to the camera and starts fetching."""
+        if self._thread is not None:
+            return
+        self._video = self.session.service("ALVideoDevice")
+        self._handle = self._video.subscribeCamera(self.name, self.camera, self.resolution,
+                                                   self.color_space, self.fps)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="PepperCamera", daemon=True)
+        self._thread.start()
+        width, height = RESOLUTIONS.get(self.resolution, ("?", "?"))
+        print(f"📷 Streaming camera {self.camera} at {width}x{height}, {self.fps} fps as '{self._handle}'")
+
+    def _run(self):
+        period = 1.0 / self.fps
+        pending = deque()  # (request time, qi.Future), oldest first
+        next_request = time.time()
+        while not self._stop.is_set():
+            now = time.time()
+            if len(pending) < self.in_flight and now >= next_request:
+                pending.append((now, self._video.getImageRemote(self._handle, _async=True)))
+                # Keep the pace, but do not burst to catch up after a stall
+                next_request = max(next_request + period, now)
+                continue
+            if not pending:
+                self._stop.wait(next_request - now)
+                continue
+
+            # Wait for the oldest request, but not past the time the next one is due
+            requested_at, future = pending[0]
+            wait_s = next_request - now if len(pending) < self.in_flight else 0.5
+            future.wait(max(int(wait_s * 1000), 1))
+            if not future.isFinished():
+                continue
+            pending.popleft()
+            try:
+                self._deliver(future.value(), requested_at)
+            except Exception as e:
+                self.errors += 1
+                if self.errors <= 3:
+                    print(f"❌ Camera fetch failed: {e}")
+
+    def _deliver(self, image, requested_at):
+        received = time.time()
+        if image is None:
+            self.errors += 1  # No image available yet
+            return
+        # [width, height, layers, color space, seconds, microseconds, data, camera, ...]
+        width, height, layers = image[0], image[1], image[2]
+        timestamp = image[4] + image[5] * 1e-6
+        if self._latest is not None and timestamp == self._latest.timestamp:
+            self.duplicates += 1
+            return
+        pixels = np.frombuffer(image[6], dtype=np.uint8)  # No copy: a view of the received buffer
+        shape = (height, width, layers) if layers > 1 else (height, width)
+        fetch_ms = (received - requested_at) * 1000
+        self.fetch_ms.record(fetch_ms)
+        with self._cond:
+            self.frames += 1
+            if self._first_received is None:
+                self._first_received = received
+            self._latest = Frame(pixels.reshape(shape), timestamp, received, fetch_ms, self.frames)
+            self._cond.notify_all()
+
+    def latest(self, max_age=None):
+        """
+        Returns the newest frame without waiting.
+
+        Args:
+            max_age (float): Seconds; an older frame is treated as no frame.
+
+        Returns:
+            Frame: Or None if there is no (recent enough) frame.
+        """
+        frame = self._latest
+        if frame is None or (max_age is not None and frame.age > max_age):
+            return None
+        return frame
+
+    def wait_for_frame(self, after=0, timeout=1.0):
+        """
+        Waits for a frame newer than the one numbered `after` (0: any frame).
+
+        Returns:
+            Frame: Or None on timeout.
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self._latest is not None and self._latest.index > after, timeout)
+            frame = self._latest
+        return frame if frame is not None and frame.index > after else None
+
+    def close(self):
+        """Stops fetching and unsubscribes from the camera."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+        if self._handle is not None:
+            try:
+                self._video.unsubscribe(self._handle)
+            except Exception as e:
+                print(f"Error unsubscribing {self._handle} from ALVideoDevice: {e}")
+            self._handle = None
+
+    def stats(self):
+        latest = self._latest
+        fetch = self.fetch_ms.summary()
+        elapsed = latest.received - self._first_received if latest is not None else 0.0
+        return {
+            'frames': self.frames,
+            'fps': round((self.frames - 1) / elapsed, 1) if elapsed > 0 else None,
+            'duplicates': self.duplicates,
+            'errors': self.errors,
+            'fetch_p50_ms': fetch['p50_ms'], 'fetch_p99_ms': fetch['p99_ms'],
+            'latest_age_ms': round(latest.age * 1000, 1) if latest is not None else None,
+        }
+
+    def print_stats(self):
+        stats = self.stats()
+        fmt = lambda value: "-" if value is None else f"{value:.1f}"
+        print(f"📷 Camera: {stats['frames']} frames at {fmt(stats['fps'])} fps "
+              f"(asked {self.fps}), fetch p50 {fmt(stats['fetch_p50_ms'])} ms, "
+              f"p99 {fmt(stats['fetch_p99_ms'])} ms, {stats['duplicates']} duplicates, {stats['errors']} errors")
+
+
+def main():
+    import qi
+
+    parser = argparse.ArgumentParser(description="Measure the frame rate and latency of Pepper's camera stream.")
+    parser.add_argument("--ip", default="127.0.0.1", help="Robot IP address")
+    parser.add_argument("--port", type=int, default=9559, help="Naoqi port number")
+    parser.add_argument("--camera", type=int, default=TOP_CAMERA, help="0 top, 1 bottom")
+    parser.add_argument("--resolution", type=int, default=1, choices=sorted(RESOLUTIONS))
+    parser.add_argument("--fps", type=int, default=15)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    args = parser.parse_args()
+
+    session = qi.Session()
+    session.connect(f"tcp://{args.ip}:{args.port}")
+    with PepperCamera(session, args.camera, args.resolution, fps=args.fps) as camera:
+        time.sleep(args.seconds)
+        camera.print_stats()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""Pepper's own front microphone as a speech_recognition AudioSource.
+
+The Transcriber only listened to a microphone on the laptop (sr.Microphone), and
+Pepper_actions.record_audio records a WAV on the robot that has to be fetched
+over SFTP afterwards. PepperMicrophone registers a remote audio module with
+ALAudioDevice (setClientPreferences + subscribe); ALAudioDevice then calls its
+processRemote() with every buffer of the front microphone, 16 kHz mono int16,
+which goes straight into a ring buffer. The source's stream reads from that
+ring buffer, so it drops in for sr.Microphone:
+
+    transcriber = Transcriber(..., source=PepperMicrophone(session))
+
+Latency is measured at both ends of the ring buffer:
+    capture_ms  arrival of a buffer here minus its ALAudioDevice timestamp. The
+                robot and this computer have different clocks; without a known
+                clock_offset the smallest value seen is taken as the offset, so
+                the numbers are the latency above the fastest buffer (jitter).
+                Running on the robot, clock_offset=0 gives absolute latency.
+    queue_ms    how long the oldest sample of each read waited in the ring buffer.
+"""
+
+import threading
+import time
+from collections import deque
+
+import numpy as np
+import speech_recognition as sr
+
+from latencytracker import LogHistogram
+
+FRONT_CHANNEL = 3  # ALAudioDevice channel flags: 0 all, 1 left, 2 right, 3 front, 4 rear
+
+
+class _RingStream:
+    """The `stream` of a PepperMicrophone: read() blocks until enough samples have arrived."""
+
+    def __init__(self, microphone):
+        self.microphone = microphone
+
+    def read(self, size):
+        return self.microphone._read(size)
+
+    def close(self):
+        pass
+
+
+class _AudioModule:
+    """The object registered with NAOqi: exposes only processRemote to ALAudioDevice."""
+
+    def __init__(self, microphone):
+        self.microphone = microphone
+
+    def processRemote(self, nbOfChannels, nbOfSamplesByChannel, timeStamp, inputBuffer):
+        self.microphone._process(nbOfSamplesByChannel, timeStamp, inputBuffer)
+
+
+class PepperMicrophone(sr.AudioSource):
+    """Streams Pepper's front microphone over NAOqi into a ring buffer read like sr.Microphone."""
+
+    def __init__(self, session, module_name="PepperMicrophone", sample_rate=16000, chunk_size=1024,
+                 buffer_seconds=10.0, clock_offset=None):
+        """
+        Args:
+            session (qi.Session): Connected NAOqi session.
+            module_name (str): Name the audio module is registered under; unique per robot.
+            sample_rate (int): 16000 (ALAudioDevice delivers a single channel only at 16 kHz).
+            chunk_size (int): Samples per read, as for sr.Microphone.
+            buffer_seconds (float): Ring buffer size; older audio is overwritten if nobody reads.
+            clock_offset (float): Seconds to add to robot timestamps to get local time.
+                None estimates it from the fastest buffer; 0 when running on the robot.
+        """
+        self.session = session
+        self.module_name = module_name
+        self.SAMPLE_RATE = sample_rate
+        self.SAMPLE_WIDTH = 2
+        self.CHUNK = chunk_size
+        self.stream = None
+        self.clock_offset = clock_offset
+        self._estimate_offset = clock_offset is None
+
+        self._ring = np.zeros(int(buffer_seconds * sample_rate), dtype=np.int16)
+        self._written = 0   # Total samples written since start
+        self._read_pos = 0  # Total samples read since start
+        self._arrivals = deque()  # (total written after the buffer, local arrival time)
+        self._cond = threading.Condition()
+        self._audio_device = None
+        self._service_id = None
+        self._closed = False
+
+        self.buffers = 0
+        self.overrun_samples = 0
+        self.max_depth = 0
+        self.capture_ms = LogHistogram(min_value=0.1)
+        self.queue_ms = LogHistogram(min_value=0.1)
+        self._capture_raw = []  # (arrival - robot time) per buffer while estimating the offset
+
+    def __enter__(self):
+        # speech_recognition enters the source once to calibrate and again to listen:
+        # keep the subscription for the whole session instead of re-subscribing each time.
+        if self._audio_device is None:
+            self.start()
+        self.stream = _RingStream(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass  # Stays subscribed until close()
+
+    def start(self):
+        """Registers the audio module and subscribes it to ALAudioDevice."""
+        try:
+            self.session.listen("tcp://0.0.0.0:0")  # Lets the robot call back into this process
+        except Exception:
+            pass  # Already listening, or running on the robot
+        self._service_id = self.session.registerService(self.module_name, _AudioModule(self))
+        self._audio_device = self.session.service("ALAudioDevice")
+        self._audio_device.setClientPreferences(self.module_name, self.SAMPLE_RATE, FRONT_CHANNEL, 0)
+        self._audio_device.subscribe(self.module_name)
+        print(f"🎤 Streaming Pepper's front microphone ({self.SAMPLE_RATE} Hz) as '{self.module_name}'")
+
+    def _process(self, nbOfSamplesByChannel, timeStamp, inputBuffer):
+        """Called by ALAudioDevice (via _AudioModule) on a NAOqi thread with every microphone buffer."""
+        arrival = time.time()
+        samples = np.frombuffer(bytes(inputBuffer), dtype=np.int16)
+        n = len(samples)
+        capacity = len(self._ring)
+        if n > capacity:
+            samples = samples[-capacity:]
+            n = capacity
+        robot_time = timeStamp[0] + timeStamp[1] * 1e-6 + n / self.SAMPLE_RATE  # End of the buffer
+        with self._cond:
+            start = self._written % capacity
+            first = min(n, capacity - start)
+            self._ring[start:start + first] = samples[:first]
+            self._ring[:n - first] = samples[first:]
+            self._written += n
+            overrun = self._written - self._read_pos - capacity
+            if overrun > 0:
+                self._read_pos += overrun
+                self.overrun_samples += overrun
+            self._arrivals.append((self._written, arrival))
+            self.buffers += 1
+            self.max_depth = max(self.max_depth, self._written - self._read_pos)
+            self._record_capture(arrival - robot_time)
+            self._cond.notify_all()
+
+    def _record_capture(self, delay):
+        # Called with the lock held.
+        if self._estimate_offset:
+            if self.clock_offset is None or delay < self.clock_offset:
+                self.clock_offset = delay
+            self._capture_raw.append(delay)
+            # Recorded in batches of 100 so that a lower minimum found later still applies to them
+            if len(self._capture_raw) >= 100:
+                self._flush_capture()
+        else:
+            self.capture_ms.record(max(delay - self.clock_offset, 0.0) * 1000)
+
+    def _flush_capture(self):
+        for raw in self._capture_raw:
+            self.capture_ms.record((raw - self.clock_offset) * 1000)
+        self._capture_raw.clear()
+
+    def _read(self, size):
+        with self._cond:
+            while self._written - self._read_pos < size and not self._closed:
+                self._cond.wait(timeout=1.0)
+            if not self._closed:
+                capacity = len(self._ring)
+                start = self._read_pos % capacity
+                first = min(size, capacity - start)
+                chunk = np.concatenate([self._ring[start:start + first], self._ring[:size - first]])
+                oldest = self._read_pos
+                self._read_pos += size
+                # The first buffer not completely read before holds the oldest sample returned
+                while self._arrivals and self._arrivals[0][0] <= oldest:
+                    self._arrivals.popleft()
+                if self._arrivals:
+                    self.queue_ms.record((time.time() - self._arrivals[0][1]) * 1000)
+                return chunk.tobytes()
+        # Closed: keep speech_recognition's listener thread paced instead of spinning
+        time.sleep(size / self.SAMPLE_RATE)
+        return bytes(size * self.SAMPLE_WIDTH)
+
+    def close(self):
+        """Unsubscribes from ALAudioDevice and unregisters the module."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._audio_device is not None:
+            try:
+                self._audio_device.unsubscribe(self.module_name)
+            except Exception as e:
+                print(f"Error unsubscribing {self.module_name} from ALAudioDevice: {e}")
+            self._audio_device = None
+        if self._service_id is not None:
+            try:
+                self.session.unregisterService(self._service_id)
+            except Exception as e:
+                print(f"Error unregistering {self.module_name}: {e}")
+            self._service_id = None
+
+    def stats(self):
+        with self._cond:
+            self._flush_capture()
+        capture = self.capture_ms.summary()
+        queue = self.queue_ms.summary()
+        return {
+            'buffers': self.buffers,
+            'seconds': round(self._written / self.SAMPLE_RATE, 1),
+            'overrun_samples': self.overrun_samples,
+            'max_depth_ms': round(1000.0 * self.max_depth / self.SAMPLE_RATE, 1),
+            'capture_p50_ms': capture['p50_ms'], 'capture_p99_ms': capture['p99_ms'],
+            'queue_p50_ms': queue['p50_ms'], 'queue_p99_ms': queue['p99_ms'],
+            'clock_offset_s': self.clock_offset,
+            'offset_estimated': self._estimate_offset,
+        }
@@ -10,74 +10,134 @@ This script handles:
 - Face tracking with keyboard toggle
 """
 
-import qi
 import argparse
 import sys
-import time
 import traceback
-import threading
-import select
+import selectors
 import termios
 import tty
-# import os
+import os
 from naoqi_callbacks_v3 import NaoqiEventHandler
+from memory_subscriptions import MemorySubscriptions
+from fake_naoqi import new_session
+
+# Raw sensor values, read together for the 's' command
+SENSOR_KEYS = [
+    "Device/SubDeviceList/Head/Touch/Front/Sensor/Value",
+    "Device/SubDeviceList/Head/Touch/Middle/Sensor/Value",
+    "Device/SubDeviceList/Head/Touch/Rear/Sensor/Value",
+    "Device/SubDeviceList/LHand/Touch/Back/Sensor/Value",
+    "Device/SubDeviceList/RHand/Touch/Back/Sensor/Value",
+    "Device/SubDeviceList/Platform/FrontRight/Bumper/Sensor/Value",
+    "Device/SubDeviceList/Platform/FrontLeft/Bumper/Sensor/Value",
+    "Device/SubDeviceList/Platform/Back/Bumper/Sensor/Value",
+]
 
 # Keyboard input support
 class KeyboardReader:
+    """Puts the terminal in cbreak mode for the whole session (not once per key).
+
+    cbreak delivers single key presses without Enter but, unlike raw mode, keeps
+    Ctrl-C working.
+    """
     def __init__(self):
-        if sys.platform != 'win32':
-            self.fd = sys.stdin.fileno()
-            self.old_settings = termios.tcgetattr(self.fd)
+        self.fd = sys.stdin.fileno()
         self.has_terminal = sys.stdin.isatty()
+        self.old_settings = termios.tcgetattr(self.fd) if self.has_terminal else None
 
-    def getch(self):
-        if not self.has_terminal:
-            return sys.stdin.read(1) if select.select([sys.stdin], [], [], 0)[0] else None
-        try:
-            tty.setraw(self.fd)
-            ch = sys.stdin.read(1)
-            return ch
-        finally:
-            if sys.platform != 'win32':
-                termios.tcsetattr(self.fd, termios.TCSADRAIN, self.old_settings)
+    def __enter__(self):
+        if self.has_terminal:
+            tty.setcbreak(self.fd)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.reset()
+        return False
+
+    def read(self):
+        """Returns the keys available on stdin, '' at end of input. Only call when stdin is readable."""
+        return os.read(self.fd, 64).decode("utf-8", errors="ignore")
 
     def reset(self):
-        if sys.platform != 'win32' and self.has_terminal:
+        if self.has_terminal:
             termios.tcsetattr(self.fd, termios.TCSADRAIN, self.old_settings)
 
-class KeyboardListener(threading.Thread):
-    def __init__(self, handler):
-        threading.Thread.__init__(self)
+class CommandLoop:
+    """Main loop: sleeps in select() until a key arrives or the handler stops.
+
+    The handler's stop callbacks write to a wake-up pipe, so a stop from any
+    thread ends the loop at once, and the process uses no CPU while idle.
+    """
+    def __init__(self, handler, subscriptions=None):
         self.handler = handler
-        self.daemon = True
-        self.running = True
+        self.subscriptions = subscriptions
         self.keyboard = KeyboardReader()
+        self.selector = selectors.DefaultSelector()
+        self._wake_read, self._wake_write = os.pipe()
+        os.set_blocking(self._wake_write, False)
+        handler.add_stop_callback(self.wake)
+
+    def wake(self):
+        """Interrupts select(); safe to call from any thread. Does nothing once the loop is closed."""
+        wake_write = self._wake_write
+        if wake_write is None:
+            return
+        try:
+            os.write(wake_write, b"x")
+        except (BlockingIOError, OSError):
+            pass  # Pipe full (already woken) or closed
 
     def run(self):
         print("\nCommands:")
         print("  'l' - Toggle listening mode")
         print("  'f' - Toggle face tracking")
+        print("  's' - Show touch and bumper sensor values")
         print("  'q' - Quit")
-        
-        try:
-            while self.running:
-                ch = self.keyboard.getch()
-                if ch:
-                    if ch == 'l':
-                        print("\nToggling listening mode...")
-                        self.handler.toggle_listening()
-                    elif ch == 'f':
-                        print("\nToggling face tracking...")
-                        self.handler.toggle_face_tracking()
-                    elif ch == 'q':
-                        print("\nQuitting...")
-                        self.handler.stop()
-                        self.running = False
-                        break
-                    # Ignore other characters
-                time.sleep(0.1)
-        finally:
-            self.keyboard.reset()
+
+        self.selector.register(self._wake_read, selectors.EVENT_READ)
+        self.selector.register(self.keyboard.fd, selectors.EVENT_READ)
+        with self.keyboard:
+            while self.handler.is_running():
+                for key, _ in self.selector.select():
+                    if key.fd == self._wake_read:
+                        os.read(self._wake_read, 64)
+                        continue
+                    keys = self.keyboard.read()
+                    if not keys:
+                        # stdin closed (e.g. piped input ran out): keep running until stopped
+                        self.selector.unregister(self.keyboard.fd)
+                        continue
+                    for ch in keys:
+                        if not self.handle_key(ch):
+                            return
+
+    def handle_key(self, ch):
+        """Runs one command. Returns False on quit."""
+        if ch == 'l':
+            print("\nToggling listening mode...")
+            self.handler.toggle_listening()
+        elif ch == 'f':
+            print("\nToggling face tracking...")
+            self.handler.toggle_face_tracking()
+        elif ch == 's' and self.subscriptions:
+            print_sensor_values(self.subscriptions)
+        elif ch == 'q':
+            print("\nQuitting...")
+            self.handler.stop()
+            return False
+        # Ignore other characters
+        return True
+
+    def close(self):
+        # Unregister first: cleanup_services stops the handler again, and a closed fd number may be reused
+        self.handler.remove_stop_callback(self.wake)
+        self.keyboard.reset()
+        self.selector.close()
+        wake_read, wake_write = self._wake_read, self._wake_write
+        self._wake_read = self._wake_write = None
+        if wake_read is not None:
+            os.close(wake_read)
+            os.close(wake_write)
 
 def setup_face_tracking(session):
     """Setup face tracking services"""
@@ -106,39 +166,44 @@ def setup_face_tracking(session):
         print("Error setting up face tracking: %s" % e)
         return None, None
 
-def setup_tactile_sensors(memory_service, service_name):
+def print_sensor_values(subscriptions):
+    """Print the current touch and bumper sensor values (one getListData call)"""
+    try:
+        for key, value in subscriptions.read(SENSOR_KEYS).items():
+            print("  %-62s %s" % (key, value))
+    except Exception as e:
+        print("Error reading sensor values: %s" % e)
+
+def setup_tactile_sensors(subscriptions, handler):
     """Setup all tactile sensor subscriptions"""
     print("Setting up tactile sensors...")
     try:
         # Head tactile sensors
         head_events = ["FrontTactilTouched", "MiddleTactilTouched", "RearTactilTouched"]
         for event in head_events:
-            memory_service.subscribeToEvent(event, service_name, "on_head_touched")
-            print("Subscribed to %s" % event)
+            subscriptions.subscribe(event, handler.on_head_touched)
             
         # Hand tactile sensors
         hand_events = ["LeftHandTactilTouched", "RightHandTactilTouched"]
         for event in hand_events:
-            memory_service.subscribeToEvent(event, service_name, "on_hand_touched")
-            print("Subscribed to %s" % event)
+            subscriptions.subscribe(event, handler.on_hand_touched)
             
         print("All tactile sensors configured and listening...")
     except Exception as e:
         print("Error setting up tactile sensors: %s" % e)
 
-def setup_bumper_sensors(memory_service, service_name):
+def setup_bumper_sensors(subscriptions, handler):
     """Setup bumper sensor subscriptions"""
     print("Setting up bumper sensors...")
     try:
         bumper_events = ["RightBumperPressed", "LeftBumperPressed", "BackBumperPressed"]
         for event in bumper_events:
-            memory_service.subscribeToEvent(event, service_name, "on_bumper_pressed")
-            print("Subscribed to %s" % event)
+            subscriptions.subscribe(event, handler.on_bumper_pressed)
         print("Bumper sensors configured and listening...")
     except Exception as e:
         print("Error setting up bumper sensors: %s" % e)
 
-def setup_speech_recognition(session, memory_service, service_name):
+def setup_speech_recognition(session, subscriptions, handler, subscriber_name="NaoqiEventHandler"):
     """Setup speech recognition with vocabulary and word spotting"""
     print("Setting up speech recognition...")
     try:
@@ -165,7 +230,9 @@ def setup_speech_recognition(session, memory_service, service_name):
         print(", ".join(vocabulary))
         
         # Subscribe to word recognized events
-        memory_service.subscribeToEvent("WordRecognized", service_name, "on_sound_detected")
+        subscriptions.subscribe("WordRecognized", handler.on_sound_detected, pass_key=True)
+        # Start the recognition engine; it runs while it has subscribers
+        asr.subscribe(subscriber_name)
         asr.pause(False)  # Make sure speech recognition is running
         
         print("Speech recognition started and listening...")
@@ -175,12 +242,22 @@ def setup_speech_recognition(session, memory_service, service_name):
         print("Error setting up speech recognition: %s" % e)
         return None
 
-def cleanup_services(session, handler, asr_service):
+def cleanup_services(session, handler, asr_service, subscriptions=None, subscriber_name="NaoqiEventHandler"):
     """Cleanup all services properly"""
     print("\nCleaning up services...")
     
     try:
-        # Stop the handler first
+        # Stop event delivery before the handler goes away
+        if subscriptions:
+            subscriptions.unsubscribe_all()
+
+        if asr_service:
+            try:
+                asr_service.unsubscribe(subscriber_name)
+            except Exception as e:
+                print("Error unsubscribing from speech recognition: %s" % e)
+
+        # Stop the handler
         if handler:
             handler.stop()
             print("Handler stopped")
@@ -237,16 +314,19 @@ def main():
                         help="Robot IP address. On robot or Local Naoqi: use '127.0.0.1'.")
     parser.add_argument("--port", type=int, default=9559,
                         help="Naoqi port number")
+    parser.add_argument("--fake", action="store_true",
+                        help="Run without a robot on a fake NAOqi session (also PEPPER_FAKE=1).")
 
     args = parser.parse_args()
     session = None
     handler = None
     asr_service = None
-    keyboard_listener = None
+    subscriptions = None
+    command_loop = None
 
     try:
         print("Attempting to connect to Naoqi at %s:%d..." % (args.ip, args.port))
-        session = qi.Session()
+        session = new_session(args.fake)
         session.connect("tcp://" + args.ip + ":" + str(args.port))
         print("Connection successful!\n")
 
@@ -255,23 +335,20 @@ def main():
             print("❌ Service verification failed. Please check robot status.")
             return
 
-        # Setup session to listen for connections
-        session.listen("tcp://0.0.0.0:0")
-        
         # Setup face tracking (simplified)
         motion, tracker = setup_face_tracking(session)
         
         # Initialize handler with face tracking services (no awareness)
+        # (no service registration: events reach it through ALMemory signals)
         handler = NaoqiEventHandler(session, motion, tracker)
-        session.registerService("NaoqiEventHandler", handler)
-        print("NaoqiEventHandler service registered")
-        
+
         # Setup memory service
         memory_service = session.service("ALMemory")
+        subscriptions = MemorySubscriptions(memory_service)
         print("ALMemory service obtained.\n")
 
         # Setup speech recognition
-        asr_service = setup_speech_recognition(session, memory_service, "NaoqiEventHandler")
+        asr_service = setup_speech_recognition(session, subscriptions, handler)
         if asr_service:
             handler.set_asr_service(asr_service)
             print("✓ Speech recognition configured")
@@ -279,30 +356,24 @@ def main():
             print("❌ Speech recognition setup failed")
 
         # Setup other sensors
-        setup_tactile_sensors(memory_service, "NaoqiEventHandler")
-        setup_bumper_sensors(memory_service, "NaoqiEventHandler")
-
-        # Start keyboard listener
-        keyboard_listener = KeyboardListener(handler)
-        keyboard_listener.start()
-        print("✓ Keyboard listener started")
+        setup_tactile_sensors(subscriptions, handler)
+        setup_bumper_sensors(subscriptions, handler)
 
-        # Main loop with better handling
-        while handler.is_running():
-            try:
-                time.sleep(0.1)
-            except KeyboardInterrupt:
-                handler.stop()
-                break
+        # Main loop: waits for keys or a stop, without polling
+        command_loop = CommandLoop(handler, subscriptions)
+        print("✓ Keyboard commands ready")
+        try:
+            command_loop.run()
+        except KeyboardInterrupt:
+            handler.stop()
 
     except Exception as e:
         print("\nAn unexpected error occurred: %s" % e)
         traceback.print_exc()
     finally:
-        if keyboard_listener:
-            keyboard_listener.running = False
-            keyboard_listener.keyboard.reset()
-        cleanup_services(session, handler, asr_service)
+        if command_loop:
+            command_loop.close()
+        cleanup_services(session, handler, asr_service, subscriptions)
         print("Script finished.")
 
 # Main entrypoint
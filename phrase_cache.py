@@ -0,0 +1,116 @@
+"""Pre-synthesized canned phrases played through ALAudioPlayer.
+
+chatWithPepper speaks the same fixed sentences ("Take your time. I'm listening...",
+"I didn't hear anything clear. Can you try again?", ...) many times per session,
+and every tts.say synthesizes them again before the first sample plays.
+
+PhraseCache synthesizes each fixed phrase once with ALTextToSpeech.sayToFile into
+a directory on the robot, where the clips stay between sessions, and preloads
+them in ALAudioPlayer. Saying a cached phrase is then just ALAudioPlayer.play on
+an already loaded file ID, which starts almost immediately. Any other text falls
+through to the wrapped ALTextToSpeech, so a PhraseCache can be passed wherever
+the stage runners expect `tts`.
+"""
+
+import hashlib
+import threading
+import time
+
+DEFAULT_CLIP_DIR = "/home/nao"  # Must exist on the robot; sayToFile does not create directories
+
+
+class PhraseCache:
+    """Drop-in wrapper around ALTextToSpeech that plays preloaded clips for known phrases."""
+
+    def __init__(self, session, tts, clip_dir=DEFAULT_CLIP_DIR):
+        """
+        Args:
+            session: Connected qi.Session.
+            tts: The ALTextToSpeech service, used for synthesis and as the fallback.
+            clip_dir (str): Directory on the robot where the clips are kept.
+        """
+        self.tts = tts
+        self.player = session.service("ALAudioPlayer")
+        self.clip_dir = clip_dir.rstrip("/")
+        self.hits = 0
+        self.misses = 0
+        self._file_ids = {}  # phrase -> ALAudioPlayer file ID
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def clip_path(self, text):
+        """Robot-side path of the clip for `text`; the name depends on the text and the voice settings."""
+        try:
+            voice = f"{self.tts.getLanguage()}|{self.tts.getVoice()}|{self.tts.getParameter('speed')}"
+        except Exception:
+            voice = ""
+        digest = hashlib.sha1(f"{voice}|{text}".encode("utf-8")).hexdigest()[:16]
+        return f"{self.clip_dir}/phrase_{digest}.wav"
+
+    def _load(self, text):
+        path = self.clip_path(text)
+        try:
+            file_id = self.player.loadFile(path)  # Clip kept from an earlier session
+        except Exception:
+            self.tts.sayToFile(text, path)
+            file_id = self.player.loadFile(path)
+        with self._lock:
+            self._file_ids[text] = file_id
+        return file_id
+
+    def preload(self, phrases):
+        """Synthesizes (if needed) and loads every phrase. Blocks; see preload_async."""
+        start = time.time()
+        loaded = 0
+        for text in phrases:
+            if text in self._file_ids:
+                continue
+            try:
+                self._load(text)
+                loaded += 1
+            except Exception as e:
+                print(f"Could not cache phrase '{text}': {e}")
+        print(f"Phrase cache: {loaded} phrases ready in {time.time() - start:.1f}s")
+        return loaded
+
+    def preload_async(self, phrases):
+        """Preloads in a background thread; phrases not loaded yet are spoken with tts.say."""
+        self._thread = threading.Thread(target=self.preload, args=(list(phrases),),
+                                        name="PhraseCache", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def say(self, text):
+        """Plays the cached clip for `text` if there is one, otherwise speaks it with ALTextToSpeech."""
+        file_id = self._file_ids.get(text)
+        if file_id is not None:
+            try:
+                self.player.play(file_id)  # Blocks until the clip ends, like tts.say
+                self.hits += 1
+                return
+            except Exception as e:
+                print(f"Cached clip failed, using TTS instead: {e}")
+                with self._lock:
+                    self._file_ids.pop(text, None)
+        self.misses += 1
+        self.tts.say(text)
+
+    def __getattr__(self, name):
+        # Everything else (setVolume, setParameter, ...) goes to ALTextToSpeech.
+        return getattr(self.tts, name)
+
+    def close(self):
+        """Unloads the clips from ALAudioPlayer; the files stay on the robot for the next session."""
+        if self._thread is not None:
+            self._thread.join(timeout=5.0)
+        with self._lock:
+            file_ids = list(self._file_ids.values())
+            self._file_ids.clear()
+        for file_id in file_ids:
+            try:
+                self.player.unloadFile(file_id)
+            except Exception:
+                pass
+
+    def stats(self):
+        return {'cached_phrases': len(self._file_ids), 'hits': self.hits, 'misses': self.misses}
@@ -0,0 +1,191 @@
+"""Response cache for deterministic chatbot prompts.
+
+Some prompts are identical in every session, most notably
+chatbotAlive.get_response("greet") at session start, yet each one costs a full
+EmoEx or Gemini round-trip before Pepper can say anything. ResponseCache keeps
+those replies:
+
+- keys are normalized prompts (case, whitespace and trailing punctuation do not
+  matter), namespaced by backend and prompt category;
+- every entry has its own TTL, so a changed persona or system prompt shows up
+  again after a while;
+- the cache is bounded and evicts the least recently used entry;
+- entries are persisted to a JSON file, written atomically.
+
+CachedChatbot wraps Chatbot or GeminiChatbot. Caching is opt-in per category:
+only get_response(prompt, category=...) calls whose category is enabled are
+cached; everything else, in particular the child's turns, always goes to the
+backend. A response is only stored if the chatbot's last_response_ok flag says
+the call succeeded.
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_CACHE_FILE = "response_cache.json"
+DAY = 24 * 3600
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_prompt(prompt):
+    """Case-folds, collapses whitespace and strips surrounding punctuation."""
+    return _WHITESPACE.sub(" ", prompt.casefold()).strip(" .!?,;:")
+
+
+class ResponseCache:
+    """Bounded LRU map of prompt keys to responses with per-entry expiry and a JSON backing file."""
+
+    def __init__(self, path=DEFAULT_CACHE_FILE, max_entries=256, default_ttl=7 * DAY):
+        """
+        Args:
+            path (str): JSON file backing the cache, None to keep it in memory only.
+            max_entries (int): Entries kept before the least recently used one is evicted.
+            default_ttl (float): Lifetime in seconds of entries stored without an explicit ttl.
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (response, expires_at)
+        self._lock = threading.Lock()
+        self._dirty = False
+        if path:
+            self.load()
+
+    def get(self, key):
+        """Returns the cached response for `key`, or None if it is missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] <= time.time():
+                del self._entries[key]
+                self._dirty = True
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, response, ttl=None):
+        with self._lock:
+            self._entries[key] = (response, time.time() + (self.default_ttl if ttl is None else ttl))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._dirty = True
+
+    def invalidate(self, key=None):
+        """Removes one entry, or every entry if key is None."""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+            self._dirty = True
+
+    def __len__(self):
+        return len(self._entries)
+
+    def load(self):
+        """Reads the backing file, skipping expired entries. A missing or corrupt file means an empty cache."""
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        now = time.time()
+        with self._lock:
+            # The file is written oldest first, so the LRU order survives a restart.
+            for key, response, expires_at in data.get("entries", []):
+                if expires_at > now:
+                    self._entries[key] = (response, expires_at)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def save(self):
+        """Writes the cache to its backing file if anything changed. Returns the path, or None."""
+        if not self.path or not self._dirty:
+            return None
+        # Held while writing too: a cache shared by several sessions may be saved from several threads.
+        with self._lock:
+            entries = [[key, response, expires_at] for key, (response, expires_at) in self._entries.items()]
+            self._dirty = False
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({"entries": entries}, f, indent=1)
+            os.replace(tmp_path, self.path)
+        return self.path
+
+    def stats(self):
+        return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+
+class CachedChatbot:
+    """Wraps a chatbot so that get_response is served from a ResponseCache for opted-in categories."""
+
+    def __init__(self, chatbot, cache=None, categories=None, namespace=None):
+        """
+        Args:
+            chatbot: Chatbot (EmoEx) or GeminiChatbot instance.
+            cache (ResponseCache): Shared cache; a default file-backed one if None.
+            categories (dict): Category name -> TTL in seconds (None for the cache default).
+                Only these categories are cached, e.g. {"greeting": DAY}.
+            namespace (str): Key prefix separating backends and personas; defaults to the
+                chatbot class name plus its product ID if it has one.
+        """
+        self.chatbot = chatbot
+        self.cache = cache if cache is not None else ResponseCache()
+        self.categories = dict(categories or {})
+        if namespace is None:
+            namespace = type(chatbot).__name__
+            product_id = getattr(chatbot, "product_id", None)
+            if product_id:
+                namespace += f":{product_id}"
+        self.namespace = namespace
+
+    def key(self, prompt, category):
+        return f"{self.namespace}|{category}|{normalize_prompt(prompt)}"
+
+    def get_response(self, prompt, category=None):
+        """
+        Args:
+            prompt (str): Prompt sent to the chatbot.
+            category (str): Prompt category. Responses are cached only if the category
+                was enabled in the constructor; child-specific turns must leave it None.
+
+        Returns:
+            str: The (possibly cached) response.
+        """
+        if category not in self.categories:
+            return self.chatbot.get_response(prompt)
+
+        key = self.key(prompt, category)
+        response = self.cache.get(key)
+        if response is not None:
+            print(f"[CACHE] '{category}' response served from cache")
+            # Keep a stateful backend's conversation history consistent with what Pepper said.
+            record = getattr(self.chatbot, "record_cached_exchange", None)
+            if record is not None:
+                record(prompt, response)
+            return response
+
+        response = self.chatbot.get_response(prompt)
+        # Only replies the backend reports as successful; an error or fallback text must not be replayed
+        if response and getattr(self.chatbot, "last_response_ok", False):
+            self.cache.put(key, response, ttl=self.categories[category])
+        return response
+
+    def __getattr__(self, name):
+        # authenticate, chat_loop, history, ... belong to the wrapped chatbot.
+        return getattr(self.chatbot, name)
+
+    def close(self):
+        """Persists the cache."""
+        return self.cache.save()
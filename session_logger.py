@@ -0,0 +1,224 @@
+"""Append-only JSONL session log for the Pepper story experiments.
+
+Each call to SessionLogger.log() puts one record on a bounded queue and returns
+immediately; a background thread writes the records to disk, one JSON object per
+line, and fsyncs the file every few seconds. A crash therefore loses at most the
+last fsync interval of a session instead of the whole conversation, and nothing
+about the conversation is kept in memory.
+
+jsonl_to_text() turns a session log back into the human-readable chat history
+format that chatWithPepper used to write at the end of a session.
+
+Usage:
+    python session_logger.py chat_history_2025-07-08_15-54-19.jsonl [output.txt]
+"""
+
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from datetime import datetime
+
+_STOP = object()
+
+
+class SessionLogger:
+    """Thread-safe, background JSONL writer for one conversation session."""
+
+    def __init__(self, filename, max_queue=1000, fsync_interval=2.0, put_timeout=0.5):
+        """
+        Opens (or appends to) the log file and starts the writer thread.
+
+        Args:
+            filename (str): Path of the .jsonl file to append records to.
+            max_queue (int): Maximum number of records waiting to be written.
+            fsync_interval (float): Seconds between fsyncs while records are arriving.
+            put_timeout (float): How long log() may block on a full queue before
+                the record is dropped and counted in `dropped`.
+        """
+        self.filename = filename
+        self.fsync_interval = fsync_interval
+        self.put_timeout = put_timeout
+        self.dropped = 0
+        self.written = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        # Held from the _closed check to the put, so no record can be queued behind _STOP
+        self._close_lock = threading.Lock()
+        self._closed = False
+        self._file = open(filename, "a", encoding="utf-8")
+        self._thread = threading.Thread(target=self._writer, name="SessionLogger", daemon=True)
+        self._thread.start()
+
+    def log(self, kind, **fields):
+        """Queues one record of the given kind. Safe to call from any thread."""
+        record = {"ts": datetime.now().isoformat(timespec="milliseconds"), "kind": kind}
+        record.update(fields)
+        try:
+            with self._close_lock:
+                if self._closed:
+                    print(f"[SessionLogger] Log already closed, dropping '{kind}' record.")
+                    return False
+                self._queue.put(record, timeout=self.put_timeout)
+            return True
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            print(f"[SessionLogger] Queue full, dropped '{kind}' record ({self.dropped} so far).")
+            return False
+
+    def session_start(self, **fields):
+        return self.log("session_start", **fields)
+
+    def session_end(self, **fields):
+        return self.log("session_end", **fields)
+
+    def utterance(self, speaker, text):
+        """Records a single line of dialogue, e.g. utterance("Pepper", greeting)."""
+        return self.log("utterance", speaker=speaker, text=text)
+
+    def turn(self, exp_event, ai_context, ai_instruction, transcript, response,
+             prompt=None, timings=None):
+        """
+        Records one complete interaction turn.
+
+        Args:
+            exp_event (str): The experiment event, e.g. "showing picture 2".
+            ai_context (str): The context sent to the chatbot.
+            ai_instruction (str): The instruction Pepper gave the child.
+            transcript (str): What the child said.
+            response (str): What the chatbot answered.
+            prompt (str): The full prompt sent to the chatbot, if different from the transcript.
+            timings (dict): Per-stage durations in seconds, e.g. {"asr_s": 3.1, "llm_s": 2.4}.
+        """
+        return self.log(
+            "turn",
+            exp_event=exp_event,
+            ai_context=ai_context,
+            ai_instruction=ai_instruction,
+            transcript=transcript,
+            prompt=prompt,
+            response=response,
+            timings=timings or {},
+        )
+
+    def close(self, timeout=5.0):
+        """Flushes every queued record, fsyncs and closes the file."""
+        with self._close_lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(_STOP)
+        self._thread.join(timeout)
+        if self.dropped:
+            print(f"[SessionLogger] {self.dropped} record(s) were dropped during the session.")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _writer(self):
+        last_fsync = time.monotonic()
+        dirty = False
+        stopping = False
+        while not stopping:
+            try:
+                batch = [self._queue.get(timeout=self.fsync_interval)]
+            except queue.Empty:
+                batch = []
+            # Drain whatever else is already waiting so a burst costs one write.
+            while len(batch) < 256:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            lines = []
+            for record in batch:
+                if record is _STOP:
+                    stopping = True
+                    continue
+                lines.append(json.dumps(record, ensure_ascii=False))
+            try:
+                if lines:
+                    self._file.write("\n".join(lines) + "\n")
+                    # Hand the data to the OS on every batch, fsync only periodically.
+                    self._file.flush()
+                    self.written += len(lines)
+                    dirty = True
+                now = time.monotonic()
+                if dirty and (stopping or now - last_fsync >= self.fsync_interval):
+                    os.fsync(self._file.fileno())
+                    last_fsync = now
+                    dirty = False
+            except Exception as e:
+                print(f"[SessionLogger] Error writing to {self.filename}: {e}")
+        self._file.close()
+
+
+def read_records(jsonl_path):
+    """Yields the records of a session log, skipping a truncated final line after a crash."""
+    with open(jsonl_path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                print(f"[SessionLogger] Skipping unreadable line in {jsonl_path}: {line[:60]}")
+
+
+def format_record(record):
+    """Formats one record in the plain-text chat history format."""
+    ts = datetime.fromisoformat(record["ts"]).strftime("%Y-%m-%d %H:%M:%S")
+    kind = record.get("kind")
+    if kind == "session_start":
+        return f"Conversation started at: {ts}\n"
+    if kind == "session_end":
+        return f"\nConversation ended at: {ts}\n"
+    if kind == "utterance":
+        return f"[{ts}] {record['speaker']}: {record['text']}\n"
+    if kind == "turn":
+        return (
+            f"[{ts}] --- INTERACTION TURN ---\n"
+            f"EXP-EVENT: {record['exp_event']}\n"
+            f"AI-CONTEXT: {record['ai_context']}\n"
+            f"AI-INSTRUCTION: {record['ai_instruction']}\n"
+            f"CHILD-TRANSCRIPT: {record['transcript']}\n"
+            f"AI_RESPONSE: {record['response']}\n"
+            f"------------------------\n\n"
+        )
+    return ""
+
+
+def jsonl_to_text(jsonl_path, text_path=None):
+    """
+    Converts a JSONL session log into the human-readable chat history format.
+
+    Args:
+        jsonl_path (str): The session log written by SessionLogger.
+        text_path (str): Where to write the text version. Defaults to the same
+            name with a .txt extension.
+
+    Returns:
+        str: The path of the text file written.
+    """
+    if text_path is None:
+        text_path = os.path.splitext(jsonl_path)[0] + ".txt"
+    with open(text_path, "w", encoding="utf-8") as out:
+        for record in read_records(jsonl_path):
+            out.write(format_record(record))
+    return text_path
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python session_logger.py <session.jsonl> [output.txt]")
+        sys.exit(1)
+    output = jsonl_to_text(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else None)
+    print(f"Conversation history written to: {output}")
@@ -0,0 +1,202 @@
+"""Replays a scripted child through a whole ChildSession (greeting, Stage A, Stage B) without a robot.
+
+The session runs on a fake_naoqi.FakeSession: the child's recorded utterances
+are played into Pepper's (fake) front microphone and reach the Transcriber
+through PepperMicrophone, exactly as on the robot; the chatbot answers from a
+script after a fixed delay. Each utterance starts once Pepper has spoken and
+then stayed quiet for the utterance's delay, like a child answering.
+
+Script (JSON; audio paths relative to the script):
+    {
+      "pictures": 2,
+      "greeting": "Hello! I'm Pepper. Are you ready to look at some pictures?",
+      "replies": ["What a big fish! ##SATISFACTORY##", "..."],
+      "utterances": ["ready.wav", {"audio": "fish.wav", "delay": 2.5}, "...", "stop.wav"]
+    }
+
+Replies are used in order for every chatbot call after the greeting (then
+"Tell me more! ##SATISFACTORY##"). Ending with a "stop" utterance ends the
+session; otherwise Stage B waits for its silence timeout.
+
+Reported per utterance, and as percentiles over the session:
+    eos_to_speech   end of the child's speech -> Pepper starts speaking again
+
+Usage:
+    python session_replay.py script.json [--model base.en] [--chat-latency-ms 800]
+        [--response-delay 2.0] [--time-scale 1.0] [--output session_replay.json]
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+from audio_fixtures import load_wav, speech_end
+from chatWithPepper import STORY_PICTURES, TRANSCRIBER_SETTINGS, open_child_session
+from fake_naoqi import FakeSession
+from latencytracker import LogHistogram, default_build_label
+from turn_tracer import TurnTracer
+
+
+class ScriptedChatbot:
+    """Stands in for Chatbot: answers from a list after a fixed delay."""
+
+    DEFAULT_REPLY = "Tell me more! ##SATISFACTORY##"
+
+    def __init__(self, greeting, replies, latency_s):
+        self.greeting = greeting
+        self.replies = list(replies)
+        self.latency_s = latency_s
+        self.prompts = []
+
+    def authenticate(self):
+        return True
+
+    def get_response(self, prompt, category=None):
+        time.sleep(self.latency_s)
+        self.prompts.append(prompt)
+        if category == "greeting":
+            return self.greeting
+        return self.replies.pop(0) if self.replies else self.DEFAULT_REPLY
+
+
+def load_script(path, default_delay):
+    """Reads a replay script; returns it with 'utterances' as (name, samples, speech end, delay) tuples."""
+    with open(path, encoding="utf-8") as f:
+        script = json.load(f)
+    base = os.path.dirname(os.path.abspath(path))
+    utterances = []
+    for entry in script.get("utterances", []):
+        if isinstance(entry, str):
+            entry = {"audio": entry}
+        samples = load_wav(os.path.join(base, entry["audio"]))
+        utterances.append((os.path.basename(entry["audio"]), samples, speech_end(samples) or len(samples),
+                           entry.get("delay", default_delay)))
+    script["utterances"] = utterances
+    return script
+
+
+def play_child(session, utterances, played, stop, max_wait):
+    """Plays each utterance once Pepper has spoken and gone quiet (or after max_wait seconds)."""
+    microphone = session.service("ALAudioDevice")
+    heard = 0  # Pepper's speech entries before the last utterance
+    for name, samples, end, delay in utterances:
+        if not session.wait_for_speech(after=heard, quiet=delay, timeout=max_wait):
+            print(f"🧒 Pepper did not answer within {max_wait:.0f}s, speaking anyway")
+        if stop.is_set():
+            return
+        print(f"🧒 Child says {name}")
+        utterance = microphone.inject(samples, end)
+        while not utterance.done.wait(0.5):
+            if stop.is_set():
+                return
+        played.append((name, utterance))
+        heard = len(session.speech)
+
+
+def turn_latencies(session, played):
+    """Matches each utterance with the first thing Pepper said after its speech ended."""
+    turns = []
+    for name, utterance in played:
+        reply = next((entry for entry in session.speech if entry['start'] >= utterance.speech_end_time), None)
+        turns.append({
+            'utterance': name,
+            'reply': reply['text'] if reply else None,
+            'eos_to_speech_ms': round((reply['start'] - utterance.speech_end_time) * 1000, 1) if reply else None,
+        })
+    return turns
+
+
+def run_replay(script_path, model, chat_latency_s, response_delay, time_scale, timeout, log_dir="."):
+    script = load_script(script_path, response_delay)
+    session = FakeSession(time_scale=time_scale)
+    pictures = STORY_PICTURES[:script.get("pictures", len(STORY_PICTURES))]
+    chatbot = ScriptedChatbot(script.get("greeting", "Hello! Are you ready?"), script.get("replies", []),
+                              chat_latency_s)
+    tracer = TurnTracer(enabled=True)
+    timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    log_filename = os.path.join(log_dir, f"replay_{timestamp}.jsonl")
+
+    child_session = open_child_session("fake", 0, log_filename, pictures, tracer,
+                                       transcriber_settings=dict(TRANSCRIBER_SETTINGS, model=model),
+                                       pepper_mic=True, session=session, chatbot=chatbot)
+    played = []
+    stop = threading.Event()
+    child = threading.Thread(target=play_child, args=(session, script["utterances"], played, stop, 30.0),
+                             name="ReplayChild", daemon=True)
+    runner = threading.Thread(target=child_session.run, name="ReplaySession", daemon=True)
+
+    start = time.time()
+    child_session.log.session_start(robot="fake")
+    child.start()
+    runner.start()
+    runner.join(timeout)
+    finished = not runner.is_alive()
+    if not finished:
+        print(f"Session still running after {timeout:.0f}s; stopping the replay")
+    stop.set()
+    wall_s = time.time() - start
+    child_session.finish(print_history=False, trace_filename=os.path.join(log_dir, f"replay_trace_{timestamp}.json"))
+    session.close()
+
+    turns = turn_latencies(session, played)
+    latency = LogHistogram()
+    for turn in turns:
+        if turn['eos_to_speech_ms'] is not None:
+            latency.record(max(turn['eos_to_speech_ms'], 0.0))
+    return {
+        'script': script_path,
+        'model': model,
+        'chat_latency_s': chat_latency_s,
+        'time_scale': time_scale,
+        'finished': finished,
+        'wall_s': round(wall_s, 1),
+        'utterances_played': len(played),
+        'utterances_scripted': len(script["utterances"]),
+        'pepper_utterances': len(session.speech),
+        'naoqi_calls': len(session.calls),
+        'eos_to_speech': latency.summary(),
+        'turns': turns,
+        'log': log_filename,
+    }
+
+
+def print_report(result):
+    print(f"\n=== Replay of {result['script']} ({result['model']}) ===")
+    print(f"{'finished' if result['finished'] else 'TIMED OUT'} in {result['wall_s']:.0f}s, "
+          f"{result['utterances_played']}/{result['utterances_scripted']} utterances played, "
+          f"Pepper spoke {result['pepper_utterances']} times, {result['naoqi_calls']} NAOqi calls")
+    for turn in result['turns']:
+        latency = f"{turn['eos_to_speech_ms']:>8.0f} ms" if turn['eos_to_speech_ms'] is not None else f"{'-':>8}   "
+        print(f"  {turn['utterance']:<24}{latency}  -> {turn['reply'] or '(no answer)'}")
+    summary = result['eos_to_speech']
+    if summary.get('count'):
+        print(f"End of speech -> Pepper speaks: p50 {summary['p50_ms']:.0f} ms, p90 {summary['p90_ms']:.0f} ms, "
+              f"max {summary['max_ms']:.0f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("script", help="Replay script (JSON)")
+    parser.add_argument("--model", default=TRANSCRIBER_SETTINGS["model"], help="Whisper model of the Transcriber")
+    parser.add_argument("--chat-latency-ms", type=float, default=800, help="Delay of each scripted chatbot reply")
+    parser.add_argument("--response-delay", type=float, default=2.0,
+                        help="Seconds of quiet after Pepper speaks before the child answers (default per utterance)")
+    parser.add_argument("--time-scale", type=float, default=1.0, help="Multiplies every fake NAOqi latency")
+    parser.add_argument("--timeout", type=float, default=900, help="Give up on the session after this many seconds")
+    parser.add_argument("--output", default=None, help="Results file (default session_replay_<timestamp>.json)")
+    args = parser.parse_args()
+
+    result = run_replay(args.script, args.model, args.chat_latency_ms / 1000, args.response_delay,
+                        args.time_scale, args.timeout)
+    print_report(result)
+    output = args.output or f"session_replay_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.json"
+    with open(output, "w") as f:
+        json.dump(dict(result, build=default_build_label()), f, indent=2)
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
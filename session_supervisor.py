@@ -0,0 +1,170 @@
+"""Runs child sessions on several Pepper robots from one process.
+
+chatWithPepper.py drives one robot per process, and every process loads its own
+Whisper model. The supervisor starts one ChildSession per robot, each in its own
+thread with its own NAOqi session, transcriber, chatbot, log file and tracer,
+while all of them share:
+    - one Whisper model, behind the asr_scheduler.SharedWhisperModel queue, which
+      batches utterances that end at about the same time into one decode pass;
+    - one ResponseCache for the cached greeting.
+
+Logs go to <log-dir>/chat_history_<robot>_<timestamp>.jsonl (plus the .txt
+version), traces (with --trace) to <log-dir>/trace_<robot>_<timestamp>.json.
+
+Usage:
+    python session_supervisor.py --robot 192.168.1.10 --robot 192.168.1.11:9559@"USB Audio"
+        [--model turbo] [--max-batch 8] [--max-wait-ms 30] [--log-dir sessions] [--trace] [--pepper-mic]
+
+A robot is given as IP[:PORT][@MICROPHONE]; MICROPHONE is passed to the
+Transcriber as default_microphone for that session.
+"""
+
+import argparse
+import os
+import threading
+import time
+import traceback
+from datetime import datetime
+
+from asr_scheduler import SharedWhisperModel
+from chatWithPepper import STORY_PICTURES, TRANSCRIBER_SETTINGS, open_child_session
+from response_cache import ResponseCache
+from turn_tracer import TurnTracer
+
+
+class RobotSpec:
+    """Where a robot is and which microphone listens to its child."""
+
+    def __init__(self, ip, port=9559, microphone=None):
+        self.ip = ip
+        self.port = port
+        self.microphone = microphone
+
+    @property
+    def name(self):
+        return f"{self.ip.replace('.', '-')}_{self.port}"
+
+    @classmethod
+    def parse(cls, text):
+        """Parses IP[:PORT][@MICROPHONE]."""
+        address, _, microphone = text.partition("@")
+        ip, _, port = address.partition(":")
+        return cls(ip, int(port) if port else 9559, microphone or None)
+
+
+class SessionSupervisor:
+    """Runs one ChildSession per robot concurrently, sharing the ASR model and response cache."""
+
+    def __init__(self, robots, model="turbo", log_dir="sessions", trace=False, max_batch=8, max_wait=0.03,
+                 pepper_mic=False):
+        """
+        Args:
+            robots (list[RobotSpec]): Robots to run sessions on.
+            model (str): Whisper model loaded once and shared by every session.
+            log_dir (str): Directory for the per-session logs and traces.
+            trace (bool): Record a per-session Chrome trace.
+            max_batch (int): Most utterances the shared model decodes in one batch.
+            max_wait (float): Seconds the shared model waits to fill a batch.
+            pepper_mic (bool): Listen to each robot's own front microphone.
+        """
+        self.robots = robots
+        self.log_dir = log_dir
+        self.trace = trace
+        self.pepper_mic = pepper_mic
+        os.makedirs(log_dir, exist_ok=True)
+        self.audio_model = SharedWhisperModel(model, max_batch=max_batch, max_wait=max_wait)
+        self.response_cache = ResponseCache()
+        self.sessions = {}  # robot name -> ChildSession
+        self.results = {}   # robot name -> outcome
+        self._lock = threading.Lock()
+
+    def _set_result(self, name, result):
+        with self._lock:
+            self.results[name] = result
+
+    def run_robot(self, spec):
+        """Runs a complete session on one robot. Called in the robot's own thread."""
+        timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        tracer = TurnTracer(enabled=self.trace, process_name=f"pepper {spec.ip}")
+        settings = dict(TRANSCRIBER_SETTINGS)
+        if spec.microphone:
+            settings["default_microphone"] = spec.microphone
+        log_filename = os.path.join(self.log_dir, f"chat_history_{spec.name}_{timestamp}.jsonl")
+
+        child_session = open_child_session(spec.ip, spec.port, log_filename, STORY_PICTURES, tracer,
+                                           transcriber_settings=settings, audio_model=self.audio_model,
+                                           response_cache=self.response_cache, pepper_mic=self.pepper_mic)
+        if child_session is None:
+            self._set_result(spec.name, "unreachable")
+            return
+        with self._lock:
+            self.sessions[spec.name] = child_session
+
+        child_session.log.session_start(robot=child_session.robot)
+        try:
+            child_session.run()
+            self._set_result(spec.name, "completed")
+        except Exception as e:
+            self._set_result(spec.name, f"failed: {e}")
+            print(f"[{spec.name}] Session failed:")
+            traceback.print_exc()
+        finally:
+            child_session.finish(print_history=False,
+                                 trace_filename=os.path.join(self.log_dir, f"trace_{spec.name}_{timestamp}.json"))
+
+    def run(self):
+        """Starts every session and waits for all of them to end."""
+        threads = [threading.Thread(target=self.run_robot, args=(spec,), name=f"session-{spec.name}", daemon=True)
+                   for spec in self.robots]
+        start = time.time()
+        for thread in threads:
+            thread.start()
+        try:
+            while any(thread.is_alive() for thread in threads):
+                for thread in threads:
+                    thread.join(timeout=0.5)
+        except KeyboardInterrupt:
+            print("\nInterrupted. Closing the session logs...")
+            with self._lock:
+                running = [(name, s) for name, s in self.sessions.items() if name not in self.results]
+            for name, child_session in running:
+                self._set_result(name, "interrupted")
+                child_session.log.session_end(reason="interrupted")
+                child_session.log.close()
+        finally:
+            self.audio_model.close()
+            self.response_cache.save()
+
+        print("\n" + 4*"=======")
+        print(f"Supervisor finished after {time.time() - start:.0f}s")
+        for spec in self.robots:
+            print(f"  {spec.ip}:{spec.port}  {self.results.get(spec.name, 'not started')}")
+        print(f"Shared ASR model: {self.audio_model.stats()}")
+        print(f"Response cache: {self.response_cache.stats()}")
+        return self.results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run child sessions on several Pepper robots at once.")
+    parser.add_argument("--robot", action="append", required=True, metavar="IP[:PORT][@MICROPHONE]",
+                        help="Robot to run a session on; repeat for each robot.")
+    parser.add_argument("--model", default=TRANSCRIBER_SETTINGS["model"],
+                        help="Whisper model shared by all sessions.")
+    parser.add_argument("--max-batch", type=int, default=8,
+                        help="Most utterances decoded together by the shared model; 1 disables batching.")
+    parser.add_argument("--max-wait-ms", type=float, default=30,
+                        help="How long the shared model waits for more utterances to batch.")
+    parser.add_argument("--log-dir", default="sessions", help="Directory for the session logs.")
+    parser.add_argument("--trace", action="store_true", help="Export a Chrome trace per session.")
+    parser.add_argument("--pepper-mic", action="store_true",
+                        help="Listen to each robot's front microphone instead of a local one (ignores @MICROPHONE).")
+    args = parser.parse_args()
+
+    robots = [RobotSpec.parse(text) for text in args.robot]
+    SessionSupervisor(robots, model=args.model, log_dir=args.log_dir, trace=args.trace,
+                      max_batch=args.max_batch, max_wait=args.max_wait_ms / 1000.0,
+                      pepper_mic=args.pepper_mic).run()
+
+
+if __name__ == "__main__":
+    main()
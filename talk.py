@@ -1,8 +1,8 @@
 import asyncio
-import pyaudio
 from livekit import rtc
-import numpy as np
 import dotenv
+from audio_metrics import FrameMeter
+from audio_capture import MicrophoneCapture
 # from credentials import USER_TOKEN, ROOM_NAME, WS_URL
 
 dotenv.load_dotenv(".env.livekit")
@@ -25,35 +25,26 @@ async def publish_microphone(local: rtc.LocalParticipant):
 
 async def capture_microphone(source: rtc.AudioSource):
     "Read microphone frames and push them to the source."
-    pa = pyaudio.PyAudio()
-    stream = pa.open(
-        format=pyaudio.paInt16,
-        channels=1,
-        rate=48000,
-        input=True,
-        input_device_index=9,
-        frames_per_buffer=480)          # 10 ms @ 48 kHz
+    # PyAudio runs in callback mode on its own thread; frames arrive through a bounded queue.
+    capture = MicrophoneCapture(rate=48000, channels=1, frames_per_buffer=480,  # 10 ms @ 48 kHz
+                                input_device_index=9).start()
     SILENCE_THRESHOLD = 200
+    meter = FrameMeter()
     try:
-        while True:
-            data = stream.read(480, exception_on_overflow=False)
-            frame = np.frombuffer(data, dtype=np.int16)
-            rms = int(np.sqrt(np.mean(frame.astype(np.float32)**2)))
+        async for data in capture:
+            rms = meter.rms(data)
             bar = '█' * (rms // 100) + '░' * (50 - rms // 100)
             print(f'\r RMS {rms:4d}  {bar}', end='', flush=True)
 
             if rms > SILENCE_THRESHOLD:
                 await source.capture_frame(rtc.AudioFrame(
-                    data=frame.tobytes(),
+                    data=data,
                     sample_rate=48000,
                     samples_per_channel=480,
                     num_channels=1))
-            else:
-                await asyncio.sleep(0.01)  # avoid busy loop when silent
+            # No sleep needed when silent: awaiting the next frame already yields the loop
     finally:
-        stream.stop_stream()
-        stream.close()
-        pa.terminate()
+        capture.close()
     #         print('.', end='', flush=True) # Indicate activity
     # finally:
     #     stream.stop_stream()
@@ -0,0 +1,227 @@
+"""Per-turn latency tracing for the Pepper voice loop.
+
+A TurnTracer records spans (with a duration) and marks (instants) on a monotonic
+clock and groups them into conversation turns, so that one turn shows exactly how
+long the VAD endpoint, the Whisper decodes, the HTTP connect, the first and last
+chatbot tokens and the TTS took. The trace can be exported as a Chrome trace
+(open it in chrome://tracing or https://ui.perfetto.dev).
+
+Tracing is off unless enabled with the PEPPER_TRACE=1 environment variable or by
+setting tracer.enabled = True; while disabled every call returns straight away.
+
+Span and mark names used across the repo:
+    listen        span, start of listening until the transcriber returns
+    vad_endpoint  mark, the transcriber decided the phrase is complete
+    decode        span, one Whisper transcribe call
+    llm_request   span, whole chatbot round-trip
+    http_connect  span, POST until the response headers arrive
+    first_token   mark, first streamed chatbot token
+    last_token    mark, chatbot stream completed
+    tts           span, Pepper speaking (its start and end are TTS start / TTS end)
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+
+_NULL_SPAN = nullcontext()
+
+
+class _Span:
+    """Context manager recording one complete ('X') event when it exits."""
+    __slots__ = ("tracer", "name", "args", "start")
+
+    def __init__(self, tracer, name, args):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter_ns()
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        self.tracer._record("X", self.name, self.start, end - self.start, self.args)
+        return False
+
+
+class TurnTracer:
+    """Collects spans and marks for each conversation turn."""
+
+    def __init__(self, enabled=False, max_events=200000, process_name="pepper"):
+        """
+        Args:
+            enabled (bool): Whether events are recorded at all.
+            max_events (int): Oldest events are discarded beyond this many.
+            process_name (str): Label for the process row in the Chrome trace.
+        """
+        self.enabled = enabled
+        self.process_name = process_name
+        self.turn = 0
+        self._events = deque(maxlen=max_events)
+        self._open = {}
+        self._turn_start = None
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter_ns()
+        self._pid = os.getpid()
+
+    # --- Recording ---------------------------------------------------------
+
+    def begin_turn(self, label=None):
+        """Starts a new turn and returns its number. Ends the previous turn if still open."""
+        if not self.enabled:
+            return self.turn
+        if self._turn_start is not None:
+            self.end_turn()
+        with self._lock:
+            self.turn += 1
+            self._turn_start = (time.perf_counter_ns(), label)
+        return self.turn
+
+    def end_turn(self):
+        """Closes the current turn, recording it as a span on the 'turns' row."""
+        if not self.enabled or self._turn_start is None:
+            return
+        start, label = self._turn_start
+        self._turn_start = None
+        args = {"label": label} if label else {}
+        self._record("X", f"turn {self.turn}", start, time.perf_counter_ns() - start, args, tid=0)
+
+    def span(self, name, **args):
+        """Returns a context manager that records a span around its block."""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, args)
+
+    def begin(self, name, **args):
+        """Opens a span that is closed by end(name), possibly from another callback."""
+        if not self.enabled:
+            return
+        self._open[name] = (time.perf_counter_ns(), args)
+
+    def end(self, name, **args):
+        """Closes a span opened with begin(name). Does nothing if it was never opened."""
+        if not self.enabled:
+            return
+        started = self._open.pop(name, None)
+        if started is None:
+            return
+        start, begin_args = started
+        begin_args.update(args)
+        self._record("X", name, start, time.perf_counter_ns() - start, begin_args)
+
+    def mark(self, name, **args):
+        """Records an instant event."""
+        if not self.enabled:
+            return
+        self._record("i", name, time.perf_counter_ns(), 0, args)
+
+    def _record(self, phase, name, start_ns, dur_ns, args, tid=None):
+        if tid is None:
+            tid = threading.get_ident()
+        self._events.append((phase, name, start_ns, dur_ns, tid, self.turn, args))
+
+    # --- Reporting ---------------------------------------------------------
+
+    def turn_summary(self, turn=None):
+        """
+        Summarises one turn (the current one by default).
+
+        Returns:
+            dict: For spans, name -> {"count", "total_ms"}; for marks,
+                  name -> {"at_ms"} measured from the start of the turn.
+        """
+        turn = self.turn if turn is None else turn
+        events = [e for e in list(self._events) if e[5] == turn and e[4] != 0]
+        if not events:
+            return {}
+        origin = min(e[2] for e in events)
+        if self._turn_start is not None and turn == self.turn:
+            origin = self._turn_start[0]
+        summary = {}
+        for phase, name, start, dur, _tid, _turn, _args in events:
+            if phase == "X":
+                entry = summary.setdefault(name, {"count": 0, "total_ms": 0.0})
+                entry["count"] += 1
+                entry["total_ms"] += dur / 1e6
+            else:
+                summary.setdefault(name, {"at_ms": (start - origin) / 1e6})
+        return summary
+
+    def format_turn_summary(self, turn=None):
+        """Returns the turn summary as a single printable line."""
+        turn = self.turn if turn is None else turn
+        parts = []
+        for name, entry in self.turn_summary(turn).items():
+            if "at_ms" in entry:
+                parts.append(f"{name} @{entry['at_ms']:.0f}ms")
+            elif entry["count"] > 1:
+                parts.append(f"{name} {entry['count']}x {entry['total_ms']:.0f}ms")
+            else:
+                parts.append(f"{name} {entry['total_ms']:.0f}ms")
+        return f"[TRACE turn {turn}] " + " | ".join(parts)
+
+    def export_chrome_trace(self, path):
+        """
+        Writes every recorded event in the Chrome trace event format.
+
+        Args:
+            path (str): Output .json file.
+
+        Returns:
+            str: The path written.
+        """
+        trace_events = [{
+            "ph": "M", "name": "process_name", "pid": self._pid, "tid": 0,
+            "args": {"name": self.process_name},
+        }, {
+            "ph": "M", "name": "thread_name", "pid": self._pid, "tid": 0,
+            "args": {"name": "turns"},
+        }]
+        thread_names = {t.ident: t.name for t in threading.enumerate()}
+        seen_tids = set()
+        for phase, name, start, dur, tid, turn, args in list(self._events):
+            event = {
+                "ph": phase,
+                "name": name,
+                "pid": self._pid,
+                "tid": tid,
+                "ts": (start - self._origin) / 1000.0,
+                "args": dict(args, turn=turn),
+            }
+            if phase == "X":
+                event["dur"] = dur / 1000.0
+            else:
+                event["s"] = "t"
+            trace_events.append(event)
+            if tid and tid not in seen_tids:
+                seen_tids.add(tid)
+                trace_events.append({
+                    "ph": "M", "name": "thread_name", "pid": self._pid, "tid": tid,
+                    "args": {"name": thread_names.get(tid, str(tid))},
+                })
+        with open(path, "w") as f:
+            json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms"}, f)
+        return path
+
+    def reset(self):
+        """Discards all recorded events."""
+        self._events.clear()
+        self._open.clear()
+        self._turn_start = None
+        self.turn = 0
+
+
+# Process-wide tracer shared by the transcriber, chatbot and orchestrator scripts.
+tracer = TurnTracer(enabled=os.environ.get("PEPPER_TRACE", "0") not in ("", "0"))
+
+
+def get_tracer():
+    """Returns the process-wide tracer."""
+    return tracer
@@ -0,0 +1,271 @@
+"""Benchmark: replays recorded utterances through the voice loop, per ASR backend and model.
+
+Each fixture (see audio_fixtures.py) is played into a Transcriber through a
+FakeMicrophone, at real time or faster, exactly where a child's voice would
+come in. The transcript then goes through a stub chatbot and a stub TTS with
+fixed latencies, so the numbers isolate the ASR part of a turn:
+
+    eos_to_text     end of speech -> get_transcription() returns (endpointing + final decode)
+    eos_to_reply    end of speech -> the stub TTS starts speaking
+    rtf             time spent in the model / seconds of fixture audio
+    decode_rtf      time spent in the model / seconds of audio it decoded (the
+                    streaming loop re-decodes the growing phrase, so this is lower)
+    cpu_pct         process CPU time / wall time over the run (100 = one core)
+    rss_mb          resident memory after the run, and the peak
+
+Every BACKEND:MODEL runs in its own process, so load time, memory and CPU are
+not mixed between models. Results are written as JSON (one record per run plus
+per-fixture details) so that a later run can be compared with --compare.
+
+Backends: whisper (classTranscriber, openai-whisper), whispercpp (classTranscriberCPP).
+
+Usage:
+    python voice_loop_bench.py fixtures/ [--run whisper:turbo --run whispercpp:base.en]
+        [--speed 1.0] [--chat-latency-ms 800] [--tts-latency-ms 300]
+        [--output voice_loop_results.json] [--compare previous.json]
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from multiprocessing import get_context
+
+from audio_fixtures import FakeMicrophone, load_fixtures
+from latencytracker import LogHistogram, default_build_label
+from turn_tracer import TurnTracer
+
+# As in chatWithPepper.TRANSCRIBER_SETTINGS (that module needs qi to import)
+ENERGY_THRESHOLD = 600
+MAX_RECORD_DURATION = 2
+MAX_PHRASE_DURATION = 3
+
+
+class TimedModel:
+    """Wraps an ASR model and accumulates the time spent in transcribe() and the audio it was given."""
+
+    def __init__(self, model, sample_rate=16000):
+        self.model = model
+        self.sample_rate = sample_rate
+        self.busy_s = 0.0
+        self.audio_s = 0.0
+        self.calls = 0
+
+    def transcribe(self, audio, **kwargs):
+        start = time.perf_counter()
+        try:
+            return self.model.transcribe(audio, **kwargs)
+        finally:
+            self.busy_s += time.perf_counter() - start
+            self.audio_s += len(audio) / self.sample_rate
+            self.calls += 1
+
+
+class StubChatbot:
+    """Stands in for Chatbot: answers after a fixed delay."""
+
+    def __init__(self, latency_s):
+        self.latency_s = latency_s
+
+    def get_response(self, prompt):
+        time.sleep(self.latency_s)
+        return f"You said {prompt}. Tell me more about the picture!"
+
+
+class StubTTS:
+    """Stands in for ALTextToSpeech: say() returns when the speech would start."""
+
+    def __init__(self, latency_s):
+        self.latency_s = latency_s
+
+    def say(self, text):
+        time.sleep(self.latency_s)
+
+
+def rss_mb():
+    """Current resident set size of this process in MB (Linux)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return round(int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6, 1)
+    except OSError:
+        return None
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1e6 if platform.system() == "Darwin" else peak / 1e3  # bytes on macOS, KB elsewhere
+
+
+def cpu_seconds():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def make_transcriber(backend, model, source, tracer):
+    if backend == "whisper":
+        from classTranscriber import Transcriber
+        return Transcriber(model=model, energy_threshold=ENERGY_THRESHOLD, max_record_duration=MAX_RECORD_DURATION,
+                           max_phrase_duration=MAX_PHRASE_DURATION, tracer=tracer, source=source)
+    if backend == "whispercpp":
+        from classTranscriberCPP import Transcriber
+        return Transcriber(model=model, energy_threshold=ENERGY_THRESHOLD, record_timeout=MAX_RECORD_DURATION,
+                           phrase_timeout=MAX_PHRASE_DURATION, tracer=tracer, source=source)
+    raise ValueError(f"Unknown backend '{backend}' (expected whisper or whispercpp)")
+
+
+def run_combo(backend, model, fixtures_path, speed, chat_latency_s, tts_latency_s):
+    """
+    Runs every fixture through one backend/model. Called in a fresh process.
+
+    Returns:
+        dict: Summary metrics plus a 'fixtures' list with per-utterance results.
+    """
+    fixtures = load_fixtures(fixtures_path)
+    microphone = FakeMicrophone(speed=speed)
+    rss_start = rss_mb()
+    load_start = time.perf_counter()
+    transcriber = make_transcriber(backend, model, microphone, TurnTracer(enabled=False))
+    load_s = time.perf_counter() - load_start
+    timed_model = transcriber.audio_model = TimedModel(transcriber.audio_model)
+    rss_loaded = rss_mb()
+    chatbot = StubChatbot(chat_latency_s)
+    tts = StubTTS(tts_latency_s)
+
+    eos_to_text = LogHistogram()
+    eos_to_reply = LogHistogram()
+    per_fixture = []
+    cpu_start = cpu_seconds()
+    wall_start = time.perf_counter()
+    for fixture in fixtures:
+        if hasattr(transcriber, "reset"):
+            transcriber.reset()
+        microphone.play(fixture)
+        text = transcriber.get_transcription()
+        text_at = time.perf_counter()
+        response = chatbot.get_response(text)
+        tts.say(response)
+        reply_at = time.perf_counter()
+
+        record = {'name': fixture.name, 'duration_s': round(fixture.duration, 3), 'text': text}
+        if microphone.speech_end_time is not None:
+            record['eos_to_text_ms'] = round((text_at - microphone.speech_end_time) * 1000, 1)
+            record['eos_to_reply_ms'] = round((reply_at - microphone.speech_end_time) * 1000, 1)
+            eos_to_text.record(max(record['eos_to_text_ms'], 0.0))
+            eos_to_reply.record(max(record['eos_to_reply_ms'], 0.0))
+        else:
+            record['cut_off'] = True  # Returned before the child finished speaking
+        per_fixture.append(record)
+        # Let the rest of the fixture play out so it does not leak into the next one.
+        microphone.played.wait(timeout=fixture.duration / speed + 5)
+    wall_s = time.perf_counter() - wall_start
+    cpu_s = cpu_seconds() - cpu_start
+
+    audio_s = sum(fixture.duration for fixture in fixtures)
+    return {
+        'backend': backend,
+        'model': model,
+        'fixtures': per_fixture,
+        'utterances': len(fixtures),
+        'cut_off': sum(1 for record in per_fixture if record.get('cut_off')),
+        'audio_s': round(audio_s, 2),
+        'load_s': round(load_s, 2),
+        'wall_s': round(wall_s, 2),
+        'eos_to_text': eos_to_text.summary(),
+        'eos_to_reply': eos_to_reply.summary(),
+        'decode_calls': timed_model.calls,
+        'rtf': round(timed_model.busy_s / audio_s, 4) if audio_s else None,
+        'decode_rtf': round(timed_model.busy_s / timed_model.audio_s, 4) if timed_model.audio_s else None,
+        'cpu_pct': round(100.0 * cpu_s / wall_s, 1) if wall_s else None,
+        'rss_model_mb': round(rss_loaded - rss_start, 1) if rss_start and rss_loaded else None,
+        'rss_mb': rss_mb(),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+    }
+
+
+def run_isolated(backend, model, *args):
+    """Runs run_combo in a fresh process; returns its result or an {'error': ...} record."""
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+        try:
+            return pool.submit(run_combo, backend, model, *args).result()
+        except Exception as e:
+            return {'backend': backend, 'model': model, 'error': f"{type(e).__name__}: {e}"}
+
+
+def _ms(summary, key):
+    value = summary.get(key) if summary else None
+    return f"{value:>9.0f}" if value is not None else f"{'-':>9}"
+
+
+def print_report(results, baseline=None):
+    """Prints one row per run; with a baseline, the change of p50 latency and RTF against it."""
+    baseline_runs = {(r['backend'], r['model']): r for r in (baseline or {}).get('runs', []) if 'error' not in r}
+    print(f"\n{'backend:model':<26}{'utt':>5}{'p50 text':>9}{'p90 text':>9}{'p50 reply':>10}"
+          f"{'rtf':>8}{'cpu %':>8}{'rss MB':>8}{'peak MB':>9}")
+    for r in results:
+        label = f"{r['backend']}:{r['model']}"
+        if 'error' in r:
+            print(f"{label:<26}  failed: {r['error']}")
+            continue
+        rtf = f"{r['rtf']:>8.3f}" if r['rtf'] is not None else f"{'-':>8}"
+        print(f"{label:<26}{r['utterances']:>5}{_ms(r['eos_to_text'], 'p50_ms')}{_ms(r['eos_to_text'], 'p90_ms')}"
+              f" {_ms(r['eos_to_reply'], 'p50_ms')}{rtf}{r['cpu_pct'] or 0:>8.0f}"
+              f"{r['rss_mb'] or 0:>8.0f}{r['peak_rss_mb']:>9.0f}")
+        if r['cut_off']:
+            print(f"{'':<26}  {r['cut_off']} utterance(s) cut off before the end of speech")
+        before = baseline_runs.get((r['backend'], r['model']))
+        if before:
+            old, new = before['eos_to_text'].get('p50_ms'), r['eos_to_text'].get('p50_ms')
+            if old and new:
+                print(f"{'':<26}  vs baseline: p50 text {new - old:+.0f} ms ({100 * (new - old) / old:+.0f}%), "
+                      f"rtf {before['rtf']} -> {r['rtf']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("fixtures", help="WAV file or directory of WAV fixtures")
+    parser.add_argument("--run", action="append", metavar="BACKEND:MODEL",
+                        help="Backend and model to benchmark; repeatable (default whisper:turbo)")
+    parser.add_argument("--speed", type=float, default=1.0, help="Playback speed, 1.0 = real time")
+    parser.add_argument("--chat-latency-ms", type=float, default=800, help="Stub chatbot response time")
+    parser.add_argument("--tts-latency-ms", type=float, default=300, help="Stub TTS time to start speaking")
+    parser.add_argument("--output", default=None,
+                        help="Results file (default voice_loop_bench_<timestamp>.json)")
+    parser.add_argument("--compare", default=None, help="Earlier results file to compare with")
+    args = parser.parse_args()
+
+    runs = [spec.split(":", 1) for spec in (args.run or ["whisper:turbo"])]
+    print(f"{len(load_fixtures(args.fixtures))} fixture(s) from {args.fixtures}, {len(runs)} run(s), "
+          f"speed x{args.speed:g}")
+    results = []
+    for backend, model in runs:
+        print(f"\n=== {backend}:{model} ===")
+        results.append(run_isolated(backend, model, args.fixtures, args.speed,
+                                    args.chat_latency_ms / 1000.0, args.tts_latency_ms / 1000.0))
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(results, baseline)
+
+    output = args.output or f"voice_loop_bench_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.json"
+    with open(output, "w") as f:
+        json.dump({
+            'build': default_build_label(),
+            'timestamp': datetime.now().isoformat(timespec="seconds"),
+            'host': platform.node(),
+            'fixtures': os.path.abspath(args.fixtures),
+            'speed': args.speed,
+            'chat_latency_ms': args.chat_latency_ms,
+            'tts_latency_ms': args.tts_latency_ms,
+            'runs': results,
+        }, f, indent=2)
+    print(f"\nResults written to {output}")
+
+
+if __name__ == "__main__":
+    main()